@@ -4,11 +4,17 @@ from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from config import config
+from app.utils.cache import ReportCache
+from app.utils.storage import MediaStore
+from app.utils.events import EventHub
 import os
 
 db = SQLAlchemy()
 migrate = Migrate()
 jwt = JWTManager()
+cache = ReportCache()
+storage = MediaStore()
+events = EventHub()
 
 
 def create_app(config_name=None):
@@ -22,13 +28,19 @@ def create_app(config_name=None):
     
     # Initialize extensions
     db.init_app(app)
-    migrate.init_app(app, db)
+    from app.utils.search import include_object
+    migrate.init_app(app, db, include_object=include_object)
     jwt.init_app(app)
+    cache.init_app(app)
+    storage.init_app(app)
+    events.init_app(app)
     CORS(app, origins=app.config['CORS_ORIGINS'])
     
     # Create upload directories
     os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'images'), exist_ok=True)
     os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'videos'), exist_ok=True)
+    os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'tmp'), exist_ok=True)
+    os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'objects'), exist_ok=True)
     
     # Register blueprints
     from app.routes.auth import auth_bp
@@ -46,6 +58,14 @@ def create_app(config_name=None):
     def health_check():
         return {'status': 'healthy', 'message': 'AJALI! Backend is running'}, 200
     
+    # Turn away refresh tokens known to be revoked before they reach a route
+    from app.services.token_service import TokenService
+    jwt.token_in_blocklist_loader(TokenService.is_revoked)
+    
+    # Forget the identity cached on g once each request ends
+    from app.middleware.auth import forget_current_user
+    app.teardown_request(forget_current_user)
+    
     # Error handlers
     from app.utils.error_handlers import register_error_handlers
     register_error_handlers(app)
@@ -1,29 +1,60 @@
 from functools import wraps
-from flask import jsonify
+from flask import g, jsonify
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
 from app.models import User
 
 
+def _verify_jwt():
+    """Verify the request's JWT once, however many times it is asked for"""
+    if not g.get('jwt_verified'):
+        verify_jwt_in_request()
+        g.jwt_verified = True
+
+
+def _resolve_user():
+    """Load the user named by the verified JWT, at most once per request"""
+    if 'current_user' not in g:
+        g.current_user = User.query.get(get_jwt_identity())
+    return g.current_user
+
+
+def forget_current_user(exception=None):
+    """Drop the identity cached for a request, g can outlive it when an app context is shared"""
+    g.pop('jwt_verified', None)
+    g.pop('current_user', None)
+
+
 def login_required(fn):
     """Decorator to ensure user is authenticated"""
     @wraps(fn)
     def wrapper(*args, **kwargs):
         try:
-            verify_jwt_in_request()
+            _verify_jwt()
             return fn(*args, **kwargs)
         except Exception as e:
             return jsonify({'error': 'Authentication required', 'message': str(e)}), 401
     return wrapper
 
 
+def refresh_token_required(fn):
+    """Decorator to ensure the request carries a valid, unrevoked refresh token"""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            verify_jwt_in_request(refresh=True)
+        except Exception as e:
+            return jsonify({'error': 'Invalid refresh token', 'message': str(e)}), 401
+        return fn(*args, **kwargs)
+    return wrapper
+
+
 def admin_required(fn):
     """Decorator to ensure user is authenticated and has admin role"""
     @wraps(fn)
     def wrapper(*args, **kwargs):
         try:
-            verify_jwt_in_request()
-            user_id = get_jwt_identity()
-            user = User.query.get(user_id)
+            _verify_jwt()
+            user = _resolve_user()
             
             if not user:
                 return jsonify({'error': 'User not found'}), 404
@@ -38,10 +69,9 @@ def admin_required(fn):
 
 
 def get_current_user():
-    """Get current authenticated user"""
+    """Get current authenticated user, cached for the rest of the request"""
     try:
-        verify_jwt_in_request()
-        user_id = get_jwt_identity()
-        return User.query.get(user_id)
+        _verify_jwt()
+        return _resolve_user()
     except:
         return None
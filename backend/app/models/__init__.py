@@ -2,5 +2,13 @@ from app.models.user import User
 from app.models.report import Report, ReportStatus, IncidentType
 from app.models.media import Media
 from app.models.status_history import StatusHistory
+from app.models.stat_counter import StatCounter
+from app.models.report_rollup import ReportRollup
+from app.models.upload_session import UploadSession
+from app.models.media_job import MediaJob, JobStatus
+from app.models.file_deletion import FileDeletion
+from app.models.notification import Notification, NotificationStatus
+from app.models.authority_subscription import AuthoritySubscription
+from app.models.refresh_token import RefreshToken
 
-__all__ = ['User', 'Report', 'ReportStatus', 'IncidentType', 'Media', 'StatusHistory']
\ No newline at end of file
+__all__ = ['User', 'Report', 'ReportStatus', 'IncidentType', 'Media', 'StatusHistory', 'StatCounter', 'ReportRollup', 'UploadSession', 'MediaJob', 'JobStatus', 'FileDeletion', 'Notification', 'NotificationStatus', 'AuthoritySubscription', 'RefreshToken']
\ No newline at end of file
@@ -0,0 +1,52 @@
+import uuid
+from datetime import datetime
+from app import db
+from app.utils.geo import bbox_around, polygon_bounds
+
+
+class AuthoritySubscription(db.Model):
+    """An authority's request to be notified of new incidents in an area"""
+    
+    __tablename__ = 'authority_subscriptions'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    name = db.Column(db.String(120), nullable=False)
+    email = db.Column(db.String(120), nullable=True)
+    phone_number = db.Column(db.String(20), nullable=True)
+    incident_types = db.Column(db.JSON, nullable=True)  # None subscribes to every type
+    
+    # Area: a circle (latitude, longitude, radius_km) or a [[lat, lng], ...] polygon
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    radius_km = db.Column(db.Float, nullable=True)
+    polygon = db.Column(db.JSON, nullable=True)
+    
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<AuthoritySubscription {self.name}>'
+    
+    def bounds(self):
+        """(south, west, north, east) box enclosing the subscribed area"""
+        if self.polygon:
+            return polygon_bounds(self.polygon)
+        return bbox_around(self.latitude, self.longitude, self.radius_km)
+    
+    def to_dict(self):
+        """Convert subscription to dictionary"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'email': self.email,
+            'phone_number': self.phone_number,
+            'incident_types': self.incident_types,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'radius_km': self.radius_km,
+            'polygon': self.polygon,
+            'is_active': self.is_active,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
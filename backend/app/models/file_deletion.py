@@ -0,0 +1,21 @@
+import uuid
+from datetime import datetime
+from app import db
+
+
+class FileDeletion(db.Model):
+    """Outbox entry for a stored media file to remove once it is no longer referenced"""
+    
+    __tablename__ = 'file_deletions'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    file_path = db.Column(db.String(500), nullable=False)
+    checksum = db.Column(db.String(64), nullable=True)
+    variants = db.Column(db.JSON, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<FileDeletion {self.id}: {self.file_path}>'
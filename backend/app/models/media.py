@@ -14,22 +14,47 @@ class Media(db.Model):
     media_type = db.Column(db.String(20), nullable=False)  # 'image' or 'video'
     file_size = db.Column(db.Integer, nullable=False)  # in bytes
     mime_type = db.Column(db.String(100), nullable=False)
+    checksum = db.Column(db.String(64), nullable=True, index=True)  # SHA-256 of the file contents
+    processing_status = db.Column(db.String(20), nullable=True)  # see app.services.media_pipeline
+    variants = db.Column(db.JSON, nullable=True)  # generated thumbnails/renditions by name and format
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     
     # Foreign Keys
     report_id = db.Column(db.String(36), db.ForeignKey('reports.id'), nullable=False, index=True)
     
+    # Relationships
+    jobs = db.relationship('MediaJob', backref='media', lazy='dynamic', cascade='all, delete-orphan')
+    
     def __repr__(self):
         return f'<Media {self.id}: {self.filename}>'
     
+    @property
+    def url(self):
+        """API path serving the original file"""
+        return f'/api/reports/{self.report_id}/media/{self.id}/file'
+    
+    def variant_urls(self):
+        """Generated variants with the API path serving each of them"""
+        return {
+            name: {
+                fmt: {**info, 'url': f'{self.url}?variant={name}&format={fmt}'}
+                for fmt, info in formats.items()
+            }
+            for name, formats in (self.variants or {}).items()
+        }
+    
     def to_dict(self):
         """Convert media to dictionary"""
         return {
             'id': self.id,
             'filename': self.filename,
             'file_path': self.file_path,
+            'url': self.url,
             'media_type': self.media_type,
             'file_size': self.file_size,
             'mime_type': self.mime_type,
+            'checksum': self.checksum,
+            'processing_status': self.processing_status,
+            'variants': self.variant_urls(),
             'created_at': self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
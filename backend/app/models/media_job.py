@@ -0,0 +1,50 @@
+import uuid
+from datetime import datetime
+from app import db
+
+
+class JobStatus:
+    """Media job status constants"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    
+    @classmethod
+    def all(cls):
+        return [cls.QUEUED, cls.RUNNING, cls.DONE, cls.FAILED]
+
+
+class MediaJob(db.Model):
+    """Persisted background processing job for a media file"""
+    
+    __tablename__ = 'media_jobs'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = db.Column(db.String(20), nullable=False)  # 'video'
+    status = db.Column(db.String(20), nullable=False, default=JobStatus.QUEUED, index=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    # Foreign Keys
+    media_id = db.Column(db.String(36), db.ForeignKey('media.id'), nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<MediaJob {self.id}: {self.kind} {self.status}>'
+    
+    def to_dict(self):
+        """Convert job to dictionary"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,59 @@
+import uuid
+from datetime import datetime
+from app import db
+
+
+class NotificationStatus:
+    """Notification delivery status constants"""
+    QUEUED = 'queued'
+    SENT = 'sent'
+    FAILED = 'failed'
+    
+    @classmethod
+    def all(cls):
+        return [cls.QUEUED, cls.SENT, cls.FAILED]
+
+
+class Notification(db.Model):
+    """Outbox entry for an email or SMS waiting to be delivered"""
+    
+    __tablename__ = 'notifications'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    channel = db.Column(db.String(20), nullable=False)  # 'email' or 'sms'
+    kind = db.Column(db.String(50), nullable=False)  # e.g. 'status_update', 'new_report'
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=True)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=NotificationStatus.QUEUED)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    # Kept without a foreign key so the delivery log outlives deleted reports
+    report_id = db.Column(db.String(36), nullable=True, index=True)
+    
+    __table_args__ = (
+        db.Index('ix_notifications_status_available_at', 'status', 'available_at'),
+    )
+    
+    def __repr__(self):
+        return f'<Notification {self.id}: {self.channel} {self.kind} {self.status}>'
+    
+    def to_dict(self):
+        """Convert notification to dictionary"""
+        return {
+            'id': self.id,
+            'channel': self.channel,
+            'kind': self.kind,
+            'recipient': self.recipient,
+            'subject': self.subject,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error,
+            'report_id': self.report_id,
+            'created_at': self.created_at.isoformat(),
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
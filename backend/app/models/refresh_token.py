@@ -0,0 +1,20 @@
+import uuid
+from datetime import datetime
+from app import db
+
+
+class RefreshToken(db.Model):
+    """Issued refresh token, keyed by its JWT id; tokens rotated from one login share a family"""
+    
+    __tablename__ = 'refresh_tokens'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
+    family_id = db.Column(db.String(36), nullable=False, index=True)
+    replaced_by = db.Column(db.String(36), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f'<RefreshToken {self.id} for {self.user_id}>'
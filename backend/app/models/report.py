@@ -1,6 +1,11 @@
 import uuid
+from collections import defaultdict
 from datetime import datetime
 from app import db
+from app.models.media import Media
+from app.models.user import User
+from app.utils.geo import encode_geocell
+from app.utils.simhash import simhash
 
 
 class ReportStatus:
@@ -41,7 +46,10 @@ class Report(db.Model):
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
     address = db.Column(db.String(255), nullable=True)
+    geocell = db.Column(db.BigInteger, nullable=True, index=True)  # integer geohash, see app.utils.geo
     status = db.Column(db.String(50), nullable=False, default=ReportStatus.PENDING, index=True)
+    simhash = db.Column(db.BigInteger, nullable=True)  # text fingerprint, see app.utils.simhash
+    incident_group_id = db.Column(db.String(36), nullable=True, index=True)  # id of the incident's first report
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
@@ -55,8 +63,17 @@ class Report(db.Model):
     def __repr__(self):
         return f'<Report {self.id}: {self.title}>'
     
-    def to_dict(self, include_media=True, include_user=True):
-        """Convert report to dictionary"""
+    def fingerprint(self):
+        """SimHash of the title and description, used to spot near-duplicate reports"""
+        return simhash(f'{self.title or ""}\n{self.description or ""}')
+    
+    def to_dict(self, include_media=True, include_user=True, media=None, reporter=None):
+        """
+        Convert report to dictionary
+
+        `media` and `reporter` may be passed in pre-loaded (see `to_dict_many`)
+        to avoid lazy-loading them one report at a time.
+        """
         data = {
             'id': self.id,
             'title': self.title,
@@ -66,17 +83,72 @@ class Report(db.Model):
             'longitude': self.longitude,
             'address': self.address,
             'status': self.status,
+            'incident_group_id': self.incident_group_id,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
         
-        if include_user and self.reporter:
-            data['user'] = self.reporter.to_dict()
+        if include_user:
+            if reporter is None:
+                reporter = self.reporter
+            if reporter:
+                data['user'] = reporter.to_dict()
         
         if include_media:
+            if media is None:
+                media = self.media.order_by(Media.created_at).all()
             data['media'] = {
-                'images': [m.to_dict() for m in self.media.filter_by(media_type='image').all()],
-                'videos': [m.to_dict() for m in self.media.filter_by(media_type='video').all()]
+                'images': [m.to_dict() for m in media if m.media_type == 'image'],
+                'videos': [m.to_dict() for m in media if m.media_type == 'video']
             }
         
-        return data
\ No newline at end of file
+        return data
+    
+    @classmethod
+    def to_dict_many(cls, reports, include_media=True, include_user=True):
+        """
+        Convert a list of reports to dictionaries using a constant number of queries
+
+        Reporters and media for the whole list are fetched in one query each
+        and grouped in Python, instead of two or three queries per report.
+        """
+        reports = list(reports)
+        if not reports:
+            return []
+        
+        reporters = {}
+        if include_user:
+            user_ids = {report.user_id for report in reports}
+            reporters = {user.id: user for user in User.query.filter(User.id.in_(user_ids)).all()}
+        
+        media_by_report = defaultdict(list)
+        if include_media:
+            report_ids = [report.id for report in reports]
+            media_items = Media.query.filter(Media.report_id.in_(report_ids)).order_by(Media.created_at).all()
+            for m in media_items:
+                media_by_report[m.report_id].append(m)
+        
+        return [
+            report.to_dict(
+                include_media=include_media,
+                include_user=include_user,
+                media=media_by_report[report.id],
+                reporter=reporters.get(report.user_id)
+            )
+            for report in reports
+        ]
+
+
+@db.event.listens_for(Report, 'before_insert')
+@db.event.listens_for(Report, 'before_update')
+def update_geocell(mapper, connection, report):
+    """Keep the spatial index column in sync with the coordinates"""
+    if report.latitude is not None and report.longitude is not None:
+        report.geocell = encode_geocell(report.latitude, report.longitude)
+
+
+@db.event.listens_for(Report, 'before_insert')
+@db.event.listens_for(Report, 'before_update')
+def update_simhash(mapper, connection, report):
+    """Keep the text fingerprint in sync with the title and description"""
+    report.simhash = report.fingerprint()
@@ -0,0 +1,24 @@
+from app import db
+
+
+class ReportRollup(db.Model):
+    """Report activity aggregated per time bucket, incident type, region and status"""
+    
+    __tablename__ = 'report_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'bucket_start', 'incident_type', 'region', 'status',
+                            name='uq_report_rollups_bucket'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(10), nullable=False)  # 'hour' or 'day'
+    bucket_start = db.Column(db.DateTime, nullable=False, index=True)
+    incident_type = db.Column(db.String(50), nullable=False)
+    region = db.Column(db.String(12), nullable=False)  # geohash prefix of the report location
+    status = db.Column(db.String(50), nullable=False)  # status entered; 'pending' means opened
+    count = db.Column(db.Integer, nullable=False, default=0)
+    # Log-scale histogram of seconds from report creation to entering the status
+    duration_histogram = db.Column(db.JSON, nullable=True)
+    
+    def __repr__(self):
+        return f'<ReportRollup {self.granularity} {self.bucket_start} {self.status}={self.count}>'
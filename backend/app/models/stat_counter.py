@@ -0,0 +1,29 @@
+from datetime import datetime
+from app import db
+
+
+class StatCounter(db.Model):
+    """Materialized platform statistics, one row per counter"""
+    
+    __tablename__ = 'stat_counters'
+    
+    key = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<StatCounter {self.key}={self.value}>'
+    
+    @classmethod
+    def increment(cls, key, delta=1):
+        """
+        Adjust a counter within the current transaction
+
+        Only existing rows are updated; counters that have not been built yet
+        are filled in by the next rebuild instead.
+        """
+        db.session.execute(
+            db.update(cls)
+            .where(cls.key == key)
+            .values(value=cls.value + delta, updated_at=datetime.utcnow())
+        )
@@ -12,7 +12,7 @@ class StatusHistory(db.Model):
     old_status = db.Column(db.String(50), nullable=True)
     new_status = db.Column(db.String(50), nullable=False)
     comment = db.Column(db.Text, nullable=True)
-    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
     
     # Foreign Keys
     report_id = db.Column(db.String(36), db.ForeignKey('reports.id'), nullable=False, index=True)
@@ -0,0 +1,46 @@
+import uuid
+from datetime import datetime
+from app import db
+
+
+class UploadSession(db.Model):
+    """In-progress resumable media upload"""
+    
+    __tablename__ = 'upload_sessions'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    filename = db.Column(db.String(255), nullable=False)
+    media_type = db.Column(db.String(20), nullable=False)  # 'image' or 'video'
+    mime_type = db.Column(db.String(100), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)  # declared size in bytes
+    received_size = db.Column(db.BigInteger, nullable=False, default=0)
+    direct = db.Column(db.Boolean, nullable=False, default=False)  # sent straight to object storage
+    checksum = db.Column(db.String(64))  # SHA-256, declared by direct uploads or recorded on completion
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    # Foreign Keys
+    report_id = db.Column(db.String(36), db.ForeignKey('reports.id'), nullable=False, index=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    
+    def __repr__(self):
+        return f'<UploadSession {self.id}: {self.received_size}/{self.total_size}>'
+    
+    @property
+    def is_complete(self):
+        return self.received_size == self.total_size
+    
+    def to_dict(self):
+        """Convert upload session to dictionary"""
+        return {
+            'id': self.id,
+            'report_id': self.report_id,
+            'filename': self.filename,
+            'media_type': self.media_type,
+            'mime_type': self.mime_type,
+            'total_size': self.total_size,
+            'offset': self.received_size,
+            'direct': self.direct,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 from app import db
-import bcrypt
+from app.utils import passwords
 
 
 class User(db.Model):
@@ -28,11 +28,15 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set password"""
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password_hash = passwords.hash_password(password)
     
     def check_password(self, password):
         """Verify password"""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return passwords.check_password(password, self.password_hash)
+    
+    def password_needs_rehash(self):
+        """Check if the password hash predates the configured bcrypt cost"""
+        return passwords.needs_rehash(self.password_hash)
     
     def is_admin(self):
         """Check if user is admin"""
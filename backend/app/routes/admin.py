@@ -1,8 +1,17 @@
 from flask import Blueprint, request, jsonify
 from marshmallow import ValidationError
-from app import db
-from app.models import Report, StatusHistory
-from app.schemas.report_schema import UpdateStatusSchema
+from app import db, cache, events
+from app.models import Report, StatusHistory, AuthoritySubscription
+from app.schemas.report_schema import UpdateStatusSchema, TrendQuerySchema, IncidentGroupSchema
+from app.schemas.authority_schema import SubscriptionSchema
+from app.services.stats_service import StatsService
+from app.services.rollup_service import RollupService
+from app.services.notification_service import NotificationService
+from app.services.authority_service import AuthorityService
+from app.services.duplicate_service import DuplicateService
+from app.utils.pagination import paginate_reports
+from app.utils.report_filters import filter_reports
+from app.utils.search import add_highlights
 from app.middleware.auth import admin_required, get_current_user
 
 admin_bp = Blueprint('admin', __name__)
@@ -20,32 +29,17 @@ def get_all_reports():
         params = schema.load(request.args)
         
         # Build query
-        query = Report.query
+        query = filter_reports(Report.query, params)
         
-        if params.get('status'):
-            query = query.filter_by(status=params['status'])
-        
-        if params.get('incident_type'):
-            query = query.filter_by(incident_type=params['incident_type'])
-        
-        # Order by most recent
-        query = query.order_by(Report.created_at.desc())
-        
-        # Paginate
-        page = params.get('page', 1)
-        per_page = params.get('per_page', 20)
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        # Paginate, most recent first
+        reports, pagination = paginate_reports(query, params)
+        items = Report.to_dict_many(reports)
+        if params.get('q'):
+            add_highlights(items, params['q'])
         
         return jsonify({
-            'reports': [report.to_dict() for report in pagination.items],
-            'pagination': {
-                'page': pagination.page,
-                'per_page': pagination.per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
+            'reports': items,
+            'pagination': pagination
         }), 200
         
     except ValidationError as err:
@@ -96,15 +90,21 @@ def update_report_status(report_id):
         )
         
         db.session.add(status_history)
+        StatsService.record_status_change(old_status, data['status'])
+        NotificationService.send_status_update_notification(report, old_status, data['status'])
         db.session.commit()
+        cache.invalidate_report(report_id)
+        
+        # Deliver the queued notifications off the request path
+        NotificationService.dispatch_in_background()
         
-        # TODO: Trigger notification service here
-        # from app.services.notification_service import send_status_update_notification
-        # send_status_update_notification(report, old_status, data['status'])
+        # The stream is public, the admin's comment and identity stay in the history endpoint
+        payload = report.to_dict()
+        events.publish('report.status_changed', {'report': payload, 'old_status': old_status})
         
         return jsonify({
             'message': 'Report status updated successfully',
-            'report': report.to_dict(),
+            'report': payload,
             'status_change': status_history.to_dict()
         }), 200
         
@@ -138,40 +138,244 @@ def get_status_history(report_id):
         return jsonify({'error': 'Failed to fetch history', 'message': str(e)}), 500
 
 
+@admin_bp.route('/reports/<report_id>/duplicates', methods=['GET'])
+@admin_required
+def get_duplicate_candidates(report_id):
+    """Get reports that probably describe the same incident (Admin only)"""
+    try:
+        report = Report.query.get(report_id)
+        
+        if not report:
+            return jsonify({'error': 'Report not found'}), 404
+        
+        return jsonify({
+            'report_id': report_id,
+            'incident_group_id': report.incident_group_id,
+            'candidates': DuplicateService.find_candidates(report)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch duplicates', 'message': str(e)}), 500
+
+
+@admin_bp.route('/reports/<report_id>/incident-group', methods=['PUT'])
+@admin_required
+def set_incident_group(report_id):
+    """
+    Link a report to another report's incident, or unlink it (Admin only)
+    ---
+    Request Body:
+    {
+        "report_id": "<id of a report of the same incident, or null to unlink>"
+    }
+    """
+    try:
+        # Validate request data
+        schema = IncidentGroupSchema()
+        data = schema.load(request.get_json())
+        
+        report = Report.query.get(report_id)
+        
+        if not report:
+            return jsonify({'error': 'Report not found'}), 404
+        
+        if data['report_id'] is None:
+            changed = DuplicateService.unlink(report)
+        else:
+            target = Report.query.get(data['report_id'])
+            if not target:
+                return jsonify({'error': 'Linked report not found'}), 404
+            if target.id == report.id:
+                return jsonify({'error': 'A report cannot be linked to itself'}), 400
+            changed = DuplicateService.link(report, target)
+        
+        db.session.commit()
+        for changed_id in changed:
+            cache.invalidate_report(changed_id)
+        
+        payload = report.to_dict()
+        events.publish('report.updated', {'report': payload})
+        
+        return jsonify({
+            'message': 'Incident group updated successfully',
+            'report': payload
+        }), 200
+        
+    except ValidationError as err:
+        return jsonify({'error': 'Validation error', 'messages': err.messages}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to update incident group', 'message': str(e)}), 500
+
+
 @admin_bp.route('/stats', methods=['GET'])
 @admin_required
 def get_statistics():
     """Get platform statistics (Admin only)"""
     try:
-        from sqlalchemy import func
-        from app.models import User, ReportStatus, IncidentType
+        # Read the materialized counters maintained by StatsService
+        return jsonify({
+            'statistics': StatsService.get_statistics()
+        }), 200
         
-        # Count reports by status
-        status_counts = db.session.query(
-            Report.status,
-            func.count(Report.id)
-        ).group_by(Report.status).all()
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch statistics', 'message': str(e)}), 500
+
+
+@admin_bp.route('/trends', methods=['GET'])
+@admin_required
+def get_trends():
+    """
+    Get report volume over time (Admin only)
+    Query Parameters: ?granularity=day&since=2026-01-01T00:00:00&until=2026-02-01T00:00:00&incident_type=fire&region=kzf0
+    """
+    try:
+        # Validate query parameters
+        schema = TrendQuerySchema()
+        params = schema.load(request.args)
         
-        # Count reports by incident type
-        type_counts = db.session.query(
-            Report.incident_type,
-            func.count(Report.id)
-        ).group_by(Report.incident_type).all()
+        # Bring the rollups up to date (incremental, rate limited per process)
+        RollupService.refresh_if_stale()
         
-        # Total users
-        total_users = User.query.count()
+        trends = RollupService.get_trends(
+            params['granularity'],
+            since=params.get('since'),
+            until=params.get('until'),
+            incident_type=params.get('incident_type'),
+            region=params.get('region')
+        )
         
-        # Total reports
-        total_reports = Report.query.count()
+        return jsonify({
+            'granularity': params['granularity'],
+            'trends': trends
+        }), 200
+        
+    except ValidationError as err:
+        return jsonify({'error': 'Validation error', 'messages': err.messages}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to fetch trends', 'message': str(e)}), 500
+
+
+@admin_bp.route('/subscriptions', methods=['GET'])
+@admin_required
+def get_subscriptions():
+    """Get all authority notification subscriptions (Admin only)"""
+    try:
+        subscriptions = AuthoritySubscription.query.order_by(AuthoritySubscription.name).all()
+        
+        return jsonify({
+            'subscriptions': [s.to_dict() for s in subscriptions]
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch subscriptions', 'message': str(e)}), 500
+
+
+@admin_bp.route('/subscriptions', methods=['POST'])
+@admin_required
+def create_subscription():
+    """
+    Subscribe an authority to new incidents in an area (Admin only)
+    ---
+    Request Body:
+    {
+        "name": "Nairobi County Fire Brigade",
+        "email": "dispatch@example.org",
+        "phone_number": "+254700000000",
+        "incident_types": ["fire", "accident"],
+        "latitude": -1.2921,
+        "longitude": 36.8219,
+        "radius_km": 15
+    }
+    A "polygon" of [[lat, lng], ...] points may be given instead of a circle.
+    Leaving out incident_types subscribes to every type.
+    """
+    try:
+        # Validate request data
+        schema = SubscriptionSchema()
+        data = schema.load(request.get_json())
+        
+        subscription = AuthoritySubscription(**data)
+        
+        db.session.add(subscription)
+        db.session.commit()
+        AuthorityService.invalidate()
+        
+        return jsonify({
+            'message': 'Subscription created successfully',
+            'subscription': subscription.to_dict()
+        }), 201
+        
+    except ValidationError as err:
+        return jsonify({'error': 'Validation error', 'messages': err.messages}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to create subscription', 'message': str(e)}), 500
+
+
+@admin_bp.route('/subscriptions/<subscription_id>', methods=['GET'])
+@admin_required
+def get_subscription(subscription_id):
+    """Get an authority subscription (Admin only)"""
+    subscription = AuthoritySubscription.query.get(subscription_id)
+    
+    if not subscription:
+        return jsonify({'error': 'Subscription not found'}), 404
+    
+    return jsonify({'subscription': subscription.to_dict()}), 200
+
+
+@admin_bp.route('/subscriptions/<subscription_id>', methods=['PUT'])
+@admin_required
+def replace_subscription(subscription_id):
+    """Replace an authority subscription, same body as create (Admin only)"""
+    try:
+        subscription = AuthoritySubscription.query.get(subscription_id)
+        
+        if not subscription:
+            return jsonify({'error': 'Subscription not found'}), 404
+        
+        # Validate request data
+        schema = SubscriptionSchema()
+        data = schema.load(request.get_json())
+        
+        for field in ('email', 'phone_number', 'incident_types', 'latitude', 'longitude', 'radius_km', 'polygon'):
+            setattr(subscription, field, data.get(field))
+        subscription.name = data['name']
+        subscription.is_active = data['is_active']
+        
+        db.session.commit()
+        AuthorityService.invalidate()
         
         return jsonify({
-            'statistics': {
-                'total_users': total_users,
-                'total_reports': total_reports,
-                'reports_by_status': {status: count for status, count in status_counts},
-                'reports_by_type': {itype: count for itype, count in type_counts}
-            }
+            'message': 'Subscription updated successfully',
+            'subscription': subscription.to_dict()
         }), 200
         
+    except ValidationError as err:
+        return jsonify({'error': 'Validation error', 'messages': err.messages}), 400
     except Exception as e:
-        return jsonify({'error': 'Failed to fetch statistics', 'message': str(e)}), 500
\ No newline at end of file
+        db.session.rollback()
+        return jsonify({'error': 'Failed to update subscription', 'message': str(e)}), 500
+
+
+@admin_bp.route('/subscriptions/<subscription_id>', methods=['DELETE'])
+@admin_required
+def delete_subscription(subscription_id):
+    """Delete an authority subscription (Admin only)"""
+    try:
+        subscription = AuthoritySubscription.query.get(subscription_id)
+        
+        if not subscription:
+            return jsonify({'error': 'Subscription not found'}), 404
+        
+        db.session.delete(subscription)
+        db.session.commit()
+        AuthorityService.invalidate()
+        
+        return jsonify({'message': 'Subscription deleted successfully'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to delete subscription', 'message': str(e)}), 500
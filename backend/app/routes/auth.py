@@ -1,13 +1,39 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token
+from flask_jwt_extended import get_jwt, get_jwt_identity
 from marshmallow import ValidationError
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
 from app import db
 from app.models import User
 from app.schemas.auth_schema import RegisterSchema, LoginSchema
+from app.services.stats_service import StatsService
+from app.services.token_service import TokenService
+from app.middleware.auth import refresh_token_required
+from app.utils.passwords import PasswordPoolFull
 
 auth_bp = Blueprint('auth', __name__)
 
 
+def _too_busy():
+    """Response for when the password hashing pool is saturated"""
+    response = jsonify({'error': 'Too many sign-in requests, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 429
+
+
+def _registration_conflict(email, username):
+    """409 message when the email or username is already taken, checked in one query"""
+    taken = db.session.query(User.email, User.username).filter(
+        or_(User.email == email, User.username == username)
+    ).all()
+    
+    if any(row.email == email for row in taken):
+        return 'Email already registered'
+    if taken:
+        return 'Username already taken'
+    return None
+
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """
@@ -28,11 +54,9 @@ def register():
         data = schema.load(request.get_json())
         
         # Check if user already exists
-        if User.query.filter_by(email=data['email']).first():
-            return jsonify({'error': 'Email already registered'}), 409
-        
-        if User.query.filter_by(username=data['username']).first():
-            return jsonify({'error': 'Username already taken'}), 409
+        conflict = _registration_conflict(data['email'], data['username'])
+        if conflict:
+            return jsonify({'error': conflict}), 409
         
         # Create new user
         user = User(
@@ -45,14 +69,22 @@ def register():
         user.set_password(data['password'])
         
         db.session.add(user)
-        db.session.commit()
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # A concurrent registration took the email or username after the check
+            db.session.rollback()
+            conflict = _registration_conflict(data['email'], data['username'])
+            return jsonify({'error': conflict or 'Email or username already registered'}), 409
+        StatsService.record_user_created()
         
-        # Generate access token
-        access_token = create_access_token(identity=user.id)
+        # Generate access and refresh tokens
+        tokens = TokenService.issue(user)
+        db.session.commit()
         
         return jsonify({
             'message': 'User registered successfully',
-            'access_token': access_token,
+            **tokens,
             'user_id': user.id,
             'role': user.role,
             'user': user.to_dict(include_email=True)
@@ -60,6 +92,8 @@ def register():
         
     except ValidationError as err:
         return jsonify({'error': 'Validation error', 'messages': err.messages}), 400
+    except PasswordPoolFull:
+        return _too_busy()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Registration failed', 'message': str(e)}), 500
@@ -90,12 +124,17 @@ def login():
         if not user.is_active:
             return jsonify({'error': 'Account is deactivated'}), 403
         
-        # Generate access token
-        access_token = create_access_token(identity=user.id)
+        # Upgrade hashes made before a change of BCRYPT_LOG_ROUNDS
+        if user.password_needs_rehash():
+            user.set_password(data['password'])
+        
+        # Generate access and refresh tokens
+        tokens = TokenService.issue(user)
+        db.session.commit()
         
         return jsonify({
             'message': 'Login successful',
-            'access_token': access_token,
+            **tokens,
             'user_id': user.id,
             'role': user.role,
             'user': user.to_dict(include_email=True)
@@ -103,5 +142,55 @@ def login():
         
     except ValidationError as err:
         return jsonify({'error': 'Validation error', 'messages': err.messages}), 400
+    except PasswordPoolFull:
+        return _too_busy()
     except Exception as e:
-        return jsonify({'error': 'Login failed', 'message': str(e)}), 500
\ No newline at end of file
+        db.session.rollback()
+        return jsonify({'error': 'Login failed', 'message': str(e)}), 500
+
+
+@auth_bp.route('/refresh', methods=['POST'])
+@refresh_token_required
+def refresh():
+    """
+    Exchange a refresh token for a new access and refresh token
+    ---
+    Headers: Authorization: Bearer <refresh_token>
+    The presented refresh token is revoked; reusing it revokes the whole session
+    """
+    try:
+        claims = get_jwt()
+        result = TokenService.rotate(claims['jti'], claims.get('fam'), get_jwt_identity())
+        
+        if result is None:
+            return jsonify({'error': 'Invalid refresh token', 'message': 'Token has been revoked'}), 401
+        
+        tokens, user = result
+        return jsonify({
+            'message': 'Token refreshed successfully',
+            **tokens,
+            'user_id': user.id,
+            'role': user.role
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Token refresh failed', 'message': str(e)}), 500
+
+
+@auth_bp.route('/logout', methods=['POST'])
+@refresh_token_required
+def logout():
+    """
+    End a session by revoking its refresh tokens
+    ---
+    Headers: Authorization: Bearer <refresh_token>
+    Access tokens already issued stay valid until they expire
+    """
+    try:
+        TokenService.revoke_family(get_jwt().get('fam'))
+        return jsonify({'message': 'Logged out successfully'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Logout failed', 'message': str(e)}), 500
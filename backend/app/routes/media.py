@@ -1,8 +1,18 @@
-from flask import Blueprint, request, jsonify
+import mimetypes
+from datetime import datetime
+from flask import Blueprint, request, jsonify, current_app, redirect
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
-from app.models import Report, Media
-from app.utils.file_utils import save_file, delete_file
+from marshmallow import ValidationError
+from werkzeug.utils import secure_filename, send_file
+from app import db, cache, storage
+from app.models import Report, Media, UploadSession
+from app.schemas.media_schema import CreateUploadSchema, CompleteUploadSchema
+from app.services.media_pipeline import ThumbnailService, VideoJobService
+from app.services.media_storage import MediaStorage
+from app.utils.file_utils import (
+    save_file, allowed_file, resolve_upload_path, accel_redirect_uri,
+    start_upload, append_chunk, upload_checksum, finish_upload, abort_upload
+)
 
 media_bp = Blueprint('media', __name__)
 
@@ -49,11 +59,21 @@ def upload_media(report_id):
             media_type=media_type,
             file_size=file_info['file_size'],
             mime_type=file_info['mime_type'],
+            checksum=file_info['checksum'],
             report_id=report_id
         )
         
+        # Identical content that was already processed shares its variants
+        if not MediaStorage.reuse_variants(media):
+            ThumbnailService.mark_pending(media)
+            VideoJobService.enqueue(media)
         db.session.add(media)
+        report.updated_at = datetime.utcnow()
         db.session.commit()
+        cache.invalidate_report(report_id)
+        
+        # Generate thumbnails in the background
+        ThumbnailService.enqueue(media)
         
         return jsonify({
             'message': 'Media uploaded successfully',
@@ -83,15 +103,350 @@ def delete_media(report_id, media_id):
         if media.report.user_id != user_id:
             return jsonify({'error': 'You can only delete media from your own reports'}), 403
         
-        # Delete file from filesystem
-        delete_file(media.file_path)
-        
-        # Delete database record
+        # Delete database record, the file goes once nothing else shares it
+        MediaStorage.schedule_deletion([media])
+        media.report.updated_at = datetime.utcnow()
         db.session.delete(media)
         db.session.commit()
+        cache.invalidate_report(report_id)
+        MediaStorage.reap_in_background()
         
         return jsonify({'message': 'Media deleted successfully'}), 200
         
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': 'Failed to delete media', 'message': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to delete media', 'message': str(e)}), 500
+
+
+@media_bp.route('/<report_id>/media/<media_id>/file', methods=['GET'])
+def download_media(report_id, media_id):
+    """
+    Serve a media file or one of its generated variants
+    ---
+    Query Parameters:
+    - variant: Variant name (e.g. 'small', 'poster', 'stream'), the original by default
+    - format: Variant format (e.g. 'webp', 'jpg', 'mp4'), the first available by default
+    
+    Range, If-None-Match and If-Modified-Since requests are answered with 206
+    or 304. With MEDIA_SENDFILE_MODE set the body is left to the web server.
+    """
+    try:
+        media = Media.query.get(media_id)
+        
+        if not media or media.report_id != report_id:
+            return jsonify({'error': 'Media not found'}), 404
+        
+        variant = request.args.get('variant')
+        file_path, mime_type = media.file_path, media.mime_type
+        if variant:
+            formats = (media.variants or {}).get(variant)
+            if not formats:
+                return jsonify({'error': 'Variant not found'}), 404
+            fmt = request.args.get('format') or next(iter(formats))
+            if fmt not in formats:
+                return jsonify({'error': 'Variant format not found'}), 404
+            file_path = formats[fmt]['file_path']
+            mime_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        
+        # Object storage serves the bytes itself
+        url = storage.download_url(file_path)
+        if url:
+            return redirect(url)
+        
+        path = resolve_upload_path(file_path)
+        if path is None:
+            return jsonify({'error': 'File not found'}), 404
+        
+        mode = current_app.config['MEDIA_SENDFILE_MODE']
+        max_age = current_app.config['MEDIA_CACHE_MAX_AGE']
+        
+        if mode == 'x-accel-redirect':
+            # nginx handles ranges and validators for the internal location itself
+            response = current_app.response_class(mimetype=mime_type)
+            response.headers['X-Accel-Redirect'] = accel_redirect_uri(path)
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            return response
+        
+        return send_file(
+            path,
+            request.environ,
+            mimetype=mime_type,
+            conditional=True,
+            etag=True,
+            max_age=max_age,
+            use_x_sendfile=mode == 'x-sendfile',
+            response_class=current_app.response_class
+        )
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch media', 'message': str(e)}), 500
+
+
+def _get_upload_session(report_id, upload_id, lock=False):
+    """
+    Load an upload session owned by the current user, or return an error response
+    
+    With `lock` the row stays locked until the request commits, so requests
+    changing the same upload (two PATCHes at one offset, a cancel during a
+    chunk) run one after the other and each sees the offset the last one left.
+    """
+    query = UploadSession.query.filter(UploadSession.id == upload_id)
+    if lock:
+        query = query.with_for_update()
+    upload = query.first()
+    
+    if not upload or upload.report_id != report_id:
+        return None, (jsonify({'error': 'Upload not found'}), 404)
+    
+    if upload.user_id != get_jwt_identity():
+        return None, (jsonify({'error': 'You can only access your own uploads'}), 403)
+    
+    return upload, None
+
+
+@media_bp.route('/<report_id>/media/uploads', methods=['POST'])
+@jwt_required()
+def create_upload(report_id):
+    """
+    Start a resumable, chunked media upload
+    ---
+    Request Body:
+    {
+        "filename": "crash.mp4",
+        "media_type": "video",
+        "total_size": 73400320,
+        "mime_type": "video/mp4",
+        "direct": false,
+        "checksum": "<hex SHA-256 of the whole file>"
+    }
+    
+    With "direct": true (object storage only) the response carries a presigned
+    request in "direct_upload" for sending the file straight to storage, the
+    upload is then finalized through the complete endpoint. The file is sent
+    even when identical content is already stored, since the upload is how
+    the client proves it holds the content of its declared checksum.
+    """
+    try:
+        # Validate request data
+        schema = CreateUploadSchema()
+        data = schema.load(request.get_json())
+        
+        # Get report
+        report = Report.query.get(report_id)
+        
+        if not report:
+            return jsonify({'error': 'Report not found'}), 404
+        
+        # Check ownership
+        user_id = get_jwt_identity()
+        if report.user_id != user_id:
+            return jsonify({'error': 'You can only upload media to your own reports'}), 403
+        
+        if not allowed_file(data['filename'], data['media_type']):
+            allowed = current_app.config[f"ALLOWED_{data['media_type'].upper()}_EXTENSIONS"]
+            return jsonify({'error': f'File type not allowed. Allowed types: {allowed}'}), 400
+        
+        if data['total_size'] > current_app.config['MAX_UPLOAD_SIZE']:
+            return jsonify({'error': 'File too large'}), 413
+        
+        upload = UploadSession(
+            filename=secure_filename(data['filename']),
+            media_type=data['media_type'],
+            mime_type=data.get('mime_type') or mimetypes.guess_type(data['filename'])[0] or 'application/octet-stream',
+            total_size=data['total_size'],
+            direct=data['direct'],
+            checksum=data['checksum'].lower() if data.get('checksum') else None,
+            report_id=report_id,
+            user_id=user_id
+        )
+        db.session.add(upload)
+        db.session.flush()
+        
+        result = {'message': 'Upload started', 'upload': upload.to_dict()}
+        
+        if upload.direct:
+            # The client PUTs the file straight to storage
+            extension = upload.filename.rsplit('.', 1)[-1].lower()
+            result['direct_upload'] = storage.presigned_upload(
+                upload.id, upload.checksum, extension, upload.total_size, upload.mime_type
+            )
+        else:
+            start_upload(upload.id)
+            result['chunk_size'] = current_app.config['UPLOAD_CHUNK_SIZE']
+        
+        db.session.commit()
+        
+        return jsonify(result), 201
+        
+    except ValidationError as err:
+        return jsonify({'error': 'Validation error', 'messages': err.messages}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to start upload', 'message': str(e)}), 500
+
+
+@media_bp.route('/<report_id>/media/uploads/<upload_id>', methods=['GET'])
+@jwt_required()
+def get_upload(report_id, upload_id):
+    """Get the progress of a resumable upload, used to resume after a dropped connection"""
+    upload, error = _get_upload_session(report_id, upload_id)
+    if error:
+        return error
+    
+    return jsonify({'upload': upload.to_dict()}), 200
+
+
+@media_bp.route('/<report_id>/media/uploads/<upload_id>', methods=['PATCH'])
+@jwt_required()
+def upload_chunk(report_id, upload_id):
+    """
+    Append a chunk to a resumable upload
+    ---
+    Headers:
+    - Upload-Offset: byte offset of this chunk, must equal the current offset
+    Body: raw chunk bytes (application/octet-stream)
+    """
+    try:
+        upload, error = _get_upload_session(report_id, upload_id, lock=True)
+        if error:
+            return error
+        
+        if upload.direct:
+            return jsonify({'error': 'Direct uploads are sent to storage, not to this endpoint'}), 409
+        
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+        except ValueError:
+            return jsonify({'error': 'Upload-Offset header is required'}), 400
+        
+        if offset != upload.received_size:
+            return jsonify({
+                'error': 'Offset mismatch, resume from the current offset',
+                'upload': upload.to_dict()
+            }), 409
+        
+        # Stream the body straight to disk
+        written = append_chunk(upload.id, offset, request.stream, upload.total_size - offset)
+        
+        upload.received_size = offset + written
+        db.session.commit()
+        
+        return jsonify({'upload': upload.to_dict()}), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to upload chunk', 'message': str(e)}), 500
+
+
+@media_bp.route('/<report_id>/media/uploads/<upload_id>/complete', methods=['POST'])
+@jwt_required()
+def complete_upload(report_id, upload_id):
+    """
+    Finalize a resumable upload and attach it to the report
+    ---
+    Request Body (optional):
+    {
+        "checksum": "<hex SHA-256 of the whole file>"
+    }
+    """
+    try:
+        # Validate request data
+        schema = CompleteUploadSchema()
+        data = schema.load(request.get_json(silent=True) or {})
+        
+        upload, error = _get_upload_session(report_id, upload_id, lock=True)
+        if error:
+            return error
+        
+        extension = upload.filename.rsplit('.', 1)[-1].lower()
+        
+        if upload.direct:
+            if storage.staged_size(upload.id, extension) != upload.total_size:
+                return jsonify({
+                    'error': 'The file has not reached storage yet',
+                    'upload': upload.to_dict()
+                }), 409
+            checksum = upload.checksum
+            file_path = storage.promote(upload.id, checksum, extension)
+        else:
+            if not upload.is_complete:
+                return jsonify({
+                    'error': 'Upload is incomplete',
+                    'upload': upload.to_dict()
+                }), 409
+            
+            checksum = upload_checksum(upload.id)
+            expected = data.get('checksum') or upload.checksum
+            
+            if expected and expected.lower() != checksum:
+                abort_upload(upload.id)
+                db.session.delete(upload)
+                db.session.commit()
+                return jsonify({'error': 'Checksum mismatch, the upload has been discarded'}), 422
+            
+            # Claim the content before it can share a stored file, see MediaStorage
+            upload.checksum = checksum
+            db.session.commit()
+            
+            file_path = finish_upload(upload.id, extension, checksum)
+        
+        # Create media record
+        media = Media(
+            filename=upload.filename,
+            file_path=file_path,
+            media_type=upload.media_type,
+            file_size=upload.total_size,
+            mime_type=upload.mime_type,
+            checksum=checksum,
+            report_id=report_id
+        )
+        
+        # Identical content that was already processed shares its variants
+        if not MediaStorage.reuse_variants(media):
+            ThumbnailService.mark_pending(media)
+            VideoJobService.enqueue(media)
+        db.session.add(media)
+        db.session.delete(upload)
+        Report.query.get(report_id).updated_at = datetime.utcnow()
+        db.session.commit()
+        cache.invalidate_report(report_id)
+        
+        # Generate thumbnails in the background
+        ThumbnailService.enqueue(media)
+        
+        return jsonify({
+            'message': 'Media uploaded successfully',
+            'media': media.to_dict()
+        }), 201
+        
+    except ValidationError as err:
+        return jsonify({'error': 'Validation error', 'messages': err.messages}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to complete upload', 'message': str(e)}), 500
+
+
+@media_bp.route('/<report_id>/media/uploads/<upload_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_upload(report_id, upload_id):
+    """Abandon a resumable upload and discard the received bytes"""
+    try:
+        upload, error = _get_upload_session(report_id, upload_id, lock=True)
+        if error:
+            return error
+        
+        if upload.direct:
+            storage.discard_staged(upload.id, upload.filename.rsplit('.', 1)[-1].lower())
+        else:
+            abort_upload(upload.id)
+        db.session.delete(upload)
+        db.session.commit()
+        
+        return jsonify({'message': 'Upload cancelled'}), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to cancel upload', 'message': str(e)}), 500
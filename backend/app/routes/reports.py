@@ -1,9 +1,19 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify
 from flask_jwt_extended import get_jwt_identity
 from marshmallow import ValidationError
-from app import db
-from app.models import Report, User
-from app.schemas.report_schema import CreateReportSchema, UpdateReportSchema, ReportQuerySchema
+from sqlalchemy import func
+from app import db, cache, events
+from app.models import Report, ReportStatus
+from app.schemas.report_schema import CreateReportSchema, UpdateReportSchema, ReportQuerySchema, ReportStreamSchema, ClusterQuerySchema, UserStatsQuerySchema
+from app.services.stats_service import StatsService
+from app.services.media_storage import MediaStorage
+from app.services.notification_service import NotificationService
+from app.services.duplicate_service import DuplicateService
+from app.utils.etag import compute_etag, not_modified, json_with_etag
+from app.utils.pagination import paginate_reports, page_fingerprint
+from app.utils.events import SubscriberLimitReached
+from app.utils.report_filters import filter_reports, cluster_reports, matches_report
+from app.utils.search import add_highlights
 from app.middleware.auth import login_required, get_current_user
 
 reports_bp = Blueprint('reports', __name__)
@@ -14,6 +24,9 @@ def get_reports():
     """
     Get all reports with optional filtering
     Query Parameters: ?status=pending&incident_type=accident&page=1&per_page=20
+    Location: ?near=-1.29,36.82&radius_km=5 or ?bbox=south,west,north,east
+    Cursor mode: ?cursor=&per_page=20, then ?cursor=<next_cursor> (add include_total=false to skip the count)
+    Search: ?q=uhuru highway, ranked by relevance with a highlighted snippet per report (newest first with a cursor)
     """
     try:
         # Validate query parameters
@@ -21,53 +34,118 @@ def get_reports():
         params = schema.load(request.args)
         
         # Build query
-        query = Report.query
-        
-        if params.get('status'):
-            query = query.filter_by(status=params['status'])
-        
-        if params.get('incident_type'):
-            query = query.filter_by(incident_type=params['incident_type'])
+        query = filter_reports(Report.query, params)
+        
+        # Answer conditional requests from the ids and update times on the page
+        etag = compute_etag(cache.normalize(params), page_fingerprint(query, params))
+        response = not_modified(etag)
+        if response:
+            return response
+        
+        def build_page():
+            # Paginate, most recent first
+            reports, pagination = paginate_reports(query, params)
+            items = Report.to_dict_many(reports)
+            if params.get('q'):
+                add_highlights(items, params['q'])
+            
+            return {
+                'reports': items,
+                'pagination': pagination
+            }
         
-        if params.get('user_id'):
-            query = query.filter_by(user_id=params['user_id'])
+        return json_with_etag(cache.report_list(params, build_page, etag), etag)
         
-        # Order by most recent
-        query = query.order_by(Report.created_at.desc())
+    except ValidationError as err:
+        return jsonify({'error': 'Validation error', 'messages': err.messages}), 400
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch reports', 'message': str(e)}), 500
+
+
+@reports_bp.route('/clusters', methods=['GET'])
+def get_report_clusters():
+    """
+    Get report counts aggregated into map grid cells
+    Query Parameters: ?zoom=12&bbox=south,west,north,east&status=pending&incident_type=accident
+    """
+    try:
+        # Validate query parameters
+        schema = ClusterQuerySchema()
+        params = schema.load(request.args)
         
-        # Paginate
-        page = params.get('page', 1)
-        per_page = params.get('per_page', 20)
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        query = filter_reports(Report.query, params)
+        bits, clusters = cluster_reports(query, params['zoom'])
         
         return jsonify({
-            'reports': [report.to_dict() for report in pagination.items],
-            'pagination': {
-                'page': pagination.page,
-                'per_page': pagination.per_page,
-                'total': pagination.total,
-                'pages': pagination.pages,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
+            'zoom': params['zoom'],
+            'cell_bits': bits,
+            'clusters': clusters
         }), 200
         
     except ValidationError as err:
         return jsonify({'error': 'Validation error', 'messages': err.messages}), 400
     except Exception as e:
-        return jsonify({'error': 'Failed to fetch reports', 'message': str(e)}), 500
+        return jsonify({'error': 'Failed to fetch clusters', 'message': str(e)}), 500
+
+
+@reports_bp.route('/stream', methods=['GET'])
+def stream_reports():
+    """
+    Push report changes as Server-Sent Events instead of polling
+    Query Parameters: same filters as the list, ?status=&incident_type=&bbox= or ?near=&radius_km=
+    Events: report.created, report.updated, report.status_changed
+    Reconnecting clients send Last-Event-ID and receive the events they missed
+    """
+    try:
+        schema = ReportStreamSchema()
+        params = schema.load(request.args)
+    except ValidationError as err:
+        return jsonify({'error': 'Validation error', 'messages': err.messages}), 400
+    
+    def matches(event):
+        data = event['data']
+        return matches_report(data['report'], params, data.get('old_status'))
+    
+    try:
+        subscription = events.subscribe(matches, request.headers.get('Last-Event-ID'))
+    except SubscriberLimitReached:
+        return jsonify({'error': 'Too many open streams, try again later'}), 503
+    
+    return Response(
+        events.stream(subscription, current_app.config['EVENTS_HEARTBEAT']),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # stop nginx from buffering the stream
+        }
+    )
 
 
 @reports_bp.route('/<report_id>', methods=['GET'])
 def get_report(report_id):
     """Get a single report by ID"""
     try:
-        report = Report.query.get(report_id)
+        # Check the version before loading or serializing the report
+        updated_at = db.session.query(Report.updated_at).filter(Report.id == report_id).scalar()
         
-        if not report:
+        if updated_at is None:
             return jsonify({'error': 'Report not found'}), 404
         
-        return jsonify({'report': report.to_dict()}), 200
+        etag = compute_etag(report_id, updated_at.isoformat())
+        response = not_modified(etag)
+        if response:
+            return response
+        
+        def build_report():
+            report = Report.query.get(report_id)
+            return {'report': report.to_dict()} if report else None
+        
+        payload = cache.report_detail(report_id, build_report, etag)
+        
+        if payload is None:
+            return jsonify({'error': 'Report not found'}), 404
+        
+        return json_with_etag(payload, etag)
         
     except Exception as e:
         return jsonify({'error': 'Failed to fetch report', 'message': str(e)}), 500
@@ -108,12 +186,33 @@ def create_report():
             user_id=user_id
         )
         
+        # Look for reports of the same incident before this one is in the session
+        duplicate_candidates = DuplicateService.find_candidates(report)
+        
         db.session.add(report)
+        db.session.flush()
+        grouped = DuplicateService.auto_group(report, duplicate_candidates)
+        StatsService.record_report_created(report)
+        NotificationService.send_new_report_notification(report)
         db.session.commit()
+        cache.invalidate_report(report.id)
+        for grouped_id in grouped:
+            cache.invalidate_report(grouped_id)
+        NotificationService.dispatch_in_background()
+        
+        payload = report.to_dict()
+        events.publish('report.created', {'report': payload})
+        
+        # A report that starts a group by being matched changes as well
+        others = [grouped_id for grouped_id in grouped if grouped_id != report.id]
+        if others:
+            for other in Report.to_dict_many(Report.query.filter(Report.id.in_(others))):
+                events.publish('report.updated', {'report': other})
         
         return jsonify({
             'message': 'Report created successfully',
-            'report': report.to_dict()
+            'report': payload,
+            'duplicate_candidates': duplicate_candidates
         }), 201
         
     except ValidationError as err:
@@ -140,20 +239,27 @@ def update_report(report_id):
         
         # Check ownership or admin
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = get_current_user()
         if report.user_id != user_id and not user.is_admin():
             return jsonify({'error': 'You can only edit your own reports'}), 403
         
+        if 'incident_type' in data:
+            StatsService.record_type_change(report.incident_type, data['incident_type'])
+        
         # Update fields
         for key, value in data.items():
             if hasattr(report, key):
                 setattr(report, key, value)
         
         db.session.commit()
+        cache.invalidate_report(report.id)
+        
+        payload = report.to_dict()
+        events.publish('report.updated', {'report': payload})
         
         return jsonify({
             'message': 'Report updated successfully',
-            'report': report.to_dict()
+            'report': payload
         }), 200
         
     except ValidationError as err:
@@ -166,28 +272,55 @@ def update_report(report_id):
 @reports_bp.route('/stats/<user_id>', methods=['GET'])
 @login_required
 def get_user_stats(user_id):
-    """Get user report statistics"""
+    """
+    Get user report statistics
+    Query Parameters: ?since=2026-01-01T00:00:00&until=2026-02-01T00:00:00&by_type=true
+    """
     try:
+        # Validate query parameters
+        schema = UserStatsQuerySchema()
+        params = schema.load(request.args)
+        
         current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         
         # Users can only view their own stats, admins can view any stats
         if user_id != current_user_id and not user.is_admin():
             return jsonify({'error': 'Access denied'}), 403
         
-        # Get report counts by status
-        total = Report.query.filter_by(user_id=user_id).count()
-        pending = Report.query.filter_by(user_id=user_id, status='pending').count()
-        resolved = Report.query.filter_by(user_id=user_id, status='resolved').count()
-        rejected = Report.query.filter_by(user_id=user_id, status='rejected').count()
+        # Count reports by status (and type) in a single query
+        group_by = [Report.status, Report.incident_type] if params['by_type'] else [Report.status]
+        query = db.session.query(*group_by, func.count(Report.id)).filter(Report.user_id == user_id)
         
-        return jsonify({
-            'total': total,
-            'pending': pending,
-            'resolved': resolved,
-            'rejected': rejected
-        }), 200
+        if params.get('since'):
+            query = query.filter(Report.created_at >= params['since'])
+        
+        if params.get('until'):
+            query = query.filter(Report.created_at < params['until'])
+        
+        rows = query.group_by(*group_by).all()
         
+        stats = {'total': 0}
+        stats.update({status: 0 for status in ReportStatus.all()})
+        by_type = {}
+        
+        for row in rows:
+            status, count = row[0], row[-1]
+            stats['total'] += count
+            stats[status] = stats.get(status, 0) + count
+            
+            if params['by_type']:
+                type_stats = by_type.setdefault(row[1], {'total': 0, **{s: 0 for s in ReportStatus.all()}})
+                type_stats['total'] += count
+                type_stats[status] = type_stats.get(status, 0) + count
+        
+        if params['by_type']:
+            stats['by_type'] = by_type
+        
+        return jsonify(stats), 200
+        
+    except ValidationError as err:
+        return jsonify({'error': 'Validation error', 'messages': err.messages}), 400
     except Exception as e:
         return jsonify({'error': 'Failed to fetch stats', 'message': str(e)}), 500
 
@@ -205,18 +338,19 @@ def delete_report(report_id):
         
         # Check ownership
         user_id = get_jwt_identity()
-        user = User.query.get(user_id)
+        user = get_current_user()
         
         if report.user_id != user_id and not user.is_admin():
             return jsonify({'error': 'You can only delete your own reports'}), 403
         
-        # Delete associated media files
-        from app.utils.file_utils import delete_file
-        for media in report.media.all():
-            delete_file(media.file_path)
+        # Media files are removed in the background once the delete is committed
+        MediaStorage.schedule_deletion(report.media.all())
         
         db.session.delete(report)
+        StatsService.record_report_deleted(report)
         db.session.commit()
+        cache.invalidate_report(report_id)
+        MediaStorage.reap_in_background()
         
         return jsonify({'message': 'Report deleted successfully'}), 200
         
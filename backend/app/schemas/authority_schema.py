@@ -0,0 +1,37 @@
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
+from app.models.report import IncidentType
+
+
+class SubscriptionSchema(Schema):
+    """Schema for creating or replacing an authority subscription (admin only)"""
+    name = fields.Str(required=True, validate=validate.Length(min=1, max=120))
+    email = fields.Email(required=False, allow_none=True)
+    phone_number = fields.Str(required=False, allow_none=True, validate=validate.Length(max=20))
+    incident_types = fields.List(
+        fields.Str(validate=validate.OneOf(IncidentType.all())),
+        required=False, allow_none=True, validate=validate.Length(min=1)
+    )
+    latitude = fields.Float(required=False, allow_none=True, validate=validate.Range(min=-90, max=90))
+    longitude = fields.Float(required=False, allow_none=True, validate=validate.Range(min=-180, max=180))
+    radius_km = fields.Float(required=False, allow_none=True, validate=validate.Range(min=0, max=2000, min_inclusive=False))
+    polygon = fields.List(
+        fields.List(fields.Float(), validate=validate.Length(equal=2)),
+        required=False, allow_none=True, validate=validate.Length(min=3, max=500)
+    )
+    is_active = fields.Bool(required=False, load_default=True)
+    
+    @validates_schema
+    def validate_subscription(self, data, **kwargs):
+        """Require a way to reach the authority and exactly one kind of area"""
+        if not data.get('email') and not data.get('phone_number'):
+            raise ValidationError('An email or phone number is required', 'email')
+        
+        circle = [data.get(key) is not None for key in ('latitude', 'longitude', 'radius_km')]
+        if data.get('polygon'):
+            if any(circle):
+                raise ValidationError('Use either a polygon or a circle, not both', 'polygon')
+            for latitude, longitude in data['polygon']:
+                if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+                    raise ValidationError('Polygon coordinates out of range', 'polygon')
+        elif not all(circle):
+            raise ValidationError('Provide latitude, longitude and radius_km, or a polygon', 'radius_km')
@@ -0,0 +1,29 @@
+from marshmallow import Schema, fields, validate, validates, validates_schema, ValidationError
+from app import storage
+
+
+class CreateUploadSchema(Schema):
+    """Schema for starting a resumable upload"""
+    filename = fields.Str(required=True, validate=validate.Length(min=1, max=255))
+    media_type = fields.Str(required=True, validate=validate.OneOf(['image', 'video']))
+    total_size = fields.Int(required=True, validate=validate.Range(min=1))
+    mime_type = fields.Str(required=False, allow_none=True, validate=validate.Length(max=100))
+    direct = fields.Bool(load_default=False)
+    checksum = fields.Str(required=False, allow_none=True, validate=validate.Regexp(r'^[0-9a-fA-F]{64}$'))
+    
+    @validates('direct')
+    def validate_direct_supported(self, value, **kwargs):
+        """Presigned uploads need object storage"""
+        if value and not storage.supports_presigned_uploads:
+            raise ValidationError('Direct uploads require object storage, use a chunked upload instead')
+    
+    @validates_schema
+    def validate_direct(self, data, **kwargs):
+        """Direct uploads are addressed by content, so the checksum must be known up front"""
+        if data.get('direct') and not data.get('checksum'):
+            raise ValidationError('Direct uploads require the SHA-256 checksum of the file', 'checksum')
+
+
+class CompleteUploadSchema(Schema):
+    """Schema for finalizing a resumable upload"""
+    checksum = fields.Str(required=False, allow_none=True, validate=validate.Length(equal=64))
@@ -1,5 +1,36 @@
-from marshmallow import Schema, fields, validate, validates_schema, ValidationError
+from datetime import timezone
+from marshmallow import Schema, fields, validate, validates, validates_schema, ValidationError
 from app.models.report import ReportStatus, IncidentType
+from app.utils.pagination import decode_cursor
+from app.utils.search import has_search_terms
+
+
+class LatLngField(fields.Field):
+    """A "lat,lng" query parameter, loaded as a (latitude, longitude) tuple"""
+    
+    def _deserialize(self, value, attr, data, **kwargs):
+        try:
+            latitude, longitude = (float(part) for part in str(value).split(','))
+        except ValueError:
+            raise ValidationError('Must be in the form "lat,lng"')
+        if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+            raise ValidationError('Coordinates out of range')
+        return latitude, longitude
+
+
+class BoundingBoxField(fields.Field):
+    """A "south,west,north,east" query parameter, loaded as a tuple of floats"""
+    
+    def _deserialize(self, value, attr, data, **kwargs):
+        try:
+            south, west, north, east = (float(part) for part in str(value).split(','))
+        except ValueError:
+            raise ValidationError('Must be in the form "south,west,north,east"')
+        if not -90 <= south <= north <= 90:
+            raise ValidationError('Latitudes must satisfy -90 <= south <= north <= 90')
+        if not -180 <= west <= east <= 180:
+            raise ValidationError('Longitudes must satisfy -180 <= west <= east <= 180')
+        return south, west, north, east
 
 
 class CreateReportSchema(Schema):
@@ -29,10 +60,75 @@ class UpdateStatusSchema(Schema):
     comment = fields.Str(required=False, allow_none=True, validate=validate.Length(max=500))
 
 
-class ReportQuerySchema(Schema):
-    """Schema for querying reports"""
+class IncidentGroupSchema(Schema):
+    """Schema for linking a report to another report's incident (admin only)"""
+    report_id = fields.Str(required=True, allow_none=True)
+
+
+class ReportFilterSchema(Schema):
+    """Report filters shared by the list endpoints and the live event stream"""
     status = fields.Str(required=False, validate=validate.OneOf(ReportStatus.all()))
     incident_type = fields.Str(required=False, validate=validate.OneOf(IncidentType.all()))
+    bbox = BoundingBoxField(required=False)
+    near = LatLngField(required=False)
+    radius_km = fields.Float(required=False, validate=validate.Range(min=0, max=500, min_inclusive=False))
+    
+    @validates_schema
+    def validate_near(self, data, **kwargs):
+        """A radius search needs both a centre and a radius"""
+        if ('near' in data) != ('radius_km' in data):
+            raise ValidationError('near and radius_km must be provided together', 'near')
+
+
+class ReportQuerySchema(ReportFilterSchema):
+    """Schema for querying reports"""
     page = fields.Int(required=False, validate=validate.Range(min=1), load_default=1)
     per_page = fields.Int(required=False, validate=validate.Range(min=1, max=100), load_default=20)
-    user_id = fields.Str(required=False)
\ No newline at end of file
+    user_id = fields.Str(required=False)
+    cursor = fields.Str(required=False)
+    include_total = fields.Bool(required=False, load_default=True)
+    q = fields.Str(required=False, validate=validate.Length(min=1, max=200))
+    incident_group_id = fields.Str(required=False)
+    
+    @validates('q')
+    def validate_q(self, value, **kwargs):
+        """Reject searches made only of punctuation"""
+        if not has_search_terms(value):
+            raise ValidationError('Search must contain at least one word')
+    
+    @validates('cursor')
+    def validate_cursor(self, value, **kwargs):
+        """Reject cursors that were not issued by the API"""
+        if value:
+            try:
+                decode_cursor(value)
+            except ValueError:
+                raise ValidationError('Invalid cursor')
+
+
+class ReportStreamSchema(ReportFilterSchema):
+    """Schema for filtering the live report event stream"""
+
+
+class ClusterQuerySchema(Schema):
+    """Schema for querying map clusters"""
+    zoom = fields.Int(required=True, validate=validate.Range(min=0, max=22))
+    bbox = BoundingBoxField(required=True)
+    status = fields.Str(required=False, validate=validate.OneOf(ReportStatus.all()))
+    incident_type = fields.Str(required=False, validate=validate.OneOf(IncidentType.all()))
+
+
+class UserStatsQuerySchema(Schema):
+    """Schema for querying a user's report statistics"""
+    since = fields.NaiveDateTime(required=False, timezone=timezone.utc)
+    until = fields.NaiveDateTime(required=False, timezone=timezone.utc)
+    by_type = fields.Bool(required=False, load_default=False)
+
+
+class TrendQuerySchema(Schema):
+    """Schema for querying report trends"""
+    granularity = fields.Str(required=False, validate=validate.OneOf(['hour', 'day']), load_default='day')
+    since = fields.NaiveDateTime(required=False, timezone=timezone.utc)
+    until = fields.NaiveDateTime(required=False, timezone=timezone.utc)
+    incident_type = fields.Str(required=False, validate=validate.OneOf(IncidentType.all()))
+    region = fields.Str(required=False, validate=validate.Length(min=1, max=12))
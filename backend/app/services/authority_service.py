@@ -0,0 +1,139 @@
+"""
+Authority Service
+
+Authorities subscribe to incident types within a circle or a polygon. New
+reports are matched against an in-memory grid index: each subscription is
+filed under every geocell (at INDEX_BITS precision, roughly 20 x 40 km at
+the equator) that its area touches, so a lookup only runs the exact
+geometry test on the few subscriptions filed under the report's own cell.
+Areas touching more than MAX_CELLS_PER_SUBSCRIPTION cells, such as
+nationwide subscriptions, are kept in a short list checked for every report.
+
+The index is an immutable snapshot shared by all threads of a process. It
+is rebuilt when this process changes a subscription, and other processes
+notice changes within AUTHORITY_INDEX_REFRESH_INTERVAL seconds through a
+single (count, max(updated_at)) query.
+"""
+
+import math
+import threading
+import time
+from collections import defaultdict, namedtuple
+from flask import current_app
+from app import db
+from app.models import AuthoritySubscription
+from app.utils.geo import encode_geocell, cell_size, cells_in_box, haversine_km, point_in_polygon
+
+INDEX_BITS = 20
+MAX_CELLS_PER_SUBSCRIPTION = 512
+
+
+class Authority(namedtuple('Authority', [
+    'id', 'name', 'email', 'phone_number', 'incident_types',
+    'latitude', 'longitude', 'radius_km', 'polygon'
+])):
+    """Detached, read-only copy of a subscription held by the index"""
+    
+    __slots__ = ()
+    
+    @classmethod
+    def from_subscription(cls, subscription):
+        return cls(
+            subscription.id,
+            subscription.name,
+            subscription.email,
+            subscription.phone_number,
+            frozenset(subscription.incident_types) if subscription.incident_types else None,
+            subscription.latitude,
+            subscription.longitude,
+            subscription.radius_km,
+            tuple(tuple(point) for point in subscription.polygon) if subscription.polygon else None
+        )
+    
+    def matches(self, latitude, longitude, incident_type):
+        """Whether a report of this type at this point falls under the subscription"""
+        if self.incident_types is not None and incident_type not in self.incident_types:
+            return False
+        if self.polygon:
+            return point_in_polygon(latitude, longitude, self.polygon)
+        return haversine_km(self.latitude, self.longitude, latitude, longitude) <= self.radius_km
+
+
+class SubscriptionIndex:
+    """Grid of subscriptions keyed by geocell"""
+    
+    def __init__(self, subscriptions):
+        self.cells = defaultdict(list)
+        self.wide = []
+        self.size = 0
+        
+        height, width = cell_size(INDEX_BITS)
+        for subscription in subscriptions:
+            authority = Authority.from_subscription(subscription)
+            south, west, north, east = subscription.bounds()
+            
+            # Estimate first so huge areas never enumerate their cells
+            rows = math.ceil((north - south) / height) + 1
+            cols = math.ceil((east - west) / width) + 1
+            if rows * cols > MAX_CELLS_PER_SUBSCRIPTION:
+                self.wide.append(authority)
+            else:
+                for cell in cells_in_box(south, west, north, east, INDEX_BITS):
+                    self.cells[cell].append(authority)
+            self.size += 1
+    
+    def candidates(self, latitude, longitude):
+        """Subscriptions whose bounding cells include the point"""
+        return self.cells.get(encode_geocell(latitude, longitude, INDEX_BITS), []) + self.wide
+    
+    def match(self, latitude, longitude, incident_type):
+        """Subscriptions covering a report of this type at this point"""
+        return [
+            authority for authority in self.candidates(latitude, longitude)
+            if authority.matches(latitude, longitude, incident_type)
+        ]
+
+
+class AuthorityService:
+    """Service for matching new incidents to subscribed authorities"""
+    
+    _index = None
+    _signature = None
+    _checked_at = 0.0
+    _lock = threading.Lock()
+    
+    @staticmethod
+    def _table_signature():
+        return tuple(db.session.query(
+            db.func.count(AuthoritySubscription.id),
+            db.func.max(AuthoritySubscription.updated_at)
+        ).one())
+    
+    @classmethod
+    def get_index(cls):
+        """Current subscription index, rebuilt when the table has changed"""
+        interval = current_app.config['AUTHORITY_INDEX_REFRESH_INTERVAL']
+        if cls._index is not None and time.monotonic() - cls._checked_at < interval:
+            return cls._index
+        
+        with cls._lock:
+            signature = cls._table_signature()
+            if cls._index is None or signature != cls._signature:
+                active = AuthoritySubscription.query.filter_by(is_active=True).all()
+                cls._index = SubscriptionIndex(active)
+                cls._signature = signature
+            cls._checked_at = time.monotonic()
+            return cls._index
+    
+    @classmethod
+    def invalidate(cls):
+        """Drop the index after a subscription changed in this process"""
+        with cls._lock:
+            cls._index = None
+    
+    @classmethod
+    def match(cls, report):
+        """Authorities to notify about a report"""
+        if report.latitude is None or report.longitude is None:
+            return []
+        return cls.get_index().match(report.latitude, report.longitude, report.incident_type)
@@ -0,0 +1,141 @@
+"""
+Duplicate Service
+
+A serious incident draws many reports of the same thing from the same spot
+within minutes. New reports are checked against recent reports nearby:
+candidates are found through the geocell index (DUPLICATE_RADIUS_KM) and the
+created_at index (DUPLICATE_WINDOW_MINUTES either side), and only their
+stored SimHash fingerprints are compared, so the check costs one indexed
+query over a handful of rows.
+
+Reports judged to describe the same incident share an incident_group_id,
+the id of the group's first report. A new report joins the group of its
+best candidate automatically when they have the same incident type and a
+similarity of at least DUPLICATE_AUTO_GROUP_SIMILARITY; admins can link and
+unlink reports by hand.
+"""
+
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import Report, ReportStatus
+from app.utils.geo import haversine_km
+from app.utils.report_filters import within_radius
+from app.utils.simhash import similarity
+
+# Upper bound on the nearby reports compared for one check
+MAX_COMPARED = 500
+
+
+class DuplicateService:
+    """Service for detecting and grouping reports of the same incident"""
+    
+    @staticmethod
+    def find_candidates(report, limit=10):
+        """
+        Recent nearby reports whose text is similar to this report's
+        
+        Works for reports that have not been added to the session yet.
+        Returns dicts sorted by similarity, most similar first.
+        """
+        config = current_app.config
+        fingerprint = report.fingerprint()
+        created_at = report.created_at or datetime.utcnow()
+        window = timedelta(minutes=config['DUPLICATE_WINDOW_MINUTES'])
+        
+        query = db.session.query(
+            Report.id, Report.title, Report.incident_type, Report.latitude, Report.longitude,
+            Report.simhash, Report.incident_group_id, Report.created_at
+        ).filter(
+            Report.created_at.between(created_at - window, created_at + window),
+            Report.status != ReportStatus.REJECTED,
+            Report.simhash.isnot(None)
+        )
+        if report.id is not None:
+            query = query.filter(Report.id != report.id)
+        query = within_radius(query, report.latitude, report.longitude, config['DUPLICATE_RADIUS_KM'])
+        
+        candidates = []
+        for row in query.order_by(Report.created_at.desc()).limit(MAX_COMPARED):
+            score = similarity(fingerprint, row.simhash)
+            if score < config['DUPLICATE_MIN_SIMILARITY']:
+                continue
+            candidates.append({
+                'id': row.id,
+                'title': row.title,
+                'incident_type': row.incident_type,
+                'incident_group_id': row.incident_group_id,
+                'similarity': round(score, 3),
+                'distance_km': round(haversine_km(report.latitude, report.longitude, row.latitude, row.longitude), 3),
+                'created_at': row.created_at.isoformat()
+            })
+        
+        candidates.sort(key=lambda candidate: (-candidate['similarity'], candidate['distance_km']))
+        return candidates[:limit]
+    
+    @staticmethod
+    def auto_group(report, candidates):
+        """
+        Join the group of the best candidate when it is clearly the same incident
+        
+        Returns the ids of the reports changed, empty when the report was not grouped.
+        """
+        threshold = current_app.config['DUPLICATE_AUTO_GROUP_SIMILARITY']
+        for candidate in candidates:
+            if candidate['similarity'] >= threshold and candidate['incident_type'] == report.incident_type:
+                return DuplicateService.link(report, Report.query.get(candidate['id']))
+        return []
+    
+    @staticmethod
+    def link(report, target):
+        """Put a report in the incident group of another report, returns the ids of the reports changed"""
+        group_id = target.incident_group_id or target.id
+        changed = [report.id]
+        if target.incident_group_id is None:
+            target.incident_group_id = group_id
+            changed.append(target.id)
+        
+        # A group's first report takes the rest of its group along
+        if report.id is not None and report.incident_group_id == report.id and group_id != report.id:
+            members = Report.query.filter(
+                Report.incident_group_id == report.id,
+                Report.id != report.id
+            ).all()
+            for member in members:
+                member.incident_group_id = group_id
+            changed.extend(member.id for member in members)
+        
+        report.incident_group_id = group_id
+        return changed
+    
+    @staticmethod
+    def unlink(report):
+        """Take a report out of its incident group, returns the ids of the reports changed"""
+        group_id = report.incident_group_id
+        report.incident_group_id = None
+        
+        if group_id is None:
+            return [report.id]
+        
+        members = Report.query.filter(
+            Report.incident_group_id == group_id,
+            Report.id != report.id
+        ).order_by(Report.created_at, Report.id).all()
+        
+        if len(members) < 2:
+            # A report left on its own is no longer a group
+            new_group_id = None
+        elif group_id == report.id:
+            # The group was named after this report, hand it to the next oldest member
+            new_group_id = members[0].id
+        else:
+            return [report.id]
+        
+        for member in members:
+            member.incident_group_id = new_group_id
+        return [report.id] + [member.id for member in members]
+    
+    @staticmethod
+    def is_follow_up(report):
+        """Whether a report was grouped into an incident that was already reported"""
+        return report.incident_group_id is not None and report.incident_group_id != report.id
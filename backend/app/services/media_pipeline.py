@@ -0,0 +1,296 @@
+"""
+Media Pipeline
+
+Generates thumbnails and WebP previews for uploaded images on a small pool
+of worker threads, after the upload request has returned. Videos go through
+a persisted job queue processed by separate worker processes, which extract
+a poster frame and transcode a streaming rendition with ffmpeg. The same
+workers pick up images still pending after THUMBNAIL_TIMEOUT seconds, whose
+thread pool went away with a restart.
+
+Progress is tracked on Media.processing_status and the results are stored in
+Media.variants, which Media.to_dict exposes to clients.
+
+Configuration:
+    THUMBNAIL_SIZES   = 'small:160,medium:480,large:1024'
+    THUMBNAIL_WORKERS = 2   (0 processes inline, used by the tests)
+    THUMBNAIL_QUALITY = 80
+    THUMBNAIL_TIMEOUT = 600 (seconds before a pending image is picked up by the workers)
+    FFMPEG_BINARY, VIDEO_MAX_HEIGHT, VIDEO_MAX_KBPS,
+    VIDEO_JOB_MAX_ATTEMPTS, VIDEO_JOB_TIMEOUT
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.orm.exc import StaleDataError
+from app import db, cache, storage
+from app.models import Report, Media, MediaJob, JobStatus
+from app.utils.image_utils import thumbnails_available, parse_sizes, generate_thumbnails
+from app.utils.video_utils import VideoProcessingError, extract_poster, transcode_for_streaming
+
+
+class ProcessingStatus:
+    """Media processing status constants"""
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'
+
+
+def _touch_report(media):
+    """Move the parent report's updated_at, call in the transaction that changes the media"""
+    Report.query.filter(Report.id == media.report_id).update(
+        {'updated_at': datetime.utcnow()}, synchronize_session=False
+    )
+
+
+class ThumbnailService:
+    """Service for generating image thumbnails in the background"""
+    
+    _executor = None
+    _lock = threading.Lock()
+    
+    @classmethod
+    def _get_executor(cls, workers):
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnails')
+            return cls._executor
+    
+    @staticmethod
+    def mark_pending(media):
+        """Flag a new image for processing, call before committing it"""
+        if media.media_type == 'image':
+            media.processing_status = ProcessingStatus.PENDING if thumbnails_available() else ProcessingStatus.SKIPPED
+    
+    @classmethod
+    def enqueue(cls, media):
+        """Schedule thumbnail generation for a committed media row"""
+        if media.media_type != 'image' or media.processing_status != ProcessingStatus.PENDING:
+            return
+        
+        app = current_app._get_current_object()
+        workers = app.config['THUMBNAIL_WORKERS']
+        
+        if workers <= 0:
+            cls.process(media.id)
+        else:
+            cls._get_executor(workers).submit(cls._run_in_app, app, media.id)
+    
+    @classmethod
+    def _run_in_app(cls, app, media_id):
+        with app.app_context():
+            try:
+                cls.process(media_id)
+            finally:
+                db.session.remove()
+    
+    @staticmethod
+    def process(media_id):
+        """Generate the configured thumbnails for one image"""
+        media = Media.query.get(media_id)
+        if media is None or media.media_type != 'image' or media.processing_status != ProcessingStatus.PENDING:
+            return
+        
+        try:
+            with storage.fetch(media.file_path) as source, storage.workdir() as workdir:
+                variants = generate_thumbnails(
+                    source,
+                    parse_sizes(current_app.config['THUMBNAIL_SIZES']),
+                    current_app.config['THUMBNAIL_QUALITY'],
+                    output_stem=os.path.join(workdir, 'thumbnail')
+                )
+                media.variants = storage.save_variants(media.file_path, variants)
+            media.processing_status = ProcessingStatus.READY
+        except Exception as e:
+            current_app.logger.error(f"Thumbnail generation failed for media {media_id}: {str(e)}")
+            media.processing_status = ProcessingStatus.FAILED
+        
+        try:
+            # Clients revalidating the report have to see the new variants
+            _touch_report(media)
+            db.session.commit()
+        except StaleDataError:
+            # Deleted while the thumbnails were generated, `flask scan-orphans`
+            # removes the variant files
+            db.session.rollback()
+            current_app.logger.info(f"Media {media_id} was deleted during thumbnail generation")
+            return
+        cache.invalidate_report(media.report_id)
+    
+    @staticmethod
+    def process_stale(limit=None):
+        """
+        Process images left pending for longer than THUMBNAIL_TIMEOUT, returns the count
+        
+        The thread pool lives in the web process, so work queued there is
+        lost on a restart. Each image is locked while it is processed, so
+        several workers can run this at once.
+        """
+        stale_before = datetime.utcnow() - timedelta(seconds=current_app.config['THUMBNAIL_TIMEOUT'])
+        processed = 0
+        
+        while limit is None or processed < limit:
+            media = Media.query.filter(
+                Media.media_type == 'image',
+                Media.processing_status == ProcessingStatus.PENDING,
+                Media.created_at < stale_before
+            ).order_by(Media.created_at).with_for_update(skip_locked=True).first()
+            if media is None:
+                db.session.rollback()
+                break
+            ThumbnailService.process(media.id)
+            processed += 1
+        return processed
+
+
+class VideoJobService:
+    """
+    Persisted job queue for video poster frames and streaming renditions
+
+    Jobs are written in the same transaction as the Media row and picked up
+    by `flask media-worker`, which runs one or more local worker processes.
+    A job is claimed with a conditional UPDATE so several workers can poll the
+    same table safely; jobs left running by a crashed worker are reclaimed
+    after VIDEO_JOB_TIMEOUT seconds, and failed once they have used up
+    VIDEO_JOB_MAX_ATTEMPTS.
+    """
+    
+    KIND = 'video'
+    
+    @staticmethod
+    def enqueue(media):
+        """Queue processing for a new video, call before committing it"""
+        if media.media_type != 'video':
+            return None
+        media.processing_status = ProcessingStatus.PENDING
+        job = MediaJob(kind=VideoJobService.KIND, media=media)
+        db.session.add(job)
+        return job
+    
+    @staticmethod
+    def _fail_exhausted(stale_before):
+        """Give up on running jobs that were reclaimed until they ran out of attempts"""
+        exhausted = MediaJob.query.filter(
+            MediaJob.kind == VideoJobService.KIND,
+            MediaJob.status == JobStatus.RUNNING,
+            MediaJob.started_at < stale_before,
+            MediaJob.attempts >= current_app.config['VIDEO_JOB_MAX_ATTEMPTS']
+        ).all()
+        
+        for job in exhausted:
+            job.status = JobStatus.FAILED
+            job.error = job.error or 'Worker stopped while processing the job'
+            job.finished_at = datetime.utcnow()
+            job.media.processing_status = ProcessingStatus.FAILED
+            _touch_report(job.media)
+        db.session.commit()
+        for job in exhausted:
+            cache.invalidate_report(job.media.report_id)
+    
+    @staticmethod
+    def claim_next():
+        """Atomically take the next runnable job, or return None"""
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=current_app.config['VIDEO_JOB_TIMEOUT'])
+        VideoJobService._fail_exhausted(stale_before)
+        
+        runnable = db.or_(
+            db.and_(MediaJob.status == JobStatus.QUEUED, MediaJob.available_at <= now),
+            db.and_(
+                MediaJob.status == JobStatus.RUNNING,
+                MediaJob.started_at < stale_before,
+                MediaJob.attempts < current_app.config['VIDEO_JOB_MAX_ATTEMPTS']
+            )
+        )
+        
+        candidates = db.session.query(MediaJob.id, MediaJob.status, MediaJob.attempts).filter(
+            MediaJob.kind == VideoJobService.KIND, runnable
+        ).order_by(MediaJob.available_at).limit(5).all()
+        
+        for job_id, status, attempts in candidates:
+            claimed = MediaJob.query.filter(
+                MediaJob.id == job_id,
+                MediaJob.status == status,
+                MediaJob.attempts == attempts
+            ).update({
+                'status': JobStatus.RUNNING,
+                'attempts': attempts + 1,
+                'started_at': now
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                return MediaJob.query.get(job_id)
+        return None
+    
+    @staticmethod
+    def process(job):
+        """Run a claimed job and record the outcome on the job and its media"""
+        config = current_app.config
+        media = job.media
+        
+        try:
+            with storage.fetch(media.file_path) as source, storage.workdir() as workdir:
+                stem = os.path.join(workdir, 'video')
+                generated = {
+                    'poster': extract_poster(source, ffmpeg=config['FFMPEG_BINARY'], output_stem=stem),
+                    'stream': transcode_for_streaming(
+                        source,
+                        ffmpeg=config['FFMPEG_BINARY'],
+                        max_height=config['VIDEO_MAX_HEIGHT'],
+                        max_kbps=config['VIDEO_MAX_KBPS'],
+                        output_stem=stem
+                    )
+                }
+                media.variants = {**(media.variants or {}), **storage.save_variants(media.file_path, generated)}
+            media.processing_status = ProcessingStatus.READY
+            job.status = JobStatus.DONE
+            job.error = None
+        except Exception as e:
+            # Storage and database errors are retried like failed transcodes,
+            # a job must never be left running
+            db.session.rollback()
+            if not isinstance(e, VideoProcessingError):
+                current_app.logger.error(f"Video job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            permanent = isinstance(e, VideoProcessingError) and e.permanent
+            if permanent or job.attempts >= config['VIDEO_JOB_MAX_ATTEMPTS']:
+                job.status = JobStatus.FAILED
+                media.processing_status = ProcessingStatus.FAILED
+            else:
+                # Retry with exponential backoff
+                job.status = JobStatus.QUEUED
+                job.available_at = datetime.utcnow() + timedelta(seconds=30 * 2 ** job.attempts)
+        
+        job.finished_at = datetime.utcnow()
+        _touch_report(media)
+        db.session.commit()
+        cache.invalidate_report(media.report_id)
+    
+    @staticmethod
+    def run_pending(limit=None):
+        """Process runnable jobs until none are left (or `limit` is reached), returns the count"""
+        processed = 0
+        while limit is None or processed < limit:
+            job = VideoJobService.claim_next()
+            if job is None:
+                break
+            VideoJobService.process(job)
+            processed += 1
+        return processed
+    
+    @staticmethod
+    def work_forever(poll_interval=2.0):
+        """Worker process main loop, also recovers stale thumbnail work"""
+        while True:
+            try:
+                if not VideoJobService.run_pending(limit=1) + ThumbnailService.process_stale(limit=1):
+                    time.sleep(poll_interval)
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Video worker error: {str(e)}")
+                time.sleep(poll_interval)
@@ -0,0 +1,262 @@
+"""
+Media Storage
+
+Uploaded files are stored by content (see MediaStore.store), so several
+Media rows can share one file and its generated variants. A file is only
+removed once no Media row references it any more; the reference count is a
+query over the indexed checksum column rather than a stored counter, so it
+can never drift from the rows themselves.
+
+Deleting media never touches storage inside the request. The files are
+recorded in the file_deletions outbox in the same transaction as the delete,
+and a reaper removes them in batches once that transaction has committed. A
+failed commit therefore leaves nothing behind, and a failed unlink is
+retried with backoff by `flask media-reaper`, which polls the outbox.
+
+An upload can share an existing file (MediaStore.store keeps it) before
+its Media row is committed, so "no Media row" alone does not make a file
+safe to remove. Outbox entries only become runnable MEDIA_REAPER_GRACE
+seconds after the delete, by which time an upload that was sharing the file
+has committed its row, and checksums claimed by an open UploadSession are
+kept as well. `flask scan-orphans` reconciles storage against the media table for
+anything that slipped through (crashes, files written by aborted requests).
+`flask expire-uploads` drops resumable uploads abandoned by their clients.
+
+Configuration:
+    MEDIA_REAPER_WORKERS    = 1   (0 reaps inline, used by the tests)
+    MEDIA_REAPER_BATCH_SIZE = 100
+    MEDIA_REAPER_GRACE      = 900  (seconds before a deleted file may be removed)
+    UPLOAD_SESSION_TIMEOUT  = 1 day  (idle time before an upload expires)
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db, storage
+from app.models import Media, FileDeletion, UploadSession
+from app.services.media_pipeline import ProcessingStatus
+from app.utils.file_utils import abort_upload, upload_temp_path
+
+# Key prefixes holding media files; images/ and videos/ predate content
+# addressing, tmp/ holds partial, staged and scratch files of uploads
+STORAGE_PREFIXES = ('objects', 'images', 'videos', 'tmp')
+
+# How long a claimed outbox batch stays hidden from other reapers
+REAPER_LEASE = timedelta(minutes=5)
+
+
+def _variant_paths(variants):
+    for formats in (variants or {}).values():
+        for info in formats.values():
+            yield info['file_path']
+
+
+class MediaStorage:
+    """Service for sharing and releasing content-addressed media files"""
+    
+    _executor = None
+    _lock = threading.Lock()
+    
+    @staticmethod
+    def reuse_variants(media):
+        """
+        Copy the variants of an already processed upload of the same file
+        
+        Call before adding a new Media row to the session. Returns True when
+        processing can be skipped.
+        """
+        processed = Media.query.filter(
+            Media.checksum == media.checksum,
+            Media.file_path == media.file_path,
+            Media.processing_status == ProcessingStatus.READY
+        ).first()
+        
+        if processed is None:
+            return False
+        
+        media.variants = processed.variants
+        media.processing_status = ProcessingStatus.READY
+        return True
+    
+    @staticmethod
+    def schedule_deletion(media_items):
+        """Record the files of media rows being deleted, call before committing the delete"""
+        available_at = datetime.utcnow() + timedelta(seconds=current_app.config['MEDIA_REAPER_GRACE'])
+        db.session.add_all([
+            FileDeletion(
+                file_path=media.file_path,
+                checksum=media.checksum,
+                variants=media.variants,
+                available_at=available_at
+            )
+            for media in media_items
+        ])
+    
+    @classmethod
+    def reap_in_background(cls):
+        """Process the deletion outbox after a delete has been committed"""
+        app = current_app._get_current_object()
+        workers = app.config['MEDIA_REAPER_WORKERS']
+        
+        if workers <= 0:
+            cls.reap()
+            return
+        
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='media-reaper')
+        cls._executor.submit(cls._run_in_app, app)
+    
+    @classmethod
+    def _run_in_app(cls, app):
+        with app.app_context():
+            try:
+                cls.reap()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Media reaper error: {str(e)}")
+            finally:
+                db.session.remove()
+    
+    @staticmethod
+    def _claim_batch(batch_size):
+        """Lease the next runnable outbox entries so concurrent reapers skip them"""
+        now = datetime.utcnow()
+        candidates = db.session.query(FileDeletion.id, FileDeletion.available_at).filter(
+            FileDeletion.available_at <= now
+        ).order_by(FileDeletion.available_at).limit(batch_size).all()
+        
+        claimed = [
+            deletion_id for deletion_id, available_at in candidates
+            if FileDeletion.query.filter(
+                FileDeletion.id == deletion_id,
+                FileDeletion.available_at == available_at
+            ).update({'available_at': now + REAPER_LEASE}, synchronize_session=False)
+        ]
+        db.session.commit()
+        
+        if not claimed:
+            return []
+        return FileDeletion.query.filter(FileDeletion.id.in_(claimed)).all()
+    
+    @staticmethod
+    def _still_referenced(deletions):
+        """File paths of a batch that a Media row points at or an open upload has claimed"""
+        checksums = {deletion.checksum for deletion in deletions if deletion.checksum}
+        if not checksums:
+            return set()
+        referenced = {
+            file_path for (file_path,) in db.session.query(Media.file_path).filter(
+                Media.checksum.in_(checksums)
+            )
+        }
+        claimed = {
+            checksum for (checksum,) in db.session.query(UploadSession.checksum).filter(
+                UploadSession.checksum.in_(checksums)
+            )
+        }
+        referenced.update(deletion.file_path for deletion in deletions if deletion.checksum in claimed)
+        return referenced
+    
+    @staticmethod
+    def reap(batch_size=None):
+        """
+        Remove the files of committed deletions that are no longer referenced
+        
+        Works through the outbox in batches until nothing is runnable. Entries
+        that fail are retried with exponential backoff. Returns the number of
+        files removed.
+        """
+        batch_size = batch_size or current_app.config['MEDIA_REAPER_BATCH_SIZE']
+        removed = 0
+        
+        while True:
+            batch = MediaStorage._claim_batch(batch_size)
+            if not batch:
+                return removed
+            
+            referenced = MediaStorage._still_referenced(batch)
+            for deletion in batch:
+                try:
+                    if deletion.file_path not in referenced:
+                        for path in _variant_paths(deletion.variants):
+                            storage.delete(path)
+                        if storage.delete(deletion.file_path):
+                            removed += 1
+                    db.session.delete(deletion)
+                except Exception as e:
+                    current_app.logger.error(f"Failed to delete {deletion.file_path}: {str(e)}")
+                    deletion.attempts += 1
+                    deletion.error = str(e)
+                    deletion.available_at = datetime.utcnow() + timedelta(seconds=30 * 2 ** deletion.attempts)
+            db.session.commit()
+    
+    @staticmethod
+    def scan_orphans(min_age=timedelta(hours=1), delete=False):
+        """
+        Find stored files that no Media row, outbox entry or open upload references
+        
+        Files younger than `min_age` are left alone, they may belong to an
+        upload whose Media row is not committed yet. Returns the orphaned keys,
+        which are also removed when `delete` is set.
+        """
+        referenced = set()
+        for upload_id, filename in db.session.query(UploadSession.id, UploadSession.filename):
+            referenced.add(storage.key(upload_temp_path(upload_id)))
+            referenced.add(storage.staging_key(upload_id, filename.rsplit('.', 1)[-1].lower()))
+        rows = db.session.query(Media.file_path, Media.variants).yield_per(1000)
+        pending = db.session.query(FileDeletion.file_path, FileDeletion.variants).yield_per(1000)
+        for query in (rows, pending):
+            for file_path, variants in query:
+                referenced.add(storage.key(file_path))
+                referenced.update(storage.key(path) for path in _variant_paths(variants))
+        
+        cutoff = datetime.utcnow() - min_age
+        orphans = [
+            key
+            for prefix in STORAGE_PREFIXES
+            for key, modified in storage.list(prefix)
+            if key not in referenced and modified < cutoff
+        ]
+        
+        if delete:
+            for key in orphans:
+                storage.delete(storage.location(key))
+        return orphans
+    
+    @staticmethod
+    def expire_uploads():
+        """
+        Delete upload sessions idle for longer than UPLOAD_SESSION_TIMEOUT
+        
+        Partial files of chunked uploads and staged direct uploads go with
+        them. Sessions locked by a request still writing to them are skipped.
+        Returns the number expired.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['UPLOAD_SESSION_TIMEOUT'])
+        expired = UploadSession.query.filter(
+            UploadSession.updated_at < cutoff
+        ).with_for_update(skip_locked=True).all()
+        
+        for upload in expired:
+            if upload.direct:
+                storage.discard_staged(upload.id, upload.filename.rsplit('.', 1)[-1].lower())
+            else:
+                abort_upload(upload.id)
+            db.session.delete(upload)
+        db.session.commit()
+        return len(expired)
+    
+    @staticmethod
+    def work_forever(poll_interval=30.0):
+        """Reaper main loop, retries backed-off deletions and expires abandoned uploads"""
+        while True:
+            try:
+                if not MediaStorage.reap() + MediaStorage.expire_uploads():
+                    time.sleep(poll_interval)
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Media reaper error: {str(e)}")
+                time.sleep(poll_interval)
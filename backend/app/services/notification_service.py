@@ -1,99 +1,329 @@
 """
-Notification Service - Placeholder for future implementation
+Notification Service
 
-This service will handle:
-1. Email notifications
-2. SMS notifications
-3. Push notifications
+Email and SMS notifications go through the notifications outbox. Messages
+are rendered and queued in the same transaction as the change that caused
+them, then delivered after commit by a small pool of worker threads, so
+provider latency never sits on the request path and nothing is lost when a
+provider is down.
 
-When a report status changes, notifications will be sent to:
-- Report owner
-- Relevant authorities
+Workers claim due messages in batches, group them per channel and hand each
+group to that channel's transport in one call (one SMTP connection, one bulk
+SMS request). Failed messages are retried with exponential backoff until
+NOTIFICATION_MAX_ATTEMPTS is reached. `flask notification-worker` picks up
+retries and anything queued while no web process was running.
+
+When a report status changes, notifications are sent to:
+- Report owner (email, and SMS when a phone number is on file)
+
+When a report is created, notifications are sent to:
+- Report owner (email confirmation)
+- Authorities subscribed to its incident type and location (see AuthorityService),
+  unless the report was grouped into an incident reported before (see DuplicateService)
+
+Configuration:
+    NOTIFICATION_WORKERS      = 2   (0 delivers inline, used by the tests)
+    NOTIFICATION_BATCH_SIZE   = 50
+    NOTIFICATION_MAX_ATTEMPTS = 5
+    EMAIL_TRANSPORT, SMS_TRANSPORT (see notification_transports)
 """
 
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from flask import current_app
+from app import db
+from app.models import Notification, NotificationStatus
+from app.services.authority_service import AuthorityService
+from app.services.duplicate_service import DuplicateService
+from app.services.notification_transports import get_transport
+
+# How long claimed messages stay hidden from other workers
+DELIVERY_LEASE = timedelta(minutes=5)
+
+
+def _label(status):
+    """Human readable form of a status constant"""
+    return status.replace('_', ' ')
 
 
 class NotificationService:
-    """Service for sending notifications"""
+    """Service for queueing and delivering notifications"""
+    
+    _executor = None
+    _lock = threading.Lock()
+    
+    @staticmethod
+    def queue(channel, kind, to, body, subject=None, report_id=None):
+        """Add a message to the outbox, it is sent once the current transaction commits"""
+        notification = Notification(
+            channel=channel,
+            kind=kind,
+            recipient=to,
+            subject=subject,
+            body=body,
+            report_id=report_id
+        )
+        db.session.add(notification)
+        return notification
     
     @staticmethod
     def send_status_update_notification(report, old_status, new_status):
         """
-        Send notification when report status changes
+        Queue notifications for a report status change, call before committing
         
         Args:
             report: Report object
             old_status: Previous status
             new_status: New status
-        
-        Future Implementation:
-        - Send email to report owner
-        - Send SMS to report owner
-        - Send push notification
         """
         current_app.logger.info(
             f"[NOTIFICATION] Report {report.id} status changed: {old_status} -> {new_status}"
         )
         
-        # TODO: Implement email notification
-        # EmailService.send_status_update_email(
-        #     to=report.reporter.email,
-        #     report_id=report.id,
-        #     title=report.title,
-        #     old_status=old_status,
-        #     new_status=new_status
-        # )
+        EmailService.send_status_update_email(
+            to=report.reporter.email,
+            report_id=report.id,
+            title=report.title,
+            old_status=old_status,
+            new_status=new_status
+        )
         
-        # TODO: Implement SMS notification
-        # if report.reporter.phone_number:
-        #     SMSService.send_status_update_sms(
-        #         to=report.reporter.phone_number,
-        #         report_id=report.id,
-        #         new_status=new_status
-        #     )
+        if report.reporter.phone_number:
+            SMSService.send_status_update_sms(
+                to=report.reporter.phone_number,
+                report_id=report.id,
+                new_status=new_status
+            )
     
     @staticmethod
     def send_new_report_notification(report):
         """
-        Send notification when new report is created
+        Queue notifications for a new report, call before committing
         
         Args:
             report: Report object
-        
-        Future Implementation:
-        - Notify relevant authorities based on incident type and location
-        - Send confirmation email to report owner
         """
         current_app.logger.info(
             f"[NOTIFICATION] New report created: {report.id} - {report.incident_type}"
         )
         
-        # TODO: Notify authorities
-        # AuthorityNotificationService.notify_new_incident(report)
+        EmailService.send_report_received_email(
+            to=report.reporter.email,
+            report_id=report.id,
+            title=report.title
+        )
+        
+        # Authorities were already alerted to an incident this report was grouped into
+        if DuplicateService.is_follow_up(report):
+            return
+        
+        # Authorities subscribed to this incident type and location
+        for authority in AuthorityService.match(report):
+            if authority.email:
+                EmailService.send_new_incident_email(to=authority.email, report=report)
+            if authority.phone_number:
+                SMSService.send_new_incident_sms(to=authority.phone_number, report=report)
+    
+    @classmethod
+    def dispatch_in_background(cls):
+        """Deliver queued notifications, call after the transaction that queued them commits"""
+        app = current_app._get_current_object()
+        workers = app.config['NOTIFICATION_WORKERS']
+        
+        if workers <= 0:
+            cls.deliver_pending()
+            return
+        
+        with cls._lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='notifications')
+        cls._executor.submit(cls._run_in_app, app)
+    
+    @classmethod
+    def _run_in_app(cls, app):
+        with app.app_context():
+            try:
+                cls.deliver_pending()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Notification delivery error: {str(e)}")
+            finally:
+                db.session.remove()
+    
+    @staticmethod
+    def _claim_batch(batch_size):
+        """
+        Lease the next due messages so concurrent workers skip them
+        
+        Three statements whatever the batch size: pick the due ids (skipping
+        rows another worker has locked), lease them in one UPDATE, then load
+        the rows that carry this worker's lease.
+        """
+        now = datetime.utcnow()
+        leased_until = now + DELIVERY_LEASE
+        due = [
+            notification_id for (notification_id,) in db.session.query(Notification.id).filter(
+                Notification.status == NotificationStatus.QUEUED,
+                Notification.available_at <= now
+            ).order_by(Notification.available_at).limit(batch_size).with_for_update(skip_locked=True)
+        ]
+        if not due:
+            db.session.commit()
+            return []
+        
+        # The conditions are checked again, a worker that read the same ids first keeps them
+        Notification.query.filter(
+            Notification.id.in_(due),
+            Notification.status == NotificationStatus.QUEUED,
+            Notification.available_at <= now
+        ).update({'available_at': leased_until}, synchronize_session=False)
+        db.session.commit()
+        
+        return Notification.query.filter(
+            Notification.id.in_(due),
+            Notification.available_at == leased_until
+        ).all()
+    
+    @staticmethod
+    def _record_result(notification, error):
+        """Mark a message sent, or schedule its retry"""
+        notification.attempts += 1
+        
+        if error is None:
+            notification.status = NotificationStatus.SENT
+            notification.sent_at = datetime.utcnow()
+            notification.error = None
+            return
+        
+        notification.error = error
+        if notification.attempts >= current_app.config['NOTIFICATION_MAX_ATTEMPTS']:
+            notification.status = NotificationStatus.FAILED
+        else:
+            notification.available_at = datetime.utcnow() + timedelta(seconds=30 * 2 ** notification.attempts)
+    
+    @staticmethod
+    def deliver_pending(batch_size=None):
+        """Send due messages in per-channel batches until none are left, returns the number sent"""
+        batch_size = batch_size or current_app.config['NOTIFICATION_BATCH_SIZE']
+        sent = 0
+        
+        while True:
+            batch = NotificationService._claim_batch(batch_size)
+            if not batch:
+                return sent
+            
+            by_channel = defaultdict(list)
+            for notification in batch:
+                by_channel[notification.channel].append(notification)
+            
+            for channel, notifications in by_channel.items():
+                transport = get_transport(channel)
+                for start in range(0, len(notifications), transport.max_batch_size):
+                    chunk = notifications[start:start + transport.max_batch_size]
+                    messages = [
+                        {'to': n.recipient, 'subject': n.subject, 'body': n.body}
+                        for n in chunk
+                    ]
+                    try:
+                        results = transport.send_batch(messages)
+                    except Exception as e:
+                        current_app.logger.error(f"{channel} delivery failed: {str(e)}")
+                        results = [str(e)] * len(chunk)
+                    
+                    for notification, error in zip(chunk, results):
+                        NotificationService._record_result(notification, error)
+                        sent += error is None
+            
+            db.session.commit()
+    
+    @staticmethod
+    def work_forever(poll_interval=5.0):
+        """Worker main loop, delivers retries and messages queued by other processes"""
+        while True:
+            try:
+                if not NotificationService.deliver_pending():
+                    time.sleep(poll_interval)
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.error(f"Notification worker error: {str(e)}")
+                time.sleep(poll_interval)
 
 
 class EmailService:
-    """Email notification service - To be implemented"""
+    """Email notifications, delivered through the configured email transport"""
     
     @staticmethod
     def send_status_update_email(to, report_id, title, old_status, new_status):
-        """Send email notification for status update"""
-        # TODO: Implement using Flask-Mail or SendGrid
-        pass
+        """Queue an email for a status update"""
+        return NotificationService.queue(
+            'email', 'status_update', to,
+            subject=f'Your report "{title}" is now {_label(new_status)}',
+            body=(
+                f'The status of your report "{title}" changed from {_label(old_status)} to {_label(new_status)}.\n\n'
+                f'Report reference: {report_id}'
+            ),
+            report_id=report_id
+        )
+    
+    @staticmethod
+    def send_report_received_email(to, report_id, title):
+        """Queue a confirmation email for a new report"""
+        return NotificationService.queue(
+            'email', 'new_report', to,
+            subject=f'We received your report "{title}"',
+            body=(
+                f'Thank you for reporting "{title}". We will let you know when its status changes.\n\n'
+                f'Report reference: {report_id}'
+            ),
+            report_id=report_id
+        )
+    
+    @staticmethod
+    def send_new_incident_email(to, report):
+        """Queue an email alerting an authority to a new incident"""
+        location = report.address or f'{report.latitude:.5f}, {report.longitude:.5f}'
+        return NotificationService.queue(
+            'email', 'new_incident', to,
+            subject=f'New {_label(report.incident_type)} report: {report.title}',
+            body=(
+                f'{report.title}\n\n{report.description}\n\n'
+                f'Location: {location}\n'
+                f'Report reference: {report.id}'
+            ),
+            report_id=report.id
+        )
     
     @staticmethod
     def send_welcome_email(to, username):
-        """Send welcome email to new users"""
-        # TODO: Implement
-        pass
+        """Queue a welcome email for a new user"""
+        return NotificationService.queue(
+            'email', 'welcome', to,
+            subject='Welcome to AJALI!',
+            body=f'Hi {username}, your account is ready. Thank you for helping keep our roads safe.'
+        )
 
 
 class SMSService:
-    """SMS notification service - To be implemented"""
+    """SMS notifications, delivered through the configured SMS transport"""
     
     @staticmethod
     def send_status_update_sms(to, report_id, new_status):
-        """Send SMS notification for status update"""
-        # TODO: Implement using Twilio or Africa's Talking
-        pass
\ No newline at end of file
+        """Queue an SMS for a status update"""
+        return NotificationService.queue(
+            'sms', 'status_update', to,
+            body=f'AJALI: your report {report_id[:8]} is now {_label(new_status)}.',
+            report_id=report_id
+        )
+    
+    @staticmethod
+    def send_new_incident_sms(to, report):
+        """Queue an SMS alerting an authority to a new incident"""
+        location = report.address or f'{report.latitude:.4f},{report.longitude:.4f}'
+        return NotificationService.queue(
+            'sms', 'new_incident', to,
+            body=f'AJALI: new {_label(report.incident_type)} at {location}. Ref {report.id[:8]}.',
+            report_id=report.id
+        )
@@ -0,0 +1,184 @@
+"""
+Notification transports
+
+A transport delivers a batch of messages through one provider. Messages are
+dicts with 'to', 'body' and, for email, 'subject'. `send_batch` returns one
+entry per message: None when the provider accepted it, otherwise an error
+string. Raising marks the whole batch as failed so it is retried.
+
+Configuration:
+    EMAIL_TRANSPORT = 'log' | 'smtp' | 'memory'
+    SMS_TRANSPORT   = 'log' | 'africastalking' | 'memory'
+"""
+
+import json
+import smtplib
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from email.message import EmailMessage
+from flask import current_app
+
+
+class LogTransport:
+    """Writes messages to the application log instead of sending them"""
+    
+    def __init__(self, channel, max_batch_size=100):
+        self.channel = channel
+        self.max_batch_size = max_batch_size
+    
+    def send_batch(self, messages):
+        for message in messages:
+            current_app.logger.info(
+                f"[NOTIFICATION] {self.channel} to {message['to']}: {message.get('subject') or message['body']}"
+            )
+        return [None] * len(messages)
+
+
+class MemoryTransport:
+    """Keeps delivered messages in memory, for tests and local development"""
+    
+    def __init__(self, max_batch_size=100):
+        self.max_batch_size = max_batch_size
+        self.batches = []
+        self.fail_with = None  # set to an error message to make every batch fail
+    
+    @property
+    def sent(self):
+        return [message for batch in self.batches for message in batch]
+    
+    def send_batch(self, messages):
+        if self.fail_with:
+            raise RuntimeError(self.fail_with)
+        self.batches.append(list(messages))
+        return [None] * len(messages)
+    
+    def clear(self):
+        self.batches = []
+        self.fail_with = None
+
+
+class SMTPTransport:
+    """Sends email over SMTP, reusing one connection for a whole batch"""
+    
+    def __init__(self, host, port, sender, username=None, password=None, use_tls=True, max_batch_size=50):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_batch_size = max_batch_size
+    
+    def send_batch(self, messages):
+        results = []
+        smtp = smtplib.SMTP(self.host, self.port, timeout=30)
+        try:
+            if self.use_tls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            
+            for message in messages:
+                email = EmailMessage()
+                email['From'] = self.sender
+                email['To'] = message['to']
+                email['Subject'] = message.get('subject') or ''
+                email.set_content(message['body'])
+                try:
+                    smtp.send_message(email)
+                    results.append(None)
+                except smtplib.SMTPServerDisconnected as e:
+                    # Messages already sent stay sent, only the rest is retried
+                    results.extend([str(e)] * (len(messages) - len(results)))
+                    break
+                except smtplib.SMTPException as e:
+                    results.append(str(e))
+                except OSError as e:
+                    results.extend([str(e)] * (len(messages) - len(results)))
+                    break
+        finally:
+            try:
+                smtp.quit()
+            except OSError:
+                smtp.close()
+        return results
+
+
+class AfricasTalkingTransport:
+    """Sends SMS through the Africa's Talking bulk messaging API"""
+    
+    API_URL = 'https://api.africastalking.com/version1/messaging'
+    
+    def __init__(self, username, api_key, sender_id=None, api_url=None, max_batch_size=100):
+        self.username = username
+        self.api_key = api_key
+        self.sender_id = sender_id
+        self.api_url = api_url or self.API_URL
+        self.max_batch_size = max_batch_size
+    
+    def _send(self, recipients, text):
+        fields = {'username': self.username, 'to': ','.join(recipients), 'message': text}
+        if self.sender_id:
+            fields['from'] = self.sender_id
+        
+        request = urllib.request.Request(
+            self.api_url,
+            data=urllib.parse.urlencode(fields).encode('utf-8'),
+            headers={
+                'apiKey': self.api_key,
+                'Accept': 'application/json',
+                'Content-Type': 'application/x-www-form-urlencoded'
+            }
+        )
+        with urllib.request.urlopen(request, timeout=30) as response:
+            payload = json.load(response)
+        return {entry['number']: entry for entry in payload['SMSMessageData']['Recipients']}
+    
+    def send_batch(self, messages):
+        # Identical texts go out in a single request with comma separated recipients
+        by_text = defaultdict(list)
+        for index, message in enumerate(messages):
+            by_text[message['body']].append(index)
+        
+        results = [None] * len(messages)
+        for text, indexes in by_text.items():
+            accepted = self._send([messages[i]['to'] for i in indexes], text)
+            for i in indexes:
+                entry = accepted.get(messages[i]['to'])
+                if entry is None or entry.get('status') != 'Success':
+                    results[i] = (entry or {}).get('status') or 'Not accepted by the provider'
+        return results
+
+
+def build_transport(channel, config):
+    """Create the transport configured for a channel"""
+    kind = config.get(f'{channel.upper()}_TRANSPORT', 'log')
+    
+    if kind == 'memory':
+        return MemoryTransport()
+    if channel == 'email' and kind == 'smtp':
+        return SMTPTransport(
+            config['MAIL_SERVER'],
+            config['MAIL_PORT'],
+            config['MAIL_DEFAULT_SENDER'],
+            config.get('MAIL_USERNAME'),
+            config.get('MAIL_PASSWORD'),
+            config.get('MAIL_USE_TLS', True)
+        )
+    if channel == 'sms' and kind == 'africastalking':
+        return AfricasTalkingTransport(
+            config['AT_USERNAME'],
+            config['AT_API_KEY'],
+            config.get('SMS_SENDER_ID'),
+            config.get('AT_API_URL')
+        )
+    return LogTransport(channel)
+
+
+def get_transport(channel):
+    """Transport for a channel, created once per application"""
+    transports = current_app.extensions.setdefault('notification_transports', {})
+    if channel not in transports:
+        transports[channel] = build_transport(channel, current_app.config)
+    return transports[channel]
@@ -0,0 +1,203 @@
+"""
+Rollup Service
+
+Maintains the report_rollups table used by the trend charts. Each refresh
+only re-aggregates events from the most recent bucket onwards, reading
+reports by created_at and status changes by changed_at (both indexed), so
+trend queries never scan the full reports table.
+
+Durations (time from report creation to a status change) are stored as small
+log-scale histograms so that medians can be merged across incident types and
+regions at query time.
+"""
+
+import math
+import time
+from collections import defaultdict
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Report, StatusHistory, ReportStatus, ReportRollup
+from app.utils.geo import geocell_to_geohash, truncate_geocell
+
+GRANULARITIES = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1)
+}
+
+# Histogram bins grow by 2^(1/4), so a merged median is within ~10% of the exact value
+HISTOGRAM_BASE = 2 ** 0.25
+
+
+def bucket_start(moment, granularity):
+    """Floor a timestamp to the start of its bucket"""
+    if granularity == 'day':
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def histogram_bin(seconds):
+    """Histogram bin index for a duration"""
+    return int(math.log(max(seconds, 0) + 1, HISTOGRAM_BASE))
+
+
+def histogram_median(histogram):
+    """Approximate median of a histogram, using the geometric centre of the median bin"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    
+    seen = 0
+    for index in sorted(histogram, key=int):
+        seen += histogram[index]
+        if seen * 2 >= total:
+            low = HISTOGRAM_BASE ** int(index) - 1
+            high = HISTOGRAM_BASE ** (int(index) + 1) - 1
+            return math.sqrt(max(low, 1) * high)
+
+
+def merge_histograms(histograms):
+    """Add histograms together"""
+    merged = defaultdict(int)
+    for histogram in histograms:
+        for index, count in (histogram or {}).items():
+            merged[str(index)] += count
+    return dict(merged)
+
+
+class RollupService:
+    """Service for building and querying report rollups"""
+    
+    _last_refresh = 0.0
+    
+    @staticmethod
+    def region_for(geocell):
+        """Region key for a report location"""
+        if geocell is None:
+            return ''
+        precision = current_app.config['ROLLUP_REGION_PRECISION']
+        bits = precision * 5
+        return geocell_to_geohash(truncate_geocell(geocell, bits), bits)
+    
+    @staticmethod
+    def _events(since):
+        """Yield (timestamp, incident_type, geocell, status, seconds since creation) from `since` onwards"""
+        reports = db.session.query(
+            Report.created_at, Report.incident_type, Report.geocell
+        )
+        if since is not None:
+            reports = reports.filter(Report.created_at >= since)
+        for created_at, incident_type, geocell in reports.yield_per(1000):
+            yield created_at, incident_type, geocell, ReportStatus.PENDING, None
+        
+        changes = db.session.query(
+            StatusHistory.changed_at, StatusHistory.new_status,
+            Report.created_at, Report.incident_type, Report.geocell
+        ).join(Report, StatusHistory.report_id == Report.id)
+        if since is not None:
+            changes = changes.filter(StatusHistory.changed_at >= since)
+        for changed_at, new_status, created_at, incident_type, geocell in changes.yield_per(1000):
+            yield changed_at, incident_type, geocell, new_status, (changed_at - created_at).total_seconds()
+    
+    @staticmethod
+    def refresh(granularities=None):
+        """
+        Incrementally rebuild rollups
+        
+        The latest existing bucket of each granularity is recomputed together
+        with everything after it. With an empty table all history is rolled up.
+        Returns the number of rollup rows written.
+        """
+        written = 0
+        
+        for granularity in granularities or GRANULARITIES:
+            watermark = db.session.query(db.func.max(ReportRollup.bucket_start)).filter(
+                ReportRollup.granularity == granularity
+            ).scalar()
+            
+            groups = {}
+            for moment, incident_type, geocell, status, seconds in RollupService._events(watermark):
+                key = (bucket_start(moment, granularity), incident_type, RollupService.region_for(geocell), status)
+                group = groups.setdefault(key, {'count': 0, 'histogram': defaultdict(int)})
+                group['count'] += 1
+                if seconds is not None:
+                    group['histogram'][str(histogram_bin(seconds))] += 1
+            
+            stale = ReportRollup.query.filter(ReportRollup.granularity == granularity)
+            if watermark is not None:
+                stale = stale.filter(ReportRollup.bucket_start >= watermark)
+            stale.delete(synchronize_session=False)
+            
+            db.session.add_all([
+                ReportRollup(
+                    granularity=granularity,
+                    bucket_start=bucket,
+                    incident_type=incident_type,
+                    region=region,
+                    status=status,
+                    count=group['count'],
+                    duration_histogram=dict(group['histogram']) or None
+                )
+                for (bucket, incident_type, region, status), group in groups.items()
+            ])
+            written += len(groups)
+        
+        db.session.commit()
+        RollupService._last_refresh = time.monotonic()
+        return written
+    
+    @staticmethod
+    def refresh_if_stale():
+        """Refresh at most once per ROLLUP_REFRESH_INTERVAL seconds in this process"""
+        interval = current_app.config['ROLLUP_REFRESH_INTERVAL']
+        if time.monotonic() - RollupService._last_refresh < interval:
+            return
+        
+        try:
+            RollupService.refresh()
+        except IntegrityError:
+            # Another worker refreshed the same buckets concurrently
+            db.session.rollback()
+    
+    @staticmethod
+    def get_trends(granularity, since=None, until=None, incident_type=None, region=None):
+        """Return rollups as a list of buckets ordered by time"""
+        query = ReportRollup.query.filter(ReportRollup.granularity == granularity)
+        
+        if since is not None:
+            query = query.filter(ReportRollup.bucket_start >= bucket_start(since, granularity))
+        if until is not None:
+            query = query.filter(ReportRollup.bucket_start < until)
+        if incident_type:
+            query = query.filter(ReportRollup.incident_type == incident_type)
+        if region:
+            query = query.filter(ReportRollup.region.like(f'{region}%'))
+        
+        buckets = {}
+        for rollup in query.order_by(ReportRollup.bucket_start).all():
+            bucket = buckets.setdefault(rollup.bucket_start, {
+                'bucket_start': rollup.bucket_start.isoformat(),
+                'opened': 0,
+                'resolved': 0,
+                'by_status': defaultdict(int),
+                'by_type': defaultdict(int),
+                'by_region': defaultdict(int),
+                '_resolve_histograms': []
+            })
+            bucket['by_status'][rollup.status] += rollup.count
+            
+            if rollup.status == ReportStatus.PENDING:
+                bucket['opened'] += rollup.count
+                bucket['by_type'][rollup.incident_type] += rollup.count
+                bucket['by_region'][rollup.region] += rollup.count
+            elif rollup.status == ReportStatus.RESOLVED:
+                bucket['resolved'] += rollup.count
+                bucket['_resolve_histograms'].append(rollup.duration_histogram)
+        
+        result = []
+        for bucket in buckets.values():
+            histograms = bucket.pop('_resolve_histograms')
+            bucket['median_resolve_seconds'] = histogram_median(merge_histograms(histograms))
+            result.append(bucket)
+        return result
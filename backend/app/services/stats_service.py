@@ -0,0 +1,108 @@
+"""
+Statistics Service
+
+Keeps the counters behind /api/admin/stats up to date as reports and users
+change, so the dashboard reads a handful of rows instead of scanning tables.
+Counter updates join the caller's transaction and are committed with it.
+"""
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import User, Report, ReportStatus, IncidentType, StatCounter
+
+TOTAL_USERS = 'users'
+TOTAL_REPORTS = 'reports'
+STATUS_PREFIX = 'status:'
+TYPE_PREFIX = 'type:'
+
+
+class StatsService:
+    """Service for maintaining and reading platform statistics"""
+    
+    @staticmethod
+    def record_user_created():
+        """Count a newly registered user"""
+        StatCounter.increment(TOTAL_USERS)
+    
+    @staticmethod
+    def record_report_created(report):
+        """Count a newly created report"""
+        StatCounter.increment(TOTAL_REPORTS)
+        StatCounter.increment(STATUS_PREFIX + (report.status or ReportStatus.PENDING))
+        StatCounter.increment(TYPE_PREFIX + report.incident_type)
+    
+    @staticmethod
+    def record_report_deleted(report):
+        """Remove a deleted report from the counters"""
+        StatCounter.increment(TOTAL_REPORTS, -1)
+        StatCounter.increment(STATUS_PREFIX + report.status, -1)
+        StatCounter.increment(TYPE_PREFIX + report.incident_type, -1)
+    
+    @staticmethod
+    def record_status_change(old_status, new_status):
+        """Move a report between status counters"""
+        if old_status != new_status:
+            StatCounter.increment(STATUS_PREFIX + old_status, -1)
+            StatCounter.increment(STATUS_PREFIX + new_status)
+    
+    @staticmethod
+    def record_type_change(old_type, new_type):
+        """Move a report between incident type counters"""
+        if old_type != new_type:
+            StatCounter.increment(TYPE_PREFIX + old_type, -1)
+            StatCounter.increment(TYPE_PREFIX + new_type)
+    
+    @staticmethod
+    def rebuild():
+        """
+        Recompute every counter from the source tables
+        
+        On PostgreSQL the counter table is locked first, so increments wait
+        for the rebuild to commit: one committed before the lock is in the
+        counts, one made after it is applied to the rebuilt rows. Without the
+        lock an increment could be lost, or counted twice.
+        """
+        if db.session.get_bind().dialect.name == 'postgresql':
+            db.session.execute(db.text(f'LOCK TABLE {StatCounter.__tablename__} IN EXCLUSIVE MODE'))
+        
+        counters = {TOTAL_USERS: User.query.count(), TOTAL_REPORTS: Report.query.count()}
+        counters.update({STATUS_PREFIX + status: 0 for status in ReportStatus.all()})
+        counters.update({TYPE_PREFIX + itype: 0 for itype in IncidentType.all()})
+        
+        status_counts = db.session.query(Report.status, func.count(Report.id)).group_by(Report.status).all()
+        for status, count in status_counts:
+            counters[STATUS_PREFIX + status] = count
+        
+        type_counts = db.session.query(Report.incident_type, func.count(Report.id)).group_by(Report.incident_type).all()
+        for itype, count in type_counts:
+            counters[TYPE_PREFIX + itype] = count
+        
+        StatCounter.query.delete()
+        db.session.add_all([StatCounter(key=key, value=value) for key, value in counters.items()])
+        db.session.commit()
+        return counters
+    
+    @staticmethod
+    def get_statistics():
+        """Read the platform statistics, building the counters on first use"""
+        counters = {c.key: c.value for c in StatCounter.query.all()}
+        
+        if TOTAL_REPORTS not in counters or TOTAL_USERS not in counters:
+            try:
+                counters = StatsService.rebuild()
+            except IntegrityError:
+                # A concurrent first request built the counters first
+                db.session.rollback()
+                counters = {c.key: c.value for c in StatCounter.query.all()}
+        
+        return {
+            'total_users': counters[TOTAL_USERS],
+            'total_reports': counters[TOTAL_REPORTS],
+            'reports_by_status': {
+                key[len(STATUS_PREFIX):]: value for key, value in counters.items() if key.startswith(STATUS_PREFIX)
+            },
+            'reports_by_type': {
+                key[len(TYPE_PREFIX):]: value for key, value in counters.items() if key.startswith(TYPE_PREFIX)
+            }
+        }
@@ -0,0 +1,131 @@
+"""
+Token Service
+
+Login and registration issue a short-lived access token and a long-lived
+refresh token. Renewing a session at /api/auth/refresh costs a signature
+check and one conditional UPDATE instead of a bcrypt verification.
+
+Refresh tokens rotate: each use revokes the presented token and issues a
+successor in the same family (one family per login). A token can therefore
+be used once; if a revoked token is presented again it has been copied, and
+the whole family is revoked so neither party can keep the session.
+
+The refresh_tokens table is the source of truth. Families revoked by a
+logout or a detected reuse are also kept in a per-process LRU, so their
+tokens are turned away by the JWT blocklist check without touching the
+database. Rotated tokens are not cached there: presenting one again has to
+reach `rotate`, which detects the reuse and revokes the family.
+
+Configuration:
+    JWT_REFRESH_TOKEN_EXPIRES     = 30 days
+    REFRESH_REVOCATION_CACHE_SIZE = 10000  (revoked families kept in memory)
+"""
+
+import threading
+import uuid
+from datetime import datetime
+from flask import current_app
+from flask_jwt_extended import create_access_token, create_refresh_token
+from app import db
+from app.models import RefreshToken, User
+from app.utils.cache import MemoryCacheBackend
+
+
+class TokenService:
+    """Service for issuing, rotating and revoking refresh tokens"""
+    
+    _revoked = None  # LRU of revoked family ids
+    _lock = threading.Lock()
+    
+    @classmethod
+    def _revoked_families(cls):
+        if cls._revoked is None:
+            with cls._lock:
+                if cls._revoked is None:
+                    config = current_app.config
+                    cls._revoked = MemoryCacheBackend(
+                        config.get('REFRESH_REVOCATION_CACHE_SIZE', 10000),
+                        int(config['JWT_REFRESH_TOKEN_EXPIRES'].total_seconds())
+                    )
+        return cls._revoked
+    
+    @classmethod
+    def is_revoked(cls, jwt_header, jwt_payload):
+        """JWT blocklist callback, a fast path for refresh tokens of revoked families"""
+        if jwt_payload.get('type') != 'refresh' or not jwt_payload.get('fam'):
+            return False
+        return cls._revoked_families().get(jwt_payload['fam']) is not None
+    
+    @staticmethod
+    def _new_refresh_token(user_id, family_id, token_id=None):
+        """Create a refresh token and record it in the session"""
+        token_id = token_id or str(uuid.uuid4())
+        db.session.add(RefreshToken(
+            id=token_id,
+            user_id=user_id,
+            family_id=family_id,
+            expires_at=datetime.utcnow() + current_app.config['JWT_REFRESH_TOKEN_EXPIRES']
+        ))
+        return create_refresh_token(identity=user_id, additional_claims={'jti': token_id, 'fam': family_id})
+    
+    @staticmethod
+    def issue(user):
+        """Access and refresh tokens for a new session, commit to make the refresh token usable"""
+        return {
+            'access_token': create_access_token(identity=user.id),
+            'refresh_token': TokenService._new_refresh_token(user.id, str(uuid.uuid4()))
+        }
+    
+    @classmethod
+    def rotate(cls, token_id, family_id, user_id):
+        """
+        Exchange a verified refresh token for a new token pair and commit
+        
+        Returns (tokens, user), or None when the token was already used or
+        revoked, or its user can no longer sign in.
+        """
+        successor_id = str(uuid.uuid4())
+        
+        # Only one request can win the update, so a token is never used twice
+        rotated = RefreshToken.query.filter(
+            RefreshToken.id == token_id,
+            RefreshToken.revoked_at.is_(None)
+        ).update({'revoked_at': datetime.utcnow(), 'replaced_by': successor_id}, synchronize_session=False)
+        
+        if not rotated:
+            current_app.logger.warning(f"Refresh token {token_id} reused, revoking its family")
+            cls.revoke_family(family_id)
+            return None
+        
+        user = User.query.get(user_id)
+        if not user or not user.is_active:
+            cls.revoke_family(family_id)
+            return None
+        
+        tokens = {
+            'access_token': create_access_token(identity=user.id),
+            'refresh_token': cls._new_refresh_token(user.id, family_id, successor_id)
+        }
+        db.session.commit()
+        return tokens, user
+    
+    @classmethod
+    def revoke_family(cls, family_id):
+        """Revoke every token issued from one login and commit"""
+        if family_id:
+            RefreshToken.query.filter(
+                RefreshToken.family_id == family_id,
+                RefreshToken.revoked_at.is_(None)
+            ).update({'revoked_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        if family_id:
+            cls._revoked_families().set(family_id, True)
+    
+    @staticmethod
+    def purge_expired():
+        """Delete refresh tokens past their expiry, returns the number removed"""
+        removed = RefreshToken.query.filter(
+            RefreshToken.expires_at < datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return removed
@@ -0,0 +1,197 @@
+"""
+Response cache for public report reads
+
+Backends share a tiny interface (get / set / delete / incr / clear) so the
+in-process LRU can be swapped for Redis, or anything that speaks the same
+client API, through configuration:
+
+    CACHE_BACKEND = 'memory' | 'redis' | 'null'
+    CACHE_REDIS_URL = 'redis://localhost:6379/0'
+
+List pages are keyed on the normalized query parameters plus a generation
+number, and report details on the report id plus the same generation. Any
+write bumps the generation, which invalidates every cached entry at once
+without having to enumerate keys. Entries also carry the entity tag they
+were built for, and are rebuilt rather than served under any other tag.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class NullCacheBackend:
+    """Backend that never stores anything"""
+    
+    def get(self, key):
+        return None
+    
+    def set(self, key, value, ttl=None):
+        pass
+    
+    def delete(self, key):
+        pass
+    
+    def incr(self, key):
+        return 0
+    
+    def clear(self):
+        pass
+
+
+class MemoryCacheBackend:
+    """Thread-safe in-process LRU cache with per-entry expiry"""
+    
+    def __init__(self, max_entries=1024, default_ttl=60):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._data = OrderedDict()
+        self._counters = {}  # never evicted, so generations cannot go backwards
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+    
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+    
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+    
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCacheBackend:
+    """Backend for a Redis-compatible client (get, set with ex, delete, incr, scan_iter)"""
+    
+    def __init__(self, client, prefix='ajali:', default_ttl=60):
+        self.client = client
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+    
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else json.loads(raw)
+    
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        self.client.set(self.prefix + key, json.dumps(value), ex=ttl or None)
+    
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+    
+    def incr(self, key):
+        return int(self.client.incr(self.prefix + key))
+    
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+
+class ReportCache:
+    """Flask extension caching serialized report payloads"""
+    
+    GENERATION_KEY = 'reports:generation'
+    
+    def __init__(self, app=None):
+        self.backend = NullCacheBackend()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        ttl = app.config.get('CACHE_DEFAULT_TTL', 60)
+        
+        if backend == 'redis':
+            import redis
+            client = redis.Redis.from_url(app.config['CACHE_REDIS_URL'])
+            self.backend = RedisCacheBackend(client, default_ttl=ttl)
+        elif backend == 'memory':
+            self.backend = MemoryCacheBackend(app.config.get('CACHE_MAX_ENTRIES', 1024), ttl)
+        else:
+            self.backend = NullCacheBackend()
+        
+        app.extensions['report_cache'] = self
+    
+    @staticmethod
+    def normalize(params):
+        """Stable string form of loaded query parameters"""
+        return json.dumps(params, sort_keys=True, default=str, separators=(',', ':'))
+    
+    def _generation(self):
+        return self.backend.get(self.GENERATION_KEY) or 0
+    
+    def _list_key(self, params):
+        return f'reports:list:{self._generation()}:{self.normalize(params)}'
+    
+    def _detail_key(self, report_id):
+        return f'reports:detail:{self._generation()}:{report_id}'
+    
+    def _get_or_build(self, key, build, version):
+        entry = self.backend.get(key)
+        if entry is not None and entry['version'] == version:
+            return entry['payload']
+        
+        payload = build()
+        if payload is not None:
+            self.backend.set(key, {'version': version, 'payload': payload})
+        return payload
+    
+    def report_list(self, params, build, version):
+        """
+        Cached list payload for the given query parameters
+        
+        `version` is the validator the response is sent with. An entry built
+        for another version is rebuilt, so a missed invalidation can never
+        pair a new entity tag with an old body. The key is fixed before
+        `build` runs, so a write that lands while the page is being built
+        moves readers to a new generation instead of being hidden behind the
+        page built from older data.
+        """
+        return self._get_or_build(self._list_key(params), build, version)
+    
+    def report_detail(self, report_id, build, version):
+        """
+        Cached detail payload for a report, `build` returns None when it does not exist
+        
+        Versioned like list pages, and keyed on the generation so a payload
+        built from data read before an invalidation is stored where no reader
+        will look.
+        """
+        return self._get_or_build(self._detail_key(report_id), build, version)
+    
+    def invalidate_report(self, report_id=None):
+        """Drop cached data affected by a change to a report"""
+        if report_id is not None:
+            # Unreachable after the bump anyway, deleting frees its slot now
+            self.backend.delete(self._detail_key(report_id))
+        self.backend.incr(self.GENERATION_KEY)
+    
+    def clear(self):
+        self.backend.clear()
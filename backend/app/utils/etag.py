@@ -0,0 +1,26 @@
+import hashlib
+from flask import request, jsonify, make_response
+
+
+def compute_etag(*parts):
+    """Build an entity tag from the values that determine a response"""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def not_modified(etag):
+    """Return a 304 response if the client already has this version, otherwise None"""
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return None
+
+
+def json_with_etag(payload, etag, status=200):
+    """JSON response carrying an ETag clients can revalidate with If-None-Match"""
+    response = jsonify(payload)
+    response.status_code = status
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,197 @@
+"""
+Report event hub
+
+Report changes are published to an in-process hub that fans them out to
+subscribers, such as the Server-Sent Events stream at /api/reports/stream.
+Each subscriber has a bounded queue and a filter, so a slow client never
+blocks publishers: when its queue fills up the subscription is closed and
+the client reconnects, sending the Last-Event-ID header to replay what it
+missed from a short history kept by every process.
+
+With several worker processes the hub is bridged through Redis pub/sub, so
+an event published in one process reaches the streams held by all of them:
+
+    EVENTS_BACKEND    = 'memory' | 'redis'
+    EVENTS_REDIS_URL  = 'redis://localhost:6379/0'
+    EVENTS_QUEUE_SIZE = 256   (events buffered per subscriber)
+    EVENTS_HISTORY    = 1000  (events kept for Last-Event-ID replay)
+    EVENTS_HEARTBEAT  = 15    (seconds between keep-alive comments)
+    EVENTS_MAX_SUBSCRIBERS = 1000
+
+Every open stream holds a worker thread, so serve the API with a threaded
+or gevent worker class when streams are enabled.
+"""
+
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+# Returned by Subscription.next when the stream must end
+CLOSED = object()
+
+# Reconnection delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 3000
+
+
+class SubscriberLimitReached(Exception):
+    """Raised when a process already serves EVENTS_MAX_SUBSCRIBERS streams"""
+
+
+class Subscription:
+    """A subscriber's filter and its bounded queue of pending events"""
+    
+    def __init__(self, matches=None, max_queue=256):
+        self.matches = matches or (lambda event: True)
+        self.queue = queue.Queue(max_queue)
+        self.overflowed = False
+    
+    def deliver(self, event):
+        """Queue an event without blocking, closing the subscription when it is full"""
+        if self.overflowed or not self.matches(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+    
+    def next(self, timeout):
+        """Next event, None after `timeout` seconds without one, or CLOSED"""
+        if self.overflowed:
+            return CLOSED
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class RedisEventBroker:
+    """Relays events between processes through a Redis pub/sub channel"""
+    
+    CHANNEL = 'ajali:events'
+    SEQUENCE_KEY = 'ajali:events:sequence'
+    
+    def __init__(self, client, dispatch):
+        self.client = client
+        self.dispatch = dispatch
+        self._listener = None
+        self._lock = threading.Lock()
+    
+    def next_id(self):
+        return str(self.client.incr(self.SEQUENCE_KEY))
+    
+    def publish(self, event):
+        self.client.publish(self.CHANNEL, json.dumps(event, default=str))
+    
+    def start(self):
+        """Start listening, once per process, when the first stream opens"""
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='event-broker', daemon=True)
+                self._listener.start()
+    
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.CHANNEL)
+                for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        self.dispatch(json.loads(message['data']))
+            except Exception:
+                time.sleep(1)  # connection lost, resubscribe
+
+
+class EventHub:
+    """Flask extension publishing report events to live subscribers"""
+    
+    def __init__(self, app=None):
+        self.broker = None
+        self.max_queue = 256
+        self.max_subscribers = 1000
+        self._subscribers = set()
+        self._history = deque(maxlen=1000)
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.max_queue = app.config.get('EVENTS_QUEUE_SIZE', 256)
+        self.max_subscribers = app.config.get('EVENTS_MAX_SUBSCRIBERS', 1000)
+        self._history = deque(maxlen=app.config.get('EVENTS_HISTORY', 1000))
+        
+        if app.config.get('EVENTS_BACKEND', 'memory') == 'redis':
+            import redis
+            client = redis.Redis.from_url(app.config['EVENTS_REDIS_URL'])
+            self.broker = RedisEventBroker(client, self._dispatch)
+        else:
+            self.broker = None
+        
+        app.extensions['event_hub'] = self
+    
+    def publish(self, event_type, data):
+        """Publish an event to every matching subscriber, call after the change is committed"""
+        if self.broker is not None:
+            self.broker.publish({'id': self.broker.next_id(), 'type': event_type, 'data': data})
+        else:
+            self._dispatch({'id': str(next(self._sequence)), 'type': event_type, 'data': data})
+    
+    def _dispatch(self, event):
+        with self._lock:
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.deliver(event)
+    
+    def subscribe(self, matches=None, last_event_id=None):
+        """
+        Open a subscription, replaying the events after `last_event_id`
+        
+        Events older than the history are lost; the client then only gets
+        new events and should refetch the reports it displays.
+        """
+        subscription = Subscription(matches, self.max_queue)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise SubscriberLimitReached()
+            
+            if last_event_id:
+                history = list(self._history)
+                ids = [event['id'] for event in history]
+                if last_event_id in ids:
+                    for event in history[ids.index(last_event_id) + 1:]:
+                        subscription.deliver(event)
+            self._subscribers.add(subscription)
+        
+        if self.broker is not None:
+            self.broker.start()
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+    
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+    
+    @staticmethod
+    def format(event):
+        """Encode an event in the text/event-stream format"""
+        data = json.dumps(event['data'], default=str, separators=(',', ':'))
+        return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+    
+    def stream(self, subscription, heartbeat=15):
+        """Yield a subscription as Server-Sent Events until it is closed"""
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            while True:
+                event = subscription.next(heartbeat)
+                if event is CLOSED:
+                    return
+                yield ': keepalive\n\n' if event is None else self.format(event)
+        finally:
+            self.unsubscribe(subscription)
@@ -1,7 +1,13 @@
 import os
 import uuid
+import hashlib
+from urllib.parse import quote
 from werkzeug.utils import secure_filename
 from flask import current_app
+from app import storage
+
+# Read size used when streaming uploads to disk, keeps memory use bounded
+STREAM_BUFFER_SIZE = 64 * 1024
 
 
 def allowed_file(filename, file_type='image'):
@@ -27,30 +33,51 @@ def save_file(file, file_type='image'):
     if not allowed_file(file.filename, file_type):
         raise ValueError(f'File type not allowed. Allowed types: {current_app.config[f"ALLOWED_{file_type.upper()}_EXTENSIONS"]}')
     
-    # Generate unique filename
     ext = file.filename.rsplit('.', 1)[1].lower()
-    unique_filename = f"{uuid.uuid4()}.{ext}"
-    
-    # Determine save path
-    subfolder = 'images' if file_type == 'image' else 'videos'
-    upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], subfolder)
-    file_path = os.path.join(upload_folder, unique_filename)
     
-    # Save file
-    file.save(file_path)
+    # Stream to a temporary file, computing size and checksum as we go
+    temp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'tmp', f'{uuid.uuid4()}.upload')
+    hasher = hashlib.sha256()
+    try:
+        with open(temp_path, 'wb') as out:
+            file_size = copy_stream(file.stream, out, hasher)
+    except Exception:
+        delete_file(temp_path)
+        raise
     
-    # Get file size
-    file_size = os.path.getsize(file_path)
+    checksum = hasher.hexdigest()
+    file_path = storage.store(temp_path, checksum, ext)
     
     return {
         'filename': secure_filename(file.filename),
-        'unique_filename': unique_filename,
+        'unique_filename': os.path.basename(file_path),
         'file_path': file_path,
         'file_size': file_size,
-        'mime_type': file.content_type
+        'mime_type': file.content_type,
+        'checksum': checksum
     }
 
 
+def copy_stream(stream, out, hasher=None, limit=None):
+    """
+    Copy a stream to a file object in fixed-size reads
+    
+    Updates `hasher` with every byte written. Raises ValueError if the stream
+    holds more than `limit` bytes. Returns the number of bytes written.
+    """
+    written = 0
+    while True:
+        chunk = stream.read(STREAM_BUFFER_SIZE)
+        if not chunk:
+            return written
+        written += len(chunk)
+        if limit is not None and written > limit:
+            raise ValueError('Upload exceeds the declared file size')
+        out.write(chunk)
+        if hasher is not None:
+            hasher.update(chunk)
+
+
 def delete_file(file_path):
     """Delete file from filesystem"""
     try:
@@ -59,4 +86,80 @@ def delete_file(file_path):
             return True
     except Exception as e:
         current_app.logger.error(f"Error deleting file {file_path}: {str(e)}")
-    return False
\ No newline at end of file
+    return False
+
+
+def resolve_upload_path(file_path):
+    """
+    Absolute path of a stored file, or None when it is missing or outside UPLOAD_FOLDER
+    
+    Stored paths are only ever written by this module, the containment check
+    guards against a tampered row turning the download route into a file server.
+    """
+    root = os.path.realpath(current_app.config['UPLOAD_FOLDER'])
+    path = os.path.realpath(file_path)
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
+
+
+def accel_redirect_uri(path):
+    """Internal nginx URI of a resolved upload path, for X-Accel-Redirect"""
+    root = os.path.realpath(current_app.config['UPLOAD_FOLDER'])
+    relative = os.path.relpath(path, root).replace(os.sep, '/')
+    return current_app.config['MEDIA_ACCEL_REDIRECT_PREFIX'].rstrip('/') + '/' + quote(relative)
+
+
+def upload_temp_path(upload_id):
+    """Path of the partial file for a chunked upload"""
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'tmp', f'{upload_id}.part')
+
+
+def start_upload(upload_id):
+    """Create the empty partial file for a chunked upload"""
+    temp_path = upload_temp_path(upload_id)
+    open(temp_path, 'wb').close()
+    return temp_path
+
+
+def append_chunk(upload_id, offset, stream, max_bytes):
+    """
+    Stream a chunk onto the end of a partial upload
+    
+    `offset` must equal the bytes already received. On failure the partial
+    file is truncated back to `offset` so the client can retry the chunk.
+    Returns the number of bytes appended.
+    """
+    with open(upload_temp_path(upload_id), 'r+b') as out:
+        out.seek(offset)
+        try:
+            written = copy_stream(stream, out, limit=max_bytes)
+        except Exception:
+            out.truncate(offset)
+            raise
+        out.truncate(offset + written)
+    return written
+
+
+def upload_checksum(upload_id):
+    """
+    SHA-256 of a completed chunked upload
+    
+    Read back from the partial file in one sequential pass rather than kept
+    running across chunks: hashlib cannot save a hash state, and per-chunk
+    digests would not give the whole-file SHA-256 that content addressing
+    and direct uploads rely on. Any worker can therefore finish an upload,
+    including after a restart.
+    """
+    with open(upload_temp_path(upload_id), 'rb') as partial:
+        return hashlib.file_digest(partial, 'sha256').hexdigest()
+
+
+def finish_upload(upload_id, extension, checksum):
+    """Move a completed chunked upload into content-addressed storage and return its location"""
+    return storage.store(upload_temp_path(upload_id), checksum, extension)
+
+
+def abort_upload(upload_id):
+    """Discard the partial file of a chunked upload"""
+    delete_file(upload_temp_path(upload_id))
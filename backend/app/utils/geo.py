@@ -0,0 +1,174 @@
+"""
+Geospatial helpers
+
+Locations are indexed with a "geocell": the geohash of a point stored as an
+integer instead of a string. Longitude and latitude bits are interleaved
+(longitude first, as in geohash), so every geohash prefix maps to a
+contiguous integer range and a bounding box can be covered by a handful of
+range scans on a plain B-tree index in both SQLite and PostgreSQL.
+"""
+
+import math
+
+GEOCELL_BITS = 50  # same resolution as a 10 character geohash
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode_geocell(latitude, longitude, bits=GEOCELL_BITS):
+    """Encode a point as an integer geocell with the given number of bits"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    cell = 0
+
+    for i in range(bits):
+        if i % 2 == 0:
+            value, interval = longitude, lng_range
+        else:
+            value, interval = latitude, lat_range
+        mid = (interval[0] + interval[1]) / 2
+        if value >= mid:
+            cell = (cell << 1) | 1
+            interval[0] = mid
+        else:
+            cell = cell << 1
+            interval[1] = mid
+
+    return cell
+
+
+def geocell_bounds(cell, bits=GEOCELL_BITS):
+    """Return the (south, west, north, east) bounds of a geocell"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+
+    for i in range(bits):
+        bit = (cell >> (bits - 1 - i)) & 1
+        interval = lng_range if i % 2 == 0 else lat_range
+        mid = (interval[0] + interval[1]) / 2
+        if bit:
+            interval[0] = mid
+        else:
+            interval[1] = mid
+
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def geocell_to_geohash(cell, bits=GEOCELL_BITS):
+    """Render the leading whole characters of a geocell as a geohash string"""
+    chars = bits // 5
+    cell >>= bits - chars * 5
+    return ''.join(_BASE32[(cell >> (5 * (chars - 1 - i))) & 31] for i in range(chars))
+
+
+def truncate_geocell(cell, bits, from_bits=GEOCELL_BITS):
+    """Drop the low bits of a geocell, giving its parent cell at `bits` precision"""
+    return cell >> (from_bits - bits)
+
+
+def cell_size(bits):
+    """Return the (height, width) in degrees of a cell at the given precision"""
+    lat_bits = bits // 2
+    lng_bits = bits - lat_bits
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bbox_around(latitude, longitude, radius_km):
+    """Return the (south, west, north, east) box enclosing a circle"""
+    dlat = radius_km / KM_PER_DEGREE
+    cos_lat = math.cos(math.radians(latitude))
+    dlng = 180.0 if cos_lat < 1e-6 else min(180.0, dlat / cos_lat)
+    return (
+        max(-90.0, latitude - dlat),
+        max(-180.0, longitude - dlng),
+        min(90.0, latitude + dlat),
+        min(180.0, longitude + dlng)
+    )
+
+
+def _steps(start, stop, step):
+    """Sample points from start to stop, no further apart than step"""
+    count = int(math.ceil((stop - start) / step))
+    return [start + step * i for i in range(count)] + [stop]
+
+
+def covering_cells(south, west, north, east, max_cells=16):
+    """
+    Pick the finest cell precision covering the box in at most `max_cells` cells
+
+    Returns (bits, cells).
+    """
+    bits = GEOCELL_BITS
+    while bits > 1:
+        height, width = cell_size(bits)
+        rows = math.ceil((north - south) / height) + 1
+        cols = math.ceil((east - west) / width) + 1
+        if rows * cols <= max_cells:
+            break
+        bits -= 1
+
+    return bits, cells_in_box(south, west, north, east, bits)
+
+
+def cells_in_box(south, west, north, east, bits):
+    """All cells at the given precision that intersect a box, sorted"""
+    height, width = cell_size(bits)
+    cells = {
+        encode_geocell(lat, lng, bits)
+        for lat in _steps(south, north, height)
+        for lng in _steps(west, east, width)
+    }
+    return sorted(cells)
+
+
+def polygon_bounds(polygon):
+    """Return the (south, west, north, east) box enclosing a [[lat, lng], ...] polygon"""
+    latitudes = [point[0] for point in polygon]
+    longitudes = [point[1] for point in polygon]
+    return min(latitudes), min(longitudes), max(latitudes), max(longitudes)
+
+
+def point_in_polygon(latitude, longitude, polygon):
+    """Ray casting test for a point inside a [[lat, lng], ...] polygon"""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lng_i = polygon[i]
+        lat_j, lng_j = polygon[j]
+        if (lat_i > latitude) != (lat_j > latitude):
+            crossing = lng_i + (latitude - lat_i) * (lng_j - lng_i) / (lat_j - lat_i)
+            if longitude < crossing:
+                inside = not inside
+        j = i
+    return inside
+
+
+def covering_ranges(south, west, north, east, max_cells=16):
+    """
+    Cover a bounding box with half-open [low, high) ranges of full precision geocells
+
+    Adjacent cells are merged so the ranges can be used directly as
+    `geocell >= low AND geocell < high` index scans.
+    """
+    bits, cells = covering_cells(south, west, north, east, max_cells)
+    shift = GEOCELL_BITS - bits
+
+    ranges = []
+    for cell in cells:
+        low, high = cell << shift, (cell + 1) << shift
+        if ranges and ranges[-1][1] == low:
+            ranges[-1] = (ranges[-1][0], high)
+        else:
+            ranges.append((low, high))
+    return ranges
@@ -0,0 +1,56 @@
+import os
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional, thumbnails are skipped without it
+    Image = None
+    ImageOps = None
+
+
+def thumbnails_available():
+    """Whether the imaging library is installed"""
+    return Image is not None
+
+
+def parse_sizes(spec):
+    """Parse a "name:pixels,..." size list into a dict"""
+    sizes = {}
+    for item in spec.split(','):
+        name, pixels = item.strip().split(':')
+        sizes[name] = int(pixels)
+    return sizes
+
+
+def generate_thumbnails(source_path, sizes, quality=80, output_stem=None):
+    """
+    Write JPEG and WebP thumbnails of an image
+
+    `sizes` maps a variant name to the maximum width/height in pixels. Files
+    are named <output_stem>_<name>.<ext>, next to the image by default.
+    Returns {name: {format: {'file_path', 'width', 'height', 'file_size'}}}.
+    """
+    stem = output_stem or os.path.splitext(source_path)[0]
+    variants = {}
+    
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        
+        for name, max_pixels in sizes.items():
+            thumbnail = image.copy()
+            thumbnail.thumbnail((max_pixels, max_pixels))
+            
+            variants[name] = {}
+            for fmt, ext in (('JPEG', 'jpg'), ('WEBP', 'webp')):
+                path = f'{stem}_{name}.{ext}'
+                thumbnail.save(path, fmt, quality=quality)
+                variants[name][ext] = {
+                    'file_path': path,
+                    'width': thumbnail.width,
+                    'height': thumbnail.height,
+                    'file_size': os.path.getsize(path)
+                }
+    
+    return variants
+
@@ -0,0 +1,126 @@
+import base64
+import hashlib
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+from app.models import Report
+from app.utils.search import search_rank
+
+
+def encode_cursor(report):
+    """Build an opaque cursor pointing just after the given report"""
+    payload = json.dumps([report.created_at.isoformat(), report.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor into a (created_at, id) tuple"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, report_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), str(report_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError('Invalid cursor')
+
+
+def _ordered(query, params):
+    """
+    Order a report query for paging
+
+    Most recent first, except for page-based searches which rank by
+    relevance. Cursor pages always follow (created_at, id), the only order
+    a cursor can resume.
+    """
+    recent = (Report.created_at.desc(), Report.id.desc())
+    if params.get('q') and 'cursor' not in params:
+        return query.order_by(search_rank(params['q']).desc(), *recent)
+    return query.order_by(*recent)
+
+
+def _page_window(query, params):
+    """Order a report query and position it at the start of the requested page"""
+    ordered = _ordered(query, params)
+    
+    if 'cursor' in params:
+        if params['cursor']:
+            created_at, report_id = decode_cursor(params['cursor'])
+            ordered = ordered.filter(or_(
+                Report.created_at < created_at,
+                and_(Report.created_at == created_at, Report.id < report_id)
+            ))
+        return ordered
+    
+    page = params.get('page', 1)
+    per_page = params.get('per_page', 20)
+    return ordered.offset((page - 1) * per_page)
+
+
+def page_fingerprint(query, params):
+    """
+    Digest identifying the contents of a page without loading the reports
+
+    Covers the id and updated_at of every report on the page (plus the
+    look-ahead row that decides has_next) and the total count when it is
+    part of the response.
+    """
+    per_page = params.get('per_page', 20)
+    rows = _page_window(query, params).with_entities(Report.id, Report.updated_at).limit(per_page + 1).all()
+    
+    digest = hashlib.sha1()
+    for report_id, updated_at in rows:
+        digest.update(f'{report_id}:{updated_at.isoformat()};'.encode('utf-8'))
+    if params.get('include_total', True):
+        digest.update(f'total:{query.order_by(None).count()}'.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def paginate_reports(query, params):
+    """
+    Paginate a report query, most recent first or by search relevance
+
+    Uses keyset pagination on (created_at, id) when a `cursor` parameter is
+    present (an empty cursor starts from the first page), otherwise classic
+    page/per_page offsets. The total count is skipped when `include_total`
+    is false. Returns a tuple of (reports, pagination dict).
+    """
+    per_page = params.get('per_page', 20)
+    include_total = params.get('include_total', True)
+    
+    if 'cursor' in params:
+        items = _page_window(query, params).limit(per_page + 1).all()
+        has_next = len(items) > per_page
+        items = items[:per_page]
+        
+        pagination = {
+            'per_page': per_page,
+            'next_cursor': encode_cursor(items[-1]) if has_next else None,
+            'has_next': has_next
+        }
+        if include_total:
+            pagination['total'] = query.order_by(None).count()
+        return items, pagination
+    
+    page = params.get('page', 1)
+    
+    if include_total:
+        ordered = _ordered(query, params)
+        result = ordered.paginate(page=page, per_page=per_page, error_out=False)
+        return result.items, {
+            'page': result.page,
+            'per_page': result.per_page,
+            'total': result.total,
+            'pages': result.pages,
+            'has_next': result.has_next,
+            'has_prev': result.has_prev
+        }
+    
+    items = _page_window(query, params).limit(per_page + 1).all()
+    has_next = len(items) > per_page
+    return items[:per_page], {
+        'page': page,
+        'per_page': per_page,
+        'total': None,
+        'pages': None,
+        'has_next': has_next,
+        'has_prev': page > 1
+    }
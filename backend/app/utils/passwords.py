@@ -0,0 +1,89 @@
+"""
+Password hashing
+
+bcrypt is deliberately slow, so hashing runs on a small dedicated pool
+instead of directly on request threads. The pool bounds how many CPU cores
+authentication can occupy at once, and rejects work once too many requests
+are waiting for it, so a burst of logins is turned away with 429 rather than
+starving report reads. bcrypt releases the GIL while hashing, so the pool's
+threads run in parallel with request handling.
+
+Hashes record their cost factor. When BCRYPT_LOG_ROUNDS changes, existing
+hashes are upgraded the next time their owner logs in.
+
+Configuration:
+    BCRYPT_LOG_ROUNDS        = 12
+    PASSWORD_HASH_WORKERS    = 2   (0 hashes on the request thread)
+    PASSWORD_HASH_QUEUE_SIZE = 16  (requests allowed to wait for a worker)
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from flask import current_app
+
+
+class PasswordPoolFull(Exception):
+    """Raised when every hashing worker is busy and the queue is full"""
+
+
+class BoundedExecutor:
+    """Thread pool that refuses work instead of queueing without limit"""
+    
+    def __init__(self, workers, queue_size, thread_name_prefix='password-hash'):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=thread_name_prefix)
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+    
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordPoolFull()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+    
+    def run(self, fn, *args):
+        """Run a call on the pool and wait for its result"""
+        return self.submit(fn, *args).result()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _run(fn, *args):
+    global _pool
+    config = current_app.config
+    workers = config.get('PASSWORD_HASH_WORKERS', 2)
+    
+    if workers <= 0:
+        return fn(*args)
+    
+    with _pool_lock:
+        if _pool is None:
+            _pool = BoundedExecutor(workers, config.get('PASSWORD_HASH_QUEUE_SIZE', 16))
+    return _pool.run(fn, *args)
+
+
+def hash_password(password):
+    """bcrypt hash of a password at the configured cost factor"""
+    rounds = current_app.config.get('BCRYPT_LOG_ROUNDS', 12)
+    salt = bcrypt.gensalt(rounds)
+    return _run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+
+def check_password(password, password_hash):
+    """Whether a password matches a bcrypt hash"""
+    return _run(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+def needs_rehash(password_hash):
+    """Whether a hash was made with a cost factor other than the configured one"""
+    try:
+        rounds = int(password_hash.split('$')[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != current_app.config.get('BCRYPT_LOG_ROUNDS', 12)
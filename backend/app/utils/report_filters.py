@@ -0,0 +1,138 @@
+import math
+from sqlalchemy import and_, or_, func
+from app.models import Report
+from app.utils.search import search_reports
+from app.utils.geo import GEOCELL_BITS, KM_PER_DEGREE, bbox_around, covering_ranges, geocell_bounds, haversine_km
+
+
+def within_bbox(query, south, west, north, east):
+    """Restrict a report query to a bounding box using the geocell index"""
+    ranges = covering_ranges(south, west, north, east)
+    return query.filter(
+        or_(*[and_(Report.geocell >= low, Report.geocell < high) for low, high in ranges]),
+        Report.latitude.between(south, north),
+        Report.longitude.between(west, east)
+    )
+
+
+def within_radius(query, latitude, longitude, radius_km):
+    """
+    Restrict a report query to a circle around a point
+
+    The enclosing box is matched through the geocell index, then the distance
+    is checked with an equirectangular approximation, which needs only
+    arithmetic in SQL and is accurate to well under 1% at city scale.
+    """
+    query = within_bbox(query, *bbox_around(latitude, longitude, radius_km))
+    
+    cos_lat = math.cos(math.radians(latitude))
+    max_degrees = radius_km / KM_PER_DEGREE
+    dlat = Report.latitude - latitude
+    dlng = (Report.longitude - longitude) * cos_lat
+    return query.filter(dlat * dlat + dlng * dlng <= max_degrees * max_degrees)
+
+
+def filter_reports(query, params):
+    """Apply the filters accepted by ReportQuerySchema to a report query"""
+    if params.get('status'):
+        query = query.filter_by(status=params['status'])
+    
+    if params.get('incident_type'):
+        query = query.filter_by(incident_type=params['incident_type'])
+    
+    if params.get('user_id'):
+        query = query.filter_by(user_id=params['user_id'])
+    
+    if params.get('incident_group_id'):
+        query = query.filter_by(incident_group_id=params['incident_group_id'])
+    
+    if params.get('bbox'):
+        query = within_bbox(query, *params['bbox'])
+    
+    if params.get('near'):
+        query = within_radius(query, *params['near'], params['radius_km'])
+    
+    if params.get('q'):
+        query = search_reports(query, params['q'])
+    
+    return query
+
+
+def matches_report(report, params, old_status=None):
+    """
+    Whether a serialized report passes the filters accepted by ReportStreamSchema
+
+    In-memory counterpart of `filter_reports` for live events. A status
+    filter also matches the status a report just left, so subscribers learn
+    when a report drops out of their view.
+    """
+    if params.get('status') and params['status'] not in (report['status'], old_status):
+        return False
+    
+    if params.get('incident_type') and report['incident_type'] != params['incident_type']:
+        return False
+    
+    if params.get('bbox'):
+        south, west, north, east = params['bbox']
+        if not (south <= report['latitude'] <= north and west <= report['longitude'] <= east):
+            return False
+    
+    if params.get('near'):
+        latitude, longitude = params['near']
+        if haversine_km(latitude, longitude, report['latitude'], report['longitude']) > params['radius_km']:
+            return False
+    
+    return True
+
+
+def zoom_to_bits(zoom):
+    """Cell precision giving roughly an 8x8 grid of clusters per web map tile"""
+    return max(2, min(GEOCELL_BITS, 2 * (zoom + 3)))
+
+
+def cluster_reports(query, zoom):
+    """
+    Aggregate reports into grid cells for a map zoom level
+
+    Counts are computed with a single GROUP BY on the geocell prefix, so the
+    result size depends on the number of cells in view rather than the number
+    of reports.
+    """
+    bits = zoom_to_bits(zoom)
+    cell = (Report.geocell // (1 << (GEOCELL_BITS - bits))).label('cell')
+    
+    rows = query.with_entities(
+        cell,
+        Report.incident_type,
+        Report.status,
+        func.count(Report.id),
+        func.sum(Report.latitude),
+        func.sum(Report.longitude)
+    ).group_by(cell, Report.incident_type, Report.status).all()
+    
+    clusters = {}
+    for cell_id, incident_type, status, count, lat_sum, lng_sum in rows:
+        cluster = clusters.get(cell_id)
+        if cluster is None:
+            south, west, north, east = geocell_bounds(cell_id, bits)
+            cluster = clusters[cell_id] = {
+                'cell': cell_id,
+                'bounds': [south, west, north, east],
+                'count': 0,
+                'latitude': 0.0,
+                'longitude': 0.0,
+                'by_type': {},
+                'by_status': {}
+            }
+        cluster['count'] += count
+        cluster['latitude'] += lat_sum
+        cluster['longitude'] += lng_sum
+        cluster['by_type'][incident_type] = cluster['by_type'].get(incident_type, 0) + count
+        cluster['by_status'][status] = cluster['by_status'].get(status, 0) + count
+    
+    # Position each cluster at the mean of its reports
+    for cluster in clusters.values():
+        cluster['latitude'] /= cluster['count']
+        cluster['longitude'] /= cluster['count']
+    
+    return bits, sorted(clusters.values(), key=lambda c: c['cell'])
@@ -0,0 +1,182 @@
+"""
+Full-text search over report titles, addresses and descriptions
+
+The `q=` parameter of the report lists is answered from an inverted index
+maintained by the database itself, so it stays in sync on every insert,
+update and delete without application code:
+
+- PostgreSQL: a GIN expression index over a weighted tsvector (title A,
+  address B, description C). Queries use websearch_to_tsquery, so quoted
+  phrases, `or` and `-word` work as users expect, and are ranked with
+  ts_rank_cd.
+- SQLite: an external-content FTS5 table (reports_fts) kept up to date by
+  triggers, ranked with bm25 using the same column weights.
+
+Both are created by `after_create` DDL on the reports table (for create_all)
+and by the matching migration. SQLite's FTS5 table follows the implicit
+rowid of reports, which VACUUM may renumber; run `flask rebuild-search-index`
+after vacuuming a SQLite database.
+
+Snippets are highlighted with control characters inside the database and
+escaped before <mark> tags are added, so report text can never inject HTML.
+"""
+
+import html
+import re
+from sqlalchemy import DDL, column, event, func, literal, literal_column, table, text
+from app import db
+from app.models import Report
+
+SEARCH_INDEX = 'ix_reports_search'
+SEARCH_TABLE = 'reports_fts'
+
+# Must match the expression of the GIN index exactly for PostgreSQL to use it
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(address, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+SEARCH_TEXT = "concat_ws(' ', title, address, description)"
+
+POSTGRESQL_DDL = [
+    f"CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} ON reports USING gin (({SEARCH_DOCUMENT}))"
+]
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "title, address, description, content='reports', content_rowid='rowid', tokenize='porter unicode61')",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON reports BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, title, address, description) "
+    "VALUES (new.rowid, new.title, new.address, new.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON reports BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, address, description) "
+    "VALUES ('delete', old.rowid, old.title, old.address, old.description); END",
+    f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF title, address, description ON reports BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, title, address, description) "
+    "VALUES ('delete', old.rowid, old.title, old.address, old.description); "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, title, address, description) "
+    "VALUES (new.rowid, new.title, new.address, new.description); END"
+]
+
+for statement in POSTGRESQL_DDL:
+    event.listen(Report.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+for statement in SQLITE_DDL:
+    event.listen(Report.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(Report.__table__, 'before_drop', DDL(f'DROP TABLE IF EXISTS {SEARCH_TABLE}').execute_if(dialect='sqlite'))
+
+# Title, address and description weights for bm25, mirroring A, B and C above
+BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_STOP = '\x03'
+HEADLINE_OPTIONS = (
+    f'StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, '
+    'MaxWords=30, MinWords=12, MaxFragments=2, FragmentDelimiter=" … "'
+)
+
+fts = table(SEARCH_TABLE, column('rowid'))
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keep the search index out of migration autogenerate, it is managed by DDL"""
+    if type_ == 'table' and name.startswith(SEARCH_TABLE):
+        return False
+    if type_ == 'index' and name == SEARCH_INDEX:
+        return False
+    return True
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def has_search_terms(q):
+    """Whether a search string contains anything to search for"""
+    return re.search(r'\w', q) is not None
+
+
+def _fts_query(q):
+    """FTS5 query requiring every word of `q`, with FTS5 syntax neutralised"""
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in re.findall(r'\w+', q))
+
+
+def _ts_document():
+    return literal_column(f'({SEARCH_DOCUMENT})')
+
+
+def _ts_query(q):
+    return func.websearch_to_tsquery(literal_column("'english'"), literal(q))
+
+
+def _join_fts(query):
+    return query.join(fts, fts.c.rowid == literal_column('reports.rowid'))
+
+
+def _fts_match(q):
+    return literal_column(SEARCH_TABLE).op('MATCH')(literal(_fts_query(q)))
+
+
+def search_reports(query, q):
+    """Restrict a report query to reports matching a search string"""
+    if _dialect() == 'postgresql':
+        return query.filter(_ts_document().op('@@')(_ts_query(q)))
+    return _join_fts(query).filter(_fts_match(q))
+
+
+def search_rank(q):
+    """
+    Relevance of a report to a search string, higher is better
+    
+    Only valid in queries already restricted by `search_reports`.
+    """
+    if _dialect() == 'postgresql':
+        return func.ts_rank_cd(_ts_document(), _ts_query(q))
+    return -func.bm25(literal_column(SEARCH_TABLE), *BM25_WEIGHTS)
+
+
+def _mark(snippet):
+    escaped = html.escape(snippet or '')
+    return escaped.replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+
+
+def search_highlights(report_ids, q):
+    """
+    Rank and highlighted snippet of each listed report, in one query
+    
+    Run for the reports of a single page only, building snippets is far
+    more expensive than matching. Returns {report_id: {'rank', 'snippet'}}.
+    """
+    if not report_ids:
+        return {}
+    
+    if _dialect() == 'postgresql':
+        snippet = func.ts_headline(
+            literal_column("'english'"), literal_column(SEARCH_TEXT), _ts_query(q), HEADLINE_OPTIONS
+        )
+        query = db.session.query(Report.id, search_rank(q), snippet)
+    else:
+        snippet = func.snippet(literal_column(SEARCH_TABLE), -1, HIGHLIGHT_START, HIGHLIGHT_STOP, ' … ', 24)
+        query = _join_fts(db.session.query(Report.id, search_rank(q), snippet)).filter(_fts_match(q))
+    
+    rows = query.filter(Report.id.in_(report_ids)).all()
+    return {
+        report_id: {'rank': round(float(rank), 6), 'snippet': _mark(highlighted)}
+        for report_id, rank, highlighted in rows
+    }
+
+
+def add_highlights(items, q):
+    """Attach search rank and snippet to serialized reports"""
+    highlights = search_highlights([item['id'] for item in items], q)
+    for item in items:
+        item['search'] = highlights.get(item['id'])
+    return items
+
+
+def rebuild_search_index():
+    """Rebuild the search index from the reports table"""
+    if _dialect() == 'postgresql':
+        db.session.execute(text(f'REINDEX INDEX {SEARCH_INDEX}'))
+    else:
+        db.session.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"))
+    db.session.commit()
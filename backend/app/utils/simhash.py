@@ -0,0 +1,56 @@
+"""
+SimHash text fingerprints
+
+A 64-bit SimHash maps similar texts to fingerprints differing in few bits,
+so near-duplicate reports can be spotted by comparing two integers instead
+of the texts. Words are lowercased, stopwords dropped and common suffixes
+stripped first; incident reports are short, and without this the shared
+filler words dominate the fingerprint.
+
+Fingerprints are stored as signed 64-bit integers to fit a BIGINT column.
+"""
+
+import hashlib
+import re
+
+BITS = 64
+
+_WORD = re.compile(r'[^\W_]+')
+_STOPWORDS = frozenset(
+    'a an and are as at be been by for from has have had he her his in is it its '
+    'near of on or our people she some several that the their there they this to '
+    'was we were with'.split()
+)
+_SUFFIXES = ('ing', 'ed', 'es', 's')
+
+
+def _stem(word):
+    for suffix in _SUFFIXES:
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def features(text):
+    """Normalized words of a text, each counted once"""
+    return {_stem(word) for word in _WORD.findall(text.lower()) if word not in _STOPWORDS}
+
+
+def simhash(text):
+    """64-bit SimHash of a text as a signed integer, 0 for a text without words"""
+    weights = [0] * BITS
+    for feature in features(text):
+        digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(BITS):
+            weights[bit] += 1 if digest >> bit & 1 else -1
+    
+    value = 0
+    for bit in range(BITS):
+        if weights[bit] > 0:
+            value |= 1 << bit
+    return value - (1 << BITS) if value >= 1 << (BITS - 1) else value
+
+
+def similarity(a, b):
+    """Share of matching bits between two fingerprints, from 0 to 1"""
+    return 1 - bin((a ^ b) & ((1 << BITS) - 1)).count('1') / BITS
@@ -0,0 +1,334 @@
+"""
+Media storage backends
+
+Uploaded files live either on the local filesystem under UPLOAD_FOLDER or in
+an S3-compatible object store (AWS S3, MinIO, ...), selected through
+configuration:
+
+    STORAGE_BACKEND = 'local' | 's3'
+    S3_BUCKET, S3_ENDPOINT_URL, S3_REGION, S3_ACCESS_KEY_ID, S3_SECRET_ACCESS_KEY
+
+Objects are addressed by a key such as 'objects/ab/cd/<sha256>.jpg'. What a
+backend returns from `save` is its "location" for the key, which is what
+Media.file_path stores: a filesystem path for the local backend, and the key
+itself for S3.
+
+With S3 the API can hand out presigned URLs, so clients upload and download
+media directly against the bucket and the bytes never pass through Flask.
+Direct uploads land on a per-upload staging key under tmp/ and are promoted
+to their content address once complete.
+"""
+
+import base64
+import mimetypes
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+class LocalStorageBackend:
+    """Backend storing objects as files under a root directory"""
+    
+    supports_presigned_uploads = False
+    
+    def __init__(self, root):
+        self.root = root
+    
+    def location(self, key):
+        return os.path.join(self.root, *key.split('/'))
+    
+    def key(self, location):
+        return os.path.relpath(location, self.root).replace(os.sep, '/')
+    
+    def exists(self, key):
+        return os.path.isfile(self.location(key))
+    
+    def size(self, key):
+        location = self.location(key)
+        return os.path.getsize(location) if os.path.isfile(location) else None
+    
+    def save(self, key, source_path):
+        """Move a local file into storage, keeping an existing object with the same key"""
+        location = self.location(key)
+        if os.path.exists(location):
+            os.remove(source_path)
+            os.utime(location)  # fresh mtime keeps the orphan scan away from a newly shared file
+        else:
+            os.makedirs(os.path.dirname(location), exist_ok=True)
+            shutil.move(source_path, location)
+        return location
+    
+    def promote(self, source_key, key):
+        """Move a staged object to its key, keeping an existing object with the same key"""
+        return self.save(key, self.location(source_key))
+    
+    def delete(self, location):
+        if os.path.exists(location):
+            os.remove(location)
+            return True
+        return False
+    
+    def list(self, prefix):
+        """Yield (key, last modified) for every object under a key prefix, skipping dotfiles"""
+        for directory, _, filenames in os.walk(self.location(prefix)):
+            for filename in filenames:
+                if filename.startswith('.'):
+                    continue
+                path = os.path.join(directory, filename)
+                modified = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+                yield self.key(path), modified.replace(tzinfo=None)
+    
+    @contextmanager
+    def fetch(self, location):
+        """Local path of an object, for tools that need a real file"""
+        yield location
+    
+    def download_url(self, location, expires=None):
+        return None  # served by the media download route
+
+
+class S3StorageBackend:
+    """Backend for an S3-compatible client (boto3's S3 client API)"""
+    
+    supports_presigned_uploads = True
+    
+    def __init__(self, client, bucket, multipart_chunk_size=8 * 1024 * 1024, presign_expires=900):
+        self.client = client
+        self.bucket = bucket
+        self.multipart_chunk_size = multipart_chunk_size
+        self.presign_expires = presign_expires
+    
+    def location(self, key):
+        return key
+    
+    def key(self, location):
+        return location
+    
+    def _head(self, key):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+    
+    def exists(self, key):
+        return self._head(key) is not None
+    
+    def size(self, key):
+        head = self._head(key)
+        return None if head is None else head['ContentLength']
+    
+    def save(self, key, source_path):
+        """Upload a local file, in parts above the multipart chunk size, then remove it"""
+        from boto3.s3.transfer import TransferConfig
+        
+        if not self.exists(key):
+            config = TransferConfig(
+                multipart_threshold=self.multipart_chunk_size,
+                multipart_chunksize=self.multipart_chunk_size
+            )
+            content_type = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+            self.client.upload_file(
+                source_path, self.bucket, key,
+                ExtraArgs={'ContentType': content_type},
+                Config=config
+            )
+        os.remove(source_path)
+        return key
+    
+    def promote(self, source_key, key):
+        """Move a staged object to its key with a server-side copy, keeping an existing object"""
+        from boto3.s3.transfer import TransferConfig
+        
+        if not self.exists(key):
+            config = TransferConfig(
+                multipart_threshold=self.multipart_chunk_size,
+                multipart_chunksize=self.multipart_chunk_size
+            )
+            self.client.copy({'Bucket': self.bucket, 'Key': source_key}, self.bucket, key, Config=config)
+        self.client.delete_object(Bucket=self.bucket, Key=source_key)
+        return key
+    
+    def delete(self, location):
+        self.client.delete_object(Bucket=self.bucket, Key=location)
+        return True
+    
+    def list(self, prefix):
+        """Yield (key, last modified) for every object under a key prefix"""
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix.rstrip('/') + '/'):
+            for item in page.get('Contents', []):
+                yield item['Key'], item['LastModified'].astimezone(timezone.utc).replace(tzinfo=None)
+    
+    @contextmanager
+    def fetch(self, location):
+        """Download an object to a temporary file for the duration of the block"""
+        suffix = os.path.splitext(location)[1]
+        handle, path = tempfile.mkstemp(suffix=suffix)
+        os.close(handle)
+        try:
+            self.client.download_file(self.bucket, location, path)
+            yield path
+        finally:
+            os.remove(path)
+    
+    def download_url(self, location, expires=None):
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': location},
+            ExpiresIn=expires or self.presign_expires
+        )
+    
+    def presigned_upload(self, key, size, content_type, checksum, expires=None):
+        """
+        Presigned PUT for uploading an object straight to the bucket
+        
+        Length, type and SHA-256 are part of the signature, so the store rejects
+        any body other than the one declared when the upload was created.
+        """
+        encoded_checksum = base64.b64encode(bytes.fromhex(checksum)).decode('ascii')
+        url = self.client.generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': self.bucket,
+                'Key': key,
+                'ContentLength': size,
+                'ContentType': content_type,
+                'ChecksumSHA256': encoded_checksum
+            },
+            ExpiresIn=expires or self.presign_expires
+        )
+        return {
+            'method': 'PUT',
+            'url': url,
+            'headers': {
+                'Content-Length': str(size),
+                'Content-Type': content_type,
+                'x-amz-checksum-sha256': encoded_checksum
+            }
+        }
+
+
+class MediaStore:
+    """Flask extension giving access to the configured storage backend"""
+    
+    def __init__(self, app=None):
+        self.backend = None
+        self.temp_folder = tempfile.gettempdir()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        backend = app.config.get('STORAGE_BACKEND', 'local')
+        
+        if backend == 's3':
+            import boto3
+            client = boto3.client(
+                's3',
+                endpoint_url=app.config.get('S3_ENDPOINT_URL'),
+                region_name=app.config.get('S3_REGION'),
+                aws_access_key_id=app.config.get('S3_ACCESS_KEY_ID'),
+                aws_secret_access_key=app.config.get('S3_SECRET_ACCESS_KEY')
+            )
+            self.backend = S3StorageBackend(
+                client,
+                app.config['S3_BUCKET'],
+                app.config.get('S3_MULTIPART_CHUNK_SIZE', 8 * 1024 * 1024),
+                app.config.get('S3_PRESIGN_EXPIRES', 900)
+            )
+        else:
+            self.backend = LocalStorageBackend(app.config['UPLOAD_FOLDER'])
+        
+        self.temp_folder = os.path.join(app.config['UPLOAD_FOLDER'], 'tmp')
+        app.extensions['media_store'] = self
+    
+    @staticmethod
+    def object_key(checksum, extension):
+        """Content address of a file, sharded as objects/ab/cd/<sha256>.<ext>"""
+        return f'objects/{checksum[:2]}/{checksum[2:4]}/{checksum}.{extension}'
+    
+    @staticmethod
+    def staging_key(upload_id, extension):
+        """Key a direct upload is sent to before its content is verified and addressed"""
+        return f'tmp/{upload_id}.{extension}'
+    
+    @property
+    def supports_presigned_uploads(self):
+        return self.backend.supports_presigned_uploads
+    
+    def location(self, key):
+        return self.backend.location(key)
+    
+    def exists(self, key):
+        return self.backend.exists(key)
+    
+    def size(self, key):
+        return self.backend.size(key)
+    
+    def store(self, temp_path, checksum, extension):
+        """
+        Move a fully written temporary file to its content address
+        
+        When identical content is already stored the temporary file is dropped
+        and the existing object is shared. Returns the object's location.
+        """
+        return self.backend.save(self.object_key(checksum, extension), temp_path)
+    
+    def save_variants(self, location, variants):
+        """
+        Store generated variant files next to their source object
+        
+        `variants` is {name: {format: {'file_path': <temporary file>, ...}}};
+        a copy pointing at the stored locations is returned.
+        """
+        stem = os.path.splitext(self.backend.key(location))[0]
+        stored = {}
+        for name, formats in variants.items():
+            stored[name] = {}
+            for fmt, info in formats.items():
+                stored_location = self.backend.save(f'{stem}_{name}.{fmt}', info['file_path'])
+                stored[name][fmt] = {**info, 'file_path': stored_location}
+        return stored
+    
+    def delete(self, location):
+        return self.backend.delete(location)
+    
+    def key(self, location):
+        return self.backend.key(location)
+    
+    def list(self, prefix):
+        return self.backend.list(prefix)
+    
+    def fetch(self, location):
+        return self.backend.fetch(location)
+    
+    def workdir(self):
+        """Temporary directory for generated files, on the same filesystem as local storage"""
+        return tempfile.TemporaryDirectory(dir=self.temp_folder)
+    
+    def download_url(self, location):
+        return self.backend.download_url(location)
+    
+    def presigned_upload(self, upload_id, checksum, extension, size, content_type):
+        """
+        Presigned request for sending a direct upload to its staging key
+        
+        Never to the content address itself: the store checks the signed
+        checksum against the body, so a staged object proves the client holds
+        the bytes it declared, even when identical content is already stored.
+        """
+        key = self.staging_key(upload_id, extension)
+        return self.backend.presigned_upload(key, size, content_type, checksum)
+    
+    def staged_size(self, upload_id, extension):
+        return self.backend.size(self.staging_key(upload_id, extension))
+    
+    def promote(self, upload_id, checksum, extension):
+        """Move a verified direct upload to its content address and return the object's location"""
+        return self.backend.promote(self.staging_key(upload_id, extension), self.object_key(checksum, extension))
+    
+    def discard_staged(self, upload_id, extension):
+        return self.backend.delete(self.location(self.staging_key(upload_id, extension)))
@@ -0,0 +1,67 @@
+import os
+import shutil
+import subprocess
+
+
+class VideoProcessingError(Exception):
+    """Raised when ffmpeg cannot process a video"""
+    
+    def __init__(self, message, permanent=False):
+        super().__init__(message)
+        self.permanent = permanent  # retrying will not help
+
+
+def _run(command, timeout):
+    binary = command[0]
+    if shutil.which(binary) is None:
+        raise VideoProcessingError(f'{binary} is not installed', permanent=True)
+    
+    try:
+        result = subprocess.run(command, capture_output=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        raise VideoProcessingError(f'{binary} timed out after {timeout}s')
+    
+    if result.returncode != 0:
+        stderr = result.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise VideoProcessingError(stderr[-1] if stderr else f'{binary} exited with {result.returncode}')
+
+
+def _file_info(path, **extra):
+    return {'file_path': path, 'file_size': os.path.getsize(path), **extra}
+
+
+def extract_poster(source_path, ffmpeg='ffmpeg', max_width=1280, timeout=120, output_stem=None):
+    """Grab a JPEG poster frame one second into the video (or the first frame of shorter clips)"""
+    poster_path = f'{output_stem or os.path.splitext(source_path)[0]}_poster.jpg'
+    scale = f"scale='min({max_width},iw)':-2"
+    
+    for seek in ('1', '0'):
+        _run([ffmpeg, '-y', '-loglevel', 'error', '-ss', seek, '-i', source_path,
+              '-frames:v', '1', '-vf', scale, poster_path], timeout)
+        if os.path.exists(poster_path) and os.path.getsize(poster_path) > 0:
+            return {'jpg': _file_info(poster_path)}
+    
+    raise VideoProcessingError('Could not extract a poster frame')
+
+
+def transcode_for_streaming(source_path, ffmpeg='ffmpeg', max_height=720, max_kbps=1500, timeout=1800,
+                            output_stem=None):
+    """
+    Produce an H.264/AAC MP4 rendition capped in height and bitrate
+
+    The moov atom is moved to the front (+faststart) so playback can start
+    before the whole file has downloaded.
+    """
+    output_path = f'{output_stem or os.path.splitext(source_path)[0]}_stream.mp4'
+    
+    _run([
+        ffmpeg, '-y', '-loglevel', 'error', '-i', source_path,
+        '-vf', f"scale=-2:'min({max_height},ih)'",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '28',
+        '-maxrate', f'{max_kbps}k', '-bufsize', f'{2 * max_kbps}k',
+        '-c:a', 'aac', '-b:a', '96k',
+        '-movflags', '+faststart',
+        output_path
+    ], timeout)
+    
+    return {'mp4': _file_info(output_path, mime_type='video/mp4')}
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 from dotenv import load_dotenv
 
@@ -19,6 +20,8 @@ class Config:
     # JWT
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 3600)))
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.getenv('JWT_REFRESH_TOKEN_EXPIRES_DAYS', 30)))
+    REFRESH_REVOCATION_CACHE_SIZE = int(os.getenv('REFRESH_REVOCATION_CACHE_SIZE', 10000))  # revoked sessions kept in memory
     JWT_TOKEN_LOCATION = ['headers']
     JWT_HEADER_NAME = 'Authorization'
     JWT_HEADER_TYPE = 'Bearer'
@@ -28,10 +31,98 @@ class Config:
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
     ALLOWED_IMAGE_EXTENSIONS = set(os.getenv('ALLOWED_IMAGE_EXTENSIONS', 'jpg,jpeg,png,gif').split(','))
     ALLOWED_VIDEO_EXTENSIONS = set(os.getenv('ALLOWED_VIDEO_EXTENSIONS', 'mp4,avi,mov,wmv').split(','))
+    MAX_UPLOAD_SIZE = int(os.getenv('MAX_UPLOAD_SIZE', 512 * 1024 * 1024))  # 512MB, for chunked uploads
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 4 * 1024 * 1024))  # suggested chunk size
+    UPLOAD_SESSION_TIMEOUT = int(os.getenv('UPLOAD_SESSION_TIMEOUT', 24 * 3600))  # seconds before an idle upload expires
+    
+    # Image thumbnails (name:max pixels), generated in the background after upload
+    THUMBNAIL_SIZES = os.getenv('THUMBNAIL_SIZES', 'small:160,medium:480,large:1024')
+    THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+    THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', 80))
+    THUMBNAIL_TIMEOUT = int(os.getenv('THUMBNAIL_TIMEOUT', 600))  # seconds before media-worker takes over a pending image
+    
+    # Video poster frames and streaming renditions, processed by `flask media-worker`
+    FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+    VIDEO_MAX_HEIGHT = int(os.getenv('VIDEO_MAX_HEIGHT', 720))
+    VIDEO_MAX_KBPS = int(os.getenv('VIDEO_MAX_KBPS', 1500))
+    VIDEO_JOB_MAX_ATTEMPTS = int(os.getenv('VIDEO_JOB_MAX_ATTEMPTS', 3))
+    VIDEO_JOB_TIMEOUT = int(os.getenv('VIDEO_JOB_TIMEOUT', 3600))  # seconds before a running job is reclaimed
+    
+    # Media storage: 'local' keeps files under UPLOAD_FOLDER, 's3' uses an
+    # S3-compatible object store (S3_ENDPOINT_URL points at MinIO and friends)
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')
+    S3_BUCKET = os.getenv('S3_BUCKET', 'ajali-media')
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL') or None
+    S3_REGION = os.getenv('S3_REGION') or None
+    S3_ACCESS_KEY_ID = os.getenv('S3_ACCESS_KEY_ID') or None
+    S3_SECRET_ACCESS_KEY = os.getenv('S3_SECRET_ACCESS_KEY') or None
+    S3_MULTIPART_CHUNK_SIZE = int(os.getenv('S3_MULTIPART_CHUNK_SIZE', 8 * 1024 * 1024))
+    S3_PRESIGN_EXPIRES = int(os.getenv('S3_PRESIGN_EXPIRES', 900))  # seconds
+    
+    # Deleted media files are removed by a background reaper, in batches
+    MEDIA_REAPER_WORKERS = int(os.getenv('MEDIA_REAPER_WORKERS', 1))
+    MEDIA_REAPER_BATCH_SIZE = int(os.getenv('MEDIA_REAPER_BATCH_SIZE', 100))
+    MEDIA_REAPER_GRACE = int(os.getenv('MEDIA_REAPER_GRACE', 900))  # seconds, longer than any upload request
+    
+    # Media downloads are streamed by Flask unless offloaded to the web server:
+    # 'x-sendfile' (Apache/lighttpd) or 'x-accel-redirect' (nginx, with an
+    # internal location at MEDIA_ACCEL_REDIRECT_PREFIX aliased to UPLOAD_FOLDER)
+    MEDIA_SENDFILE_MODE = os.getenv('MEDIA_SENDFILE_MODE') or None
+    MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+    MEDIA_CACHE_MAX_AGE = int(os.getenv('MEDIA_CACHE_MAX_AGE', 3600))
+    
+    # Notifications are queued in an outbox and delivered by worker threads
+    NOTIFICATION_WORKERS = int(os.getenv('NOTIFICATION_WORKERS', 2))
+    NOTIFICATION_BATCH_SIZE = int(os.getenv('NOTIFICATION_BATCH_SIZE', 50))
+    NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', 5))
+    EMAIL_TRANSPORT = os.getenv('EMAIL_TRANSPORT', 'log')  # 'log', 'smtp' or 'memory'
+    MAIL_SERVER = os.getenv('MAIL_SERVER', 'localhost')
+    MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
+    MAIL_USERNAME = os.getenv('MAIL_USERNAME')
+    MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
+    MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'true').lower() == 'true'
+    MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', 'AJALI! <no-reply@ajali.local>')
+    SMS_TRANSPORT = os.getenv('SMS_TRANSPORT', 'log')  # 'log', 'africastalking' or 'memory'
+    AT_USERNAME = os.getenv('AT_USERNAME', 'sandbox')
+    AT_API_KEY = os.getenv('AT_API_KEY')
+    AT_API_URL = os.getenv('AT_API_URL') or None
+    SMS_SENDER_ID = os.getenv('SMS_SENDER_ID') or None
+    
+    # Seconds before other processes pick up authority subscription changes
+    AUTHORITY_INDEX_REFRESH_INTERVAL = int(os.getenv('AUTHORITY_INDEX_REFRESH_INTERVAL', 30))
+    
+    # Password hashing, see app/utils/passwords.py
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE_SIZE = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', 16))
+    
+    # Near-duplicate detection when reports are created
+    DUPLICATE_RADIUS_KM = float(os.getenv('DUPLICATE_RADIUS_KM', 0.5))
+    DUPLICATE_WINDOW_MINUTES = int(os.getenv('DUPLICATE_WINDOW_MINUTES', 60))
+    DUPLICATE_MIN_SIMILARITY = float(os.getenv('DUPLICATE_MIN_SIMILARITY', 0.7))  # share of matching SimHash bits
+    DUPLICATE_AUTO_GROUP_SIMILARITY = float(os.getenv('DUPLICATE_AUTO_GROUP_SIMILARITY', 0.85))  # above 1 disables
     
     # Pagination
     REPORTS_PER_PAGE = int(os.getenv('REPORTS_PER_PAGE', 20))
     
+    # Response cache for public report reads
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')  # 'memory', 'redis' or 'null'
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_DEFAULT_TTL = int(os.getenv('CACHE_DEFAULT_TTL', 60))  # seconds
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+    
+    # Live report events (Server-Sent Events at /api/reports/stream)
+    EVENTS_BACKEND = os.getenv('EVENTS_BACKEND', 'memory')  # 'memory' or 'redis'
+    EVENTS_REDIS_URL = os.getenv('EVENTS_REDIS_URL', 'redis://localhost:6379/0')
+    EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 256))  # events buffered per stream
+    EVENTS_HISTORY = int(os.getenv('EVENTS_HISTORY', 1000))  # events kept for Last-Event-ID replay
+    EVENTS_HEARTBEAT = int(os.getenv('EVENTS_HEARTBEAT', 15))  # seconds
+    EVENTS_MAX_SUBSCRIBERS = int(os.getenv('EVENTS_MAX_SUBSCRIBERS', 1000))  # open streams per process
+    
+    # Trend rollups
+    ROLLUP_REGION_PRECISION = int(os.getenv('ROLLUP_REGION_PRECISION', 4))  # geohash characters, 4 is ~40km
+    ROLLUP_REFRESH_INTERVAL = int(os.getenv('ROLLUP_REFRESH_INTERVAL', 300))  # seconds
+    
     # CORS
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000,http://localhost:5173,http://localhost:8080').split(',')
 
@@ -53,6 +144,17 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'postgresql://localhost/ajali_test_db'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(seconds=300)
+    UPLOAD_FOLDER = os.path.join(tempfile.gettempdir(), 'ajali_test_uploads')
+    THUMBNAIL_WORKERS = 0
+    MEDIA_REAPER_WORKERS = 0
+    MEDIA_REAPER_GRACE = 0
+    NOTIFICATION_WORKERS = 0
+    EMAIL_TRANSPORT = 'memory'
+    SMS_TRANSPORT = 'memory'
+    AUTHORITY_INDEX_REFRESH_INTERVAL = 0
+    ROLLUP_REFRESH_INTERVAL = 0
+    EVENTS_HEARTBEAT = 1
+    BCRYPT_LOG_ROUNDS = 4
 
 
 config = {
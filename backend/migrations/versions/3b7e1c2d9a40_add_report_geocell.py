@@ -0,0 +1,47 @@
+"""Add report geocell spatial index
+
+Revision ID: 3b7e1c2d9a40
+Revises: 9e8583f8f63a
+Create Date: 2026-10-17 09:12:41.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.geo import encode_geocell
+
+
+# revision identifiers, used by Alembic.
+revision = '3b7e1c2d9a40'
+down_revision = '9e8583f8f63a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geocell', sa.BigInteger(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_reports_geocell'), ['geocell'], unique=False)
+
+    # Backfill existing reports
+    reports = sa.table(
+        'reports',
+        sa.column('id', sa.String),
+        sa.column('latitude', sa.Float),
+        sa.column('longitude', sa.Float),
+        sa.column('geocell', sa.BigInteger)
+    )
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(reports.c.id, reports.c.latitude, reports.c.longitude)).fetchall()
+    for report_id, latitude, longitude in rows:
+        connection.execute(
+            reports.update()
+            .where(reports.c.id == report_id)
+            .values(geocell=encode_geocell(latitude, longitude))
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_reports_geocell'))
+        batch_op.drop_column('geocell')
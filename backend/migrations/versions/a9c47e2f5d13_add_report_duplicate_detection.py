@@ -0,0 +1,102 @@
+"""Add report text fingerprints and incident groups
+
+Revision ID: a9c47e2f5d13
+Revises: f5d94b3a8e61
+Create Date: 2026-10-17 20:48:17.226054
+
+"""
+import hashlib
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c47e2f5d13'
+down_revision = 'f5d94b3a8e61'
+branch_labels = None
+depends_on = None
+
+# Mirrors app/utils/search.py at the time of this revision
+SQLITE_DDL = [
+    "CREATE TRIGGER IF NOT EXISTS reports_fts_insert AFTER INSERT ON reports BEGIN "
+    "INSERT INTO reports_fts(rowid, title, address, description) "
+    "VALUES (new.rowid, new.title, new.address, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS reports_fts_delete AFTER DELETE ON reports BEGIN "
+    "INSERT INTO reports_fts(reports_fts, rowid, title, address, description) "
+    "VALUES ('delete', old.rowid, old.title, old.address, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS reports_fts_update AFTER UPDATE OF title, address, description ON reports BEGIN "
+    "INSERT INTO reports_fts(reports_fts, rowid, title, address, description) "
+    "VALUES ('delete', old.rowid, old.title, old.address, old.description); "
+    "INSERT INTO reports_fts(rowid, title, address, description) "
+    "VALUES (new.rowid, new.title, new.address, new.description); END",
+    "INSERT INTO reports_fts(reports_fts) VALUES ('rebuild')"
+]
+
+# Mirrors app/utils/simhash.py at the time of this revision
+BITS = 64
+WORD = re.compile(r'[^\W_]+')
+STOPWORDS = frozenset(
+    'a an and are as at be been by for from has have had he her his in is it its '
+    'near of on or our people she some several that the their there they this to '
+    'was we were with'.split()
+)
+SUFFIXES = ('ing', 'ed', 'es', 's')
+
+
+def _stem(word):
+    for suffix in SUFFIXES:
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def simhash(text):
+    weights = [0] * BITS
+    for feature in {_stem(word) for word in WORD.findall(text.lower()) if word not in STOPWORDS}:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(BITS):
+            weights[bit] += 1 if digest >> bit & 1 else -1
+    
+    value = 0
+    for bit in range(BITS):
+        if weights[bit] > 0:
+            value |= 1 << bit
+    return value - (1 << BITS) if value >= 1 << (BITS - 1) else value
+
+
+def upgrade():
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('simhash', sa.BigInteger(), nullable=True))
+        batch_op.add_column(sa.Column('incident_group_id', sa.String(length=36), nullable=True))
+        batch_op.create_index(batch_op.f('ix_reports_incident_group_id'), ['incident_group_id'], unique=False)
+
+    # Backfill existing reports
+    reports = sa.table(
+        'reports',
+        sa.column('id', sa.String),
+        sa.column('title', sa.String),
+        sa.column('description', sa.Text),
+        sa.column('simhash', sa.BigInteger)
+    )
+    connection = op.get_bind()
+    rows = connection.execute(sa.select(reports.c.id, reports.c.title, reports.c.description)).fetchall()
+    for report_id, title, description in rows:
+        connection.execute(
+            reports.update()
+            .where(reports.c.id == report_id)
+            .values(simhash=simhash(f'{title or ""}\n{description or ""}'))
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('reports', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_reports_incident_group_id'))
+        batch_op.drop_column('incident_group_id')
+        batch_op.drop_column('simhash')
+
+    # SQLite rebuilt the table, which dropped the search triggers and may have renumbered rowids
+    if op.get_bind().dialect.name == 'sqlite':
+        for statement in SQLITE_DDL:
+            op.execute(statement)
@@ -0,0 +1,61 @@
+"""Add report full-text search index
+
+Revision ID: f5d94b3a8e61
+Revises: e8b6f2a4c917
+Create Date: 2026-10-17 20:05:43.902311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5d94b3a8e61'
+down_revision = 'e8b6f2a4c917'
+branch_labels = None
+depends_on = None
+
+# Mirrors app/utils/search.py at the time of this revision
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(address, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5("
+    "title, address, description, content='reports', content_rowid='rowid', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS reports_fts_insert AFTER INSERT ON reports BEGIN "
+    "INSERT INTO reports_fts(rowid, title, address, description) "
+    "VALUES (new.rowid, new.title, new.address, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS reports_fts_delete AFTER DELETE ON reports BEGIN "
+    "INSERT INTO reports_fts(reports_fts, rowid, title, address, description) "
+    "VALUES ('delete', old.rowid, old.title, old.address, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS reports_fts_update AFTER UPDATE OF title, address, description ON reports BEGIN "
+    "INSERT INTO reports_fts(reports_fts, rowid, title, address, description) "
+    "VALUES ('delete', old.rowid, old.title, old.address, old.description); "
+    "INSERT INTO reports_fts(rowid, title, address, description) "
+    "VALUES (new.rowid, new.title, new.address, new.description); END",
+    "INSERT INTO reports_fts(reports_fts) VALUES ('rebuild')"
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    
+    if dialect == 'postgresql':
+        op.create_index('ix_reports_search', 'reports', [sa.text(f'({SEARCH_DOCUMENT})')], unique=False, postgresql_using='gin')
+    elif dialect == 'sqlite':
+        for statement in SQLITE_DDL:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    
+    if dialect == 'postgresql':
+        op.drop_index('ix_reports_search', table_name='reports', postgresql_using='gin')
+    elif dialect == 'sqlite':
+        for trigger in ('reports_fts_update', 'reports_fts_delete', 'reports_fts_insert'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS reports_fts')
@@ -1,6 +1,17 @@
 import os
+import multiprocessing
+import threading
+import click
+from datetime import timedelta
 from app import create_app, db
-from app.models import User, Report, Media, StatusHistory
+from app.models import User, Report, Media, StatusHistory, StatCounter
+from app.services.stats_service import StatsService
+from app.services.rollup_service import RollupService
+from app.services.media_pipeline import ThumbnailService, VideoJobService
+from app.services.media_storage import MediaStorage
+from app.services.notification_service import NotificationService
+from app.services.token_service import TokenService
+from app.utils import search
 
 app = create_app()
 
@@ -13,7 +24,8 @@ def make_shell_context():
         'User': User,
         'Report': Report,
         'Media': Media,
-        'StatusHistory': StatusHistory
+        'StatusHistory': StatusHistory,
+        'StatCounter': StatCounter
     }
 
 
@@ -44,11 +56,119 @@ def create_admin():
     admin.set_password(password)
     
     db.session.add(admin)
+    StatsService.record_user_created()
     db.session.commit()
     
     print(f"Admin user '{username}' created successfully!")
 
 
+@app.cli.command()
+def rebuild_stats():
+    """Recompute the admin statistics counters from the database"""
+    counters = StatsService.rebuild()
+    print(f"Rebuilt {len(counters)} statistics counters")
+
+
+@app.cli.command()
+def refresh_rollups():
+    """Bring the report trend rollups up to date"""
+    written = RollupService.refresh()
+    print(f"Wrote {written} rollup rows")
+
+
+def _media_worker_process():
+    """Entry point of a video worker process"""
+    worker_app = create_app()
+    with worker_app.app_context():
+        VideoJobService.work_forever()
+
+
+@app.cli.command()
+@click.option('--processes', default=1, show_default=True, help='Number of worker processes')
+@click.option('--once', is_flag=True, help='Process the queued jobs and exit')
+def media_worker(processes, once):
+    """Run media processing workers: video jobs and stale thumbnails"""
+    if once:
+        print(f"Processed {VideoJobService.run_pending()} media jobs")
+        print(f"Processed {ThumbnailService.process_stale()} stale thumbnails")
+        return
+    
+    workers = [multiprocessing.Process(target=_media_worker_process, daemon=True) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    print(f"Started {processes} media worker process(es)")
+    for worker in workers:
+        worker.join()
+
+
+def _notification_worker_thread():
+    """Entry point of a notification worker thread"""
+    with app.app_context():
+        NotificationService.work_forever()
+
+
+@app.cli.command()
+@click.option('--threads', default=2, show_default=True, help='Number of worker threads')
+@click.option('--once', is_flag=True, help='Deliver the due notifications and exit')
+def notification_worker(threads, once):
+    """Run notification delivery workers"""
+    if once:
+        print(f"Sent {NotificationService.deliver_pending()} notifications")
+        return
+    
+    workers = [threading.Thread(target=_notification_worker_thread, daemon=True) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    print(f"Started {threads} notification worker thread(s)")
+    for worker in workers:
+        worker.join()
+
+
+@app.cli.command()
+def reap_media():
+    """Remove the files of deleted media"""
+    print(f"Removed {MediaStorage.reap()} media files")
+
+
+@app.cli.command()
+@click.option('--interval', default=30.0, show_default=True, help='Seconds to wait when there is nothing to do')
+def media_reaper(interval):
+    """Run the media reaper, retrying failed deletions and expiring abandoned uploads"""
+    print("Started media reaper")
+    MediaStorage.work_forever(interval)
+
+
+@app.cli.command()
+@click.option('--delete', is_flag=True, help='Remove the orphaned files instead of only listing them')
+@click.option('--min-age', default=3600, show_default=True, help='Ignore files younger than this many seconds')
+def scan_orphans(delete, min_age):
+    """Find stored media files that no media row references"""
+    MediaStorage.reap()
+    orphans = MediaStorage.scan_orphans(timedelta(seconds=min_age), delete=delete)
+    for key in orphans:
+        print(key)
+    print(f"{'Removed' if delete else 'Found'} {len(orphans)} orphaned files")
+
+
+@app.cli.command()
+def expire_uploads():
+    """Delete abandoned resumable uploads and their partial files"""
+    print(f"Expired {MediaStorage.expire_uploads()} uploads")
+
+
+@app.cli.command()
+def purge_refresh_tokens():
+    """Delete expired refresh tokens"""
+    print(f"Removed {TokenService.purge_expired()} expired refresh tokens")
+
+
+@app.cli.command()
+def rebuild_search_index():
+    """Rebuild the report full-text search index"""
+    search.rebuild_search_index()
+    print("Search index rebuilt")
+
+
 @app.cli.command()
 def init_db():
     """Initialize the database"""
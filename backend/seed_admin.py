@@ -4,6 +4,7 @@ Creates a default admin account for the AJALI system
 """
 from app import create_app, db
 from app.models import User
+from app.services.stats_service import StatsService
 
 def seed_admin():
     """Create default admin account"""
@@ -42,6 +43,7 @@ def seed_admin():
         admin.set_password('Admin123')
         
         db.session.add(admin)
+        StatsService.record_user_created()
         db.session.commit()
         
         print("✅ Admin account created successfully!")
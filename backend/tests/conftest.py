@@ -1,5 +1,6 @@
 import pytest
-from app import create_app, db
+from sqlalchemy import event
+from app import create_app, db, cache
 from app.models import User, Report
 from config import TestingConfig
 
@@ -16,6 +17,17 @@ def app():
         db.drop_all()
 
 
+@pytest.fixture(autouse=True)
+def clean_db(app):
+    """Remove rows created by a test so fixtures can be re-created"""
+    yield
+    db.session.rollback()
+    for table in reversed(db.metadata.sorted_tables):
+        db.session.execute(table.delete())
+    db.session.commit()
+    cache.clear()
+
+
 @pytest.fixture(scope='function')
 def client(app):
     """Create test client"""
@@ -79,4 +91,29 @@ def admin_headers(client, test_admin):
         'password': 'AdminPass123'
     })
     token = response.json['access_token']
-    return {'Authorization': f'Bearer {token}'}
\ No newline at end of file
+    return {'Authorization': f'Bearer {token}'}
+
+
+class QueryCounter:
+    """Count SQL statements executed against the engine"""
+    
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+    
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+    
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+    
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+@pytest.fixture
+def query_counter(app):
+    """Context manager counting queries issued inside the block"""
+    return QueryCounter(db.engine)
@@ -0,0 +1,307 @@
+import pytest
+
+
+def test_statistics_follow_report_changes(client, auth_headers, admin_headers):
+    """Test the admin statistics counters track creates, status changes and deletes"""
+    response = client.get('/api/admin/stats', headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json['statistics']['total_users'] == 2
+    assert response.json['statistics']['total_reports'] == 0
+    
+    create_response = client.post('/api/reports',
+        headers=auth_headers,
+        json={
+            'title': 'Counted Fire Report',
+            'description': 'This report is used to check the statistics counters.',
+            'incident_type': 'fire',
+            'latitude': -1.2921,
+            'longitude': 36.8219
+        }
+    )
+    report_id = create_response.json['report']['id']
+    
+    client.patch(f'/api/admin/reports/{report_id}/status',
+        headers=admin_headers,
+        json={'status': 'resolved'}
+    )
+    
+    stats = client.get('/api/admin/stats', headers=admin_headers).json['statistics']
+    assert stats['total_reports'] == 1
+    assert stats['reports_by_status']['pending'] == 0
+    assert stats['reports_by_status']['resolved'] == 1
+    assert stats['reports_by_type']['fire'] == 1
+    
+    client.delete(f'/api/reports/{report_id}', headers=auth_headers)
+    
+    stats = client.get('/api/admin/stats', headers=admin_headers).json['statistics']
+    assert stats['total_reports'] == 0
+    assert stats['reports_by_status']['resolved'] == 0
+    assert stats['reports_by_type']['fire'] == 0
+
+
+def test_statistics_first_use_race(client, admin_headers, monkeypatch):
+    """Test a request losing the first-use rebuild race reads the winner's counters"""
+    from app import db
+    from app.models import StatCounter
+    from app.services.stats_service import StatsService
+    
+    rebuild = StatsService.rebuild
+    
+    def rebuild_after_another_request():
+        rebuild()  # the concurrent request commits first
+        db.session.add(StatCounter(key='users', value=0))
+        db.session.commit()
+    
+    monkeypatch.setattr(StatsService, 'rebuild', rebuild_after_another_request)
+    response = client.get('/api/admin/stats', headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json['statistics']['total_users'] == 1  # the admin
+
+
+def test_trends_rollup(client, auth_headers, admin_headers):
+    """Test trend rollups count opened and resolved reports"""
+    report_ids = []
+    for incident_type in ('fire', 'fire', 'medical'):
+        response = client.post('/api/reports',
+            headers=auth_headers,
+            json={
+                'title': f'Trend {incident_type} report',
+                'description': 'This report is used to check the trend rollups.',
+                'incident_type': incident_type,
+                'latitude': -1.2921,
+                'longitude': 36.8219
+            }
+        )
+        report_ids.append(response.json['report']['id'])
+    
+    client.patch(f'/api/admin/reports/{report_ids[0]}/status',
+        headers=admin_headers,
+        json={'status': 'resolved'}
+    )
+    
+    response = client.get('/api/admin/trends?granularity=hour', headers=admin_headers)
+    
+    assert response.status_code == 200
+    trends = response.json['trends']
+    assert sum(b['opened'] for b in trends) == 3
+    assert sum(b['resolved'] for b in trends) == 1
+    assert sum(b['by_type'].get('fire', 0) for b in trends) == 2
+    assert any(b['median_resolve_seconds'] is not None for b in trends)
+    
+    response = client.get('/api/admin/trends?granularity=hour&incident_type=medical', headers=admin_headers)
+    trends = response.json['trends']
+    assert sum(b['opened'] for b in trends) == 1
+    assert sum(b['resolved'] for b in trends) == 0
+
+
+def test_status_update_notifies_reporter(app, client, auth_headers, admin_headers, test_user):
+    """Test status changes queue notifications that are delivered in batches and retried"""
+    from app import db
+    from app.models import Notification, NotificationStatus
+    from app.services.notification_service import NotificationService
+    from app.services.notification_transports import get_transport
+    
+    email, sms = get_transport('email'), get_transport('sms')
+    email.clear()
+    sms.clear()
+    test_user.phone_number = '+254700000000'
+    db.session.commit()
+    
+    response = client.post('/api/reports',
+        headers=auth_headers,
+        json={
+            'title': 'Flooded Underpass',
+            'description': 'This report is used to check status notifications.',
+            'incident_type': 'natural_disaster',
+            'latitude': -1.2921,
+            'longitude': 36.8219
+        }
+    )
+    report_id = response.json['report']['id']
+    assert [message['to'] for message in email.sent] == ['test@example.com']
+    
+    email.fail_with = 'SMTP server unavailable'
+    client.patch(f'/api/admin/reports/{report_id}/status',
+        headers=admin_headers,
+        json={'status': 'under_investigation'}
+    )
+    assert sms.sent[0]['to'] == '+254700000000'
+    assert 'under investigation' in sms.sent[0]['body']
+    
+    failed = Notification.query.filter_by(channel='email', kind='status_update').one()
+    assert failed.status == NotificationStatus.QUEUED
+    assert failed.attempts == 1
+    assert failed.error == 'SMTP server unavailable'
+    
+    # Retry once the backoff has passed
+    email.fail_with = None
+    failed.available_at = failed.created_at
+    db.session.commit()
+    assert NotificationService.deliver_pending() == 1
+    assert Notification.query.get(failed.id).status == NotificationStatus.SENT
+    assert 'under investigation' in email.sent[-1]['subject']
+
+
+def test_smtp_batch_reports_per_message_results(monkeypatch):
+    """Test an SMTP batch keeps messages already sent when later ones fail"""
+    import smtplib
+    from app.services.notification_transports import SMTPTransport
+    
+    class FakeSMTP:
+        def __init__(self, *args, **kwargs):
+            self.delivered = []
+        
+        def starttls(self):
+            pass
+        
+        def send_message(self, email):
+            if email['To'] == 'bounce@example.org':
+                raise smtplib.SMTPDataError(554, b'Message rejected')
+            if email['To'] == 'drop@example.org':
+                raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+            self.delivered.append(email['To'])
+        
+        def quit(self):
+            raise smtplib.SMTPServerDisconnected('please run connect() first')
+        
+        def close(self):
+            pass
+    
+    monkeypatch.setattr(smtplib, 'SMTP', FakeSMTP)
+    recipients = ['a@example.org', 'bounce@example.org', 'b@example.org', 'drop@example.org', 'c@example.org']
+    results = SMTPTransport('localhost', 587, 'no-reply@example.org').send_batch(
+        [{'to': to, 'subject': 'Alert', 'body': 'New report'} for to in recipients]
+    )
+    
+    assert results[0] is None and results[2] is None
+    assert 'Message rejected' in results[1]
+    assert results[3] == results[4] == 'Connection unexpectedly closed'
+
+
+def test_new_report_fans_out_to_subscribed_authorities(client, auth_headers, admin_headers):
+    """Test authorities subscribed to the incident type and area are notified"""
+    from app.services.notification_transports import get_transport
+    
+    email = get_transport('email')
+    email.clear()
+    
+    subscriptions = [
+        {'name': 'Nairobi Fire', 'email': 'fire@example.org', 'incident_types': ['fire'],
+         'latitude': -1.2921, 'longitude': 36.8219, 'radius_km': 10},
+        {'name': 'Nairobi Police', 'email': 'police@example.org', 'incident_types': ['crime'],
+         'latitude': -1.2921, 'longitude': 36.8219, 'radius_km': 10},
+        {'name': 'CBD Wardens', 'email': 'cbd@example.org',
+         'polygon': [[-1.30, 36.80], [-1.30, 36.84], [-1.27, 36.84], [-1.27, 36.80]]},
+        {'name': 'Mombasa Fire', 'email': 'mombasa@example.org', 'incident_types': ['fire'],
+         'latitude': -4.0435, 'longitude': 39.6682, 'radius_km': 20}
+    ]
+    for subscription in subscriptions:
+        response = client.post('/api/admin/subscriptions', headers=admin_headers, json=subscription)
+        assert response.status_code == 201
+    
+    response = client.post('/api/admin/subscriptions', headers=admin_headers,
+        json={'name': 'No Area', 'email': 'nowhere@example.org'}
+    )
+    assert response.status_code == 400
+    
+    client.post('/api/reports',
+        headers=auth_headers,
+        json={
+            'title': 'Building Fire in the CBD',
+            'description': 'This report is used to check authority notifications.',
+            'incident_type': 'fire',
+            'latitude': -1.2864,
+            'longitude': 36.8172
+        }
+    )
+    
+    recipients = {message['to'] for message in email.sent}
+    assert recipients == {'test@example.com', 'fire@example.org', 'cbd@example.org'}
+
+
+def test_subscription_index_only_checks_nearby_cells():
+    """Test the grid index narrows thousands of subscriptions to a few candidates"""
+    import random
+    from app.models import AuthoritySubscription
+    from app.services.authority_service import SubscriptionIndex
+    
+    rng = random.Random(7)
+    subscriptions = [
+        AuthoritySubscription(
+            id=str(i), name=f'Authority {i}', email=f'a{i}@example.org',
+            latitude=rng.uniform(-4.5, 4.5), longitude=rng.uniform(34, 41.5), radius_km=5
+        )
+        for i in range(5000)
+    ]
+    subscriptions.append(AuthoritySubscription(
+        id='national', name='National Disaster Centre', email='ndc@example.org',
+        incident_types=['natural_disaster'],
+        polygon=[[-4.7, 33.9], [-4.7, 41.9], [5.0, 41.9], [5.0, 33.9]]
+    ))
+    index = SubscriptionIndex(subscriptions)
+    
+    latitude, longitude = -1.2864, 36.8172
+    candidates = index.candidates(latitude, longitude)
+    assert len(candidates) < 100
+    
+    expected = {
+        s.id for s in subscriptions
+        if s.radius_km and ((s.latitude - latitude) * 111.2) ** 2 + ((s.longitude - longitude) * 111.2) ** 2 < 4.9 ** 2
+    }
+    matched = {authority.id for authority in index.match(latitude, longitude, 'natural_disaster')}
+    assert expected <= matched
+    assert 'national' in matched
+    assert 'national' not in {a.id for a in index.match(latitude, longitude, 'fire')}
+
+
+def test_admin_links_and_unlinks_incident_groups(client, auth_headers, admin_headers):
+    """Test admins can group reports of one incident by hand and undo it"""
+    reports = []
+    for title, description in [
+        ('Flooded Road on Mombasa Road', 'Water has covered both lanes and cars are stuck in the flood.'),
+        ('Burst Water Main near the Stadium', 'A pipe burst under the road and water is flowing onto it.')
+    ]:
+        response = client.post('/api/reports', headers=auth_headers, json={
+            'title': title,
+            'description': description,
+            'incident_type': 'natural_disaster',
+            'latitude': -1.3000,
+            'longitude': 36.8400
+        })
+        reports.append(response.get_json()['report']['id'])
+    
+    response = client.get(f'/api/admin/reports/{reports[1]}/duplicates', headers=admin_headers)
+    assert response.status_code == 200
+    assert response.get_json()['incident_group_id'] is None
+    
+    response = client.put(f'/api/admin/reports/{reports[1]}/incident-group',
+        headers=admin_headers, json={'report_id': reports[0]}
+    )
+    assert response.status_code == 200
+    
+    response = client.get(f'/api/admin/reports?incident_group_id={reports[0]}', headers=admin_headers)
+    assert {report['id'] for report in response.get_json()['reports']} == set(reports)
+    
+    response = client.put(f'/api/admin/reports/{reports[1]}/incident-group',
+        headers=admin_headers, json={'report_id': reports[1]}
+    )
+    assert response.status_code == 400
+    
+    response = client.put(f'/api/admin/reports/{reports[1]}/incident-group',
+        headers=admin_headers, json={'report_id': None}
+    )
+    assert response.status_code == 200
+    assert response.get_json()['report']['incident_group_id'] is None
+    
+    # The report left behind is not a group of one
+    response = client.get(f'/api/admin/reports?incident_group_id={reports[0]}', headers=admin_headers)
+    assert response.get_json()['reports'] == []
+    
+    # Neither when the report the group was named after leaves it
+    client.put(f'/api/admin/reports/{reports[1]}/incident-group',
+        headers=admin_headers, json={'report_id': reports[0]}
+    )
+    client.put(f'/api/admin/reports/{reports[0]}/incident-group',
+        headers=admin_headers, json={'report_id': None}
+    )
+    assert client.get(f'/api/reports/{reports[1]}').get_json()['report']['incident_group_id'] is None
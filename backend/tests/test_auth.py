@@ -71,4 +71,167 @@ def test_login_nonexistent_user(client):
         'password': 'SomePassword123'
     })
     
-    assert response.status_code == 401
\ No newline at end of file
+    assert response.status_code == 401
+
+
+def test_current_user_resolved_once_per_request(app, db_session, auth_headers, test_user, query_counter):
+    """Test the authenticated user is loaded at most once per request"""
+    from app.middleware.auth import get_current_user
+    
+    user_id = test_user.id
+    db_session.expunge_all()
+    
+    with app.test_request_context('/api/reports', headers=auth_headers):
+        with query_counter:
+            assert get_current_user().id == user_id
+            assert get_current_user().id == user_id
+    
+    assert query_counter.count == 1
+
+
+def test_login_rehashes_after_cost_change(app, client, test_user, db_session):
+    """Test a login upgrades a hash made with an old bcrypt cost factor"""
+    assert test_user.password_hash.startswith('$2b$04$')
+    
+    app.config['BCRYPT_LOG_ROUNDS'] = 5
+    try:
+        response = client.post('/api/auth/login', json={
+            'email': 'test@example.com',
+            'password': 'TestPass123'
+        })
+    finally:
+        app.config['BCRYPT_LOG_ROUNDS'] = 4
+    
+    assert response.status_code == 200
+    db_session.refresh(test_user)
+    assert test_user.password_hash.startswith('$2b$05$')
+    assert test_user.check_password('TestPass123')
+
+
+def test_password_pool_rejects_when_full():
+    """Test the hashing pool refuses work beyond its workers and queue"""
+    import threading
+    from app.utils.passwords import BoundedExecutor, PasswordPoolFull
+    
+    pool = BoundedExecutor(workers=1, queue_size=1)
+    release = threading.Event()
+    running = [pool.submit(release.wait), pool.submit(release.wait)]
+    
+    with pytest.raises(PasswordPoolFull):
+        pool.submit(release.wait)
+    
+    release.set()
+    for future in running:
+        future.result()
+    assert pool.run(sum, [1, 2]) == 3
+
+
+def test_login_busy_returns_429(client, test_user, monkeypatch):
+    """Test logins are turned away while the hashing pool is saturated"""
+    from app.models import User
+    from app.utils.passwords import PasswordPoolFull
+    
+    def saturated(self, password):
+        raise PasswordPoolFull()
+    
+    monkeypatch.setattr(User, 'check_password', saturated)
+    response = client.post('/api/auth/login', json={
+        'email': 'test@example.com',
+        'password': 'TestPass123'
+    })
+    
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
+
+
+def _login(client):
+    return client.post('/api/auth/login', json={
+        'email': 'test@example.com',
+        'password': 'TestPass123'
+    }).json
+
+
+def test_refresh_token_rotation(client, test_user):
+    """Test a refresh token is exchanged once for a new token pair"""
+    tokens = _login(client)
+    assert 'refresh_token' in tokens
+    
+    response = client.post('/api/auth/refresh', headers={'Authorization': f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 200
+    assert response.json['user_id'] == test_user.id
+    rotated = response.json
+    assert rotated['refresh_token'] != tokens['refresh_token']
+    
+    response = client.get(f'/api/reports/stats/{test_user.id}', headers={'Authorization': f"Bearer {rotated['access_token']}"})
+    assert response.status_code == 200
+    
+    # Access tokens cannot be used to refresh
+    response = client.post('/api/auth/refresh', headers={'Authorization': f"Bearer {rotated['access_token']}"})
+    assert response.status_code == 401
+
+
+def test_refresh_token_reuse_revokes_session(client, test_user):
+    """Test presenting a rotated refresh token again ends the whole session"""
+    tokens = _login(client)
+    first = {'Authorization': f"Bearer {tokens['refresh_token']}"}
+    
+    rotated = client.post('/api/auth/refresh', headers=first).json
+    assert client.post('/api/auth/refresh', headers=first).status_code == 401
+    
+    # The successor issued before the reuse was detected is revoked too
+    response = client.post('/api/auth/refresh', headers={'Authorization': f"Bearer {rotated['refresh_token']}"})
+    assert response.status_code == 401
+    
+    # Other sessions of the same user are unaffected
+    other = _login(client)
+    response = client.post('/api/auth/refresh', headers={'Authorization': f"Bearer {other['refresh_token']}"})
+    assert response.status_code == 200
+
+
+def test_logout_revokes_refresh_token(client, test_user):
+    """Test a logged out refresh token can no longer be used"""
+    headers = {'Authorization': f"Bearer {_login(client)['refresh_token']}"}
+    
+    response = client.post('/api/auth/logout', headers=headers)
+    assert response.status_code == 200
+    assert client.post('/api/auth/refresh', headers=headers).status_code == 401
+
+
+def test_register_duplicate_username_single_query(client, test_user, query_counter):
+    """Test a taken username is detected with one lookup"""
+    with query_counter:
+        response = client.post('/api/auth/register', json={
+            'email': 'fresh@example.com',
+            'username': 'testuser',
+            'password': 'SecurePass123',
+            'full_name': 'Fresh User'
+        })
+    
+    assert response.status_code == 409
+    assert response.json['error'] == 'Username already taken'
+    assert query_counter.count == 1
+
+
+def test_register_race_returns_409(client, test_user, monkeypatch):
+    """Test a registration losing a race to the same email gets a 409, not a 500"""
+    from app.routes import auth
+    
+    check = auth._registration_conflict
+    calls = []
+    
+    def missed_first_check(email, username):
+        # The first check runs before the competing registration commits
+        calls.append(email)
+        return None if len(calls) == 1 else check(email, username)
+    
+    monkeypatch.setattr(auth, '_registration_conflict', missed_first_check)
+    response = client.post('/api/auth/register', json={
+        'email': 'test@example.com',
+        'username': 'racinguser',
+        'password': 'SecurePass123',
+        'full_name': 'Racing User'
+    })
+    
+    assert response.status_code == 409
+    assert response.json['error'] == 'Email already registered'
+    assert len(calls) == 2
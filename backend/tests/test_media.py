@@ -0,0 +1,566 @@
+import hashlib
+import os
+import pytest
+
+
+@pytest.fixture
+def report_id(client, auth_headers):
+    """Create a report owned by the test user"""
+    response = client.post('/api/reports',
+        headers=auth_headers,
+        json={
+            'title': 'Report With Media',
+            'description': 'This report is used to check media uploads.',
+            'incident_type': 'accident',
+            'latitude': -1.3031,
+            'longitude': 36.8254
+        }
+    )
+    return response.json['report']['id']
+
+
+def test_resumable_upload(client, auth_headers, report_id):
+    """Test a chunked upload can be resumed and finalized"""
+    content = b'0123456789' * 10
+    
+    response = client.post(f'/api/reports/{report_id}/media/uploads',
+        headers=auth_headers,
+        json={'filename': 'clip.mp4', 'media_type': 'video', 'total_size': len(content)}
+    )
+    assert response.status_code == 201
+    upload_id = response.json['upload']['id']
+    url = f'/api/reports/{report_id}/media/uploads/{upload_id}'
+    
+    response = client.patch(url, headers={**auth_headers, 'Upload-Offset': '0'}, data=content[:60])
+    assert response.status_code == 200
+    assert response.json['upload']['offset'] == 60
+    
+    # A retried chunk at a stale offset is rejected with the offset to resume from
+    response = client.patch(url, headers={**auth_headers, 'Upload-Offset': '0'}, data=content[:60])
+    assert response.status_code == 409
+    assert response.json['upload']['offset'] == 60
+    
+    response = client.post(f'{url}/complete', headers=auth_headers, json={})
+    assert response.status_code == 409
+    
+    response = client.patch(url, headers={**auth_headers, 'Upload-Offset': '60'}, data=content[60:])
+    assert response.json['upload']['offset'] == len(content)
+    
+    response = client.post(f'{url}/complete',
+        headers=auth_headers,
+        json={'checksum': hashlib.sha256(content).hexdigest()}
+    )
+    assert response.status_code == 201
+    media = response.json['media']
+    assert media['file_size'] == len(content)
+    assert media['checksum'] == hashlib.sha256(content).hexdigest()
+    with open(media['file_path'], 'rb') as stored:
+        assert stored.read() == content
+    
+    assert client.get(url, headers=auth_headers).status_code == 404
+
+
+def test_resumable_upload_rejects_overflow(client, auth_headers, report_id):
+    """Test a chunk cannot grow an upload past its declared size"""
+    response = client.post(f'/api/reports/{report_id}/media/uploads',
+        headers=auth_headers,
+        json={'filename': 'photo.jpg', 'media_type': 'image', 'total_size': 4}
+    )
+    upload_id = response.json['upload']['id']
+    url = f'/api/reports/{report_id}/media/uploads/{upload_id}'
+    
+    response = client.patch(url, headers={**auth_headers, 'Upload-Offset': '0'}, data=b'too many bytes')
+    assert response.status_code == 400
+    assert client.get(url, headers=auth_headers).json['upload']['offset'] == 0
+
+
+def test_abandoned_uploads_expire(app, client, auth_headers, report_id):
+    """Test idle upload sessions are deleted with their partial files"""
+    from datetime import datetime, timedelta
+    from app import db, storage
+    from app.models import UploadSession
+    from app.services.media_storage import MediaStorage
+    from app.utils.file_utils import upload_temp_path
+    
+    response = client.post(f'/api/reports/{report_id}/media/uploads',
+        headers=auth_headers,
+        json={'filename': 'clip.mp4', 'media_type': 'video', 'total_size': 100}
+    )
+    upload_id = response.json['upload']['id']
+    client.patch(f'/api/reports/{report_id}/media/uploads/{upload_id}',
+        headers={**auth_headers, 'Upload-Offset': '0'}, data=b'partial'
+    )
+    
+    assert MediaStorage.expire_uploads() == 0
+    assert storage.key(upload_temp_path(upload_id)) not in MediaStorage.scan_orphans(timedelta(0))
+    
+    UploadSession.query.get(upload_id).updated_at = datetime.utcnow() - timedelta(days=2)
+    db.session.commit()
+    
+    assert MediaStorage.expire_uploads() == 1
+    assert UploadSession.query.get(upload_id) is None
+    assert not os.path.exists(upload_temp_path(upload_id))
+
+
+def test_upload_media_streams_and_checksums(client, auth_headers, report_id):
+    """Test a single-request upload records size and checksum"""
+    import io
+    content = b'\x89PNG fake image bytes'
+    
+    response = client.post(f'/api/reports/{report_id}/media',
+        headers=auth_headers,
+        data={'file': (io.BytesIO(content), 'photo.png'), 'media_type': 'image'},
+        content_type='multipart/form-data'
+    )
+    
+    assert response.status_code == 201
+    assert response.json['media']['file_size'] == len(content)
+    assert response.json['media']['checksum'] == hashlib.sha256(content).hexdigest()
+
+
+def test_image_upload_generates_thumbnails(client, auth_headers, report_id):
+    """Test thumbnails and WebP previews are generated for uploaded images"""
+    import io
+    Image = pytest.importorskip('PIL.Image')
+    
+    buffer = io.BytesIO()
+    Image.new('RGB', (1200, 800), color=(200, 30, 30)).save(buffer, 'JPEG')
+    buffer.seek(0)
+    
+    response = client.post(f'/api/reports/{report_id}/media',
+        headers=auth_headers,
+        data={'file': (buffer, 'scene.jpg'), 'media_type': 'image'},
+        content_type='multipart/form-data'
+    )
+    assert response.status_code == 201
+    
+    images = client.get(f'/api/reports/{report_id}').json['report']['media']['images']
+    assert images[0]['processing_status'] == 'ready'
+    small = images[0]['variants']['small']
+    assert max(small['jpg']['width'], small['jpg']['height']) == 160
+    assert os.path.exists(small['webp']['file_path'])
+    
+    # Finishing the thumbnails moves the report on, so polling clients pick them up
+    from app import db
+    from app.models import Media, Report
+    from app.services.media_pipeline import ThumbnailService
+    
+    Media.query.get(images[0]['id']).processing_status = 'pending'
+    db.session.commit()
+    before = Report.query.get(report_id).updated_at
+    ThumbnailService.process(images[0]['id'])
+    assert Report.query.get(report_id).updated_at > before
+
+
+def test_stale_pending_images_recovered(app, client, auth_headers, report_id, monkeypatch):
+    """Test the workers finish images left pending by a restart, and survive their deletion"""
+    import io
+    from datetime import datetime, timedelta
+    from app import db
+    from app.models import Media
+    from app.services import media_pipeline
+    from app.services.media_pipeline import ThumbnailService
+    
+    response = client.post(f'/api/reports/{report_id}/media',
+        headers=auth_headers,
+        data={'file': (io.BytesIO(b'not really a jpeg'), 'scene.jpg'), 'media_type': 'image'},
+        content_type='multipart/form-data'
+    )
+    media_id = response.json['media']['id']
+    
+    def generate(source, sizes, quality, output_stem):
+        return {}
+    
+    monkeypatch.setattr(media_pipeline, 'generate_thumbnails', generate)
+    media = Media.query.get(media_id)
+    media.processing_status = 'pending'
+    media.created_at = datetime.utcnow() - timedelta(seconds=app.config['THUMBNAIL_TIMEOUT'] + 1)
+    db.session.commit()
+    
+    assert ThumbnailService.process_stale() == 1
+    assert Media.query.get(media_id).processing_status == 'ready'
+    assert ThumbnailService.process_stale() == 0
+    
+    def generate_while_deleted(source, sizes, quality, output_stem):
+        Media.query.filter(Media.id == media_id).delete(synchronize_session=False)
+        return {}
+    
+    monkeypatch.setattr(media_pipeline, 'generate_thumbnails', generate_while_deleted)
+    Media.query.get(media_id).processing_status = 'pending'
+    db.session.commit()
+    
+    ThumbnailService.process(media_id)  # must not raise
+    # The delete ran in the same session, so it was rolled back with the update
+    assert Media.query.get(media_id).processing_status == 'pending'
+
+
+def test_video_upload_queues_processing_job(app, client, auth_headers, report_id):
+    """Test a video upload is queued and the job records a permanent failure"""
+    import io
+    from app.models import Media, MediaJob
+    from app.services.media_pipeline import VideoJobService
+    
+    response = client.post(f'/api/reports/{report_id}/media',
+        headers=auth_headers,
+        data={'file': (io.BytesIO(b'not really a video'), 'clip.mov'), 'media_type': 'video'},
+        content_type='multipart/form-data'
+    )
+    assert response.status_code == 201
+    assert response.json['media']['processing_status'] == 'pending'
+    
+    job = MediaJob.query.filter_by(media_id=response.json['media']['id']).one()
+    assert job.status == 'queued'
+    
+    app.config['FFMPEG_BINARY'] = 'ffmpeg-missing-for-tests'
+    try:
+        assert VideoJobService.run_pending() == 1
+    finally:
+        app.config['FFMPEG_BINARY'] = 'ffmpeg'
+    
+    job = MediaJob.query.get(job.id)
+    assert job.status == 'failed'
+    assert job.attempts == 1
+    assert 'not installed' in job.error
+    assert Media.query.get(job.media_id).processing_status == 'failed'
+    assert VideoJobService.run_pending() == 0
+
+
+def test_video_jobs_never_left_running(app, client, auth_headers, report_id, monkeypatch):
+    """Test unexpected job errors are retried and crashed jobs stop being reclaimed"""
+    import io
+    from datetime import datetime, timedelta
+    from app import db, storage
+    from app.models import Media, MediaJob
+    from app.services.media_pipeline import VideoJobService
+    
+    response = client.post(f'/api/reports/{report_id}/media',
+        headers=auth_headers,
+        data={'file': (io.BytesIO(b'not really a video'), 'clip.mov'), 'media_type': 'video'},
+        content_type='multipart/form-data'
+    )
+    job = MediaJob.query.filter_by(media_id=response.json['media']['id']).one()
+    
+    def unavailable(location):
+        raise OSError('storage unavailable')
+    
+    monkeypatch.setattr(storage, 'fetch', unavailable)
+    assert VideoJobService.run_pending() == 1
+    job = MediaJob.query.get(job.id)
+    assert job.status == 'queued'
+    assert job.error == 'storage unavailable'
+    
+    # A worker crashed on the last attempt, the job is failed instead of reclaimed
+    job.status = 'running'
+    job.attempts = app.config['VIDEO_JOB_MAX_ATTEMPTS']
+    job.started_at = datetime.utcnow() - timedelta(seconds=app.config['VIDEO_JOB_TIMEOUT'] + 1)
+    db.session.commit()
+    
+    assert VideoJobService.run_pending() == 0
+    job = MediaJob.query.get(job.id)
+    assert job.status == 'failed'
+    assert Media.query.get(job.media_id).processing_status == 'failed'
+
+
+def test_download_media_supports_ranges(app, client, auth_headers, report_id):
+    """Test media downloads answer range and conditional requests"""
+    import io
+    content = b'0123456789' * 100
+    
+    response = client.post(f'/api/reports/{report_id}/media',
+        headers=auth_headers,
+        data={'file': (io.BytesIO(content), 'clip.mp4'), 'media_type': 'video'},
+        content_type='multipart/form-data'
+    )
+    url = response.json['media']['url']
+    
+    response = client.get(url, headers={'Range': 'bytes=10-19'})
+    assert response.status_code == 206
+    assert response.data == content[10:20]
+    assert response.headers['Content-Range'] == f'bytes 10-19/{len(content)}'
+    
+    etag = client.get(url).headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+    assert client.get(f'{url}?variant=missing').status_code == 404
+    
+    app.config['MEDIA_SENDFILE_MODE'] = 'x-accel-redirect'
+    try:
+        response = client.get(url)
+    finally:
+        app.config['MEDIA_SENDFILE_MODE'] = None
+    assert response.data == b''
+    assert response.headers['X-Accel-Redirect'].startswith('/protected-media/objects/')
+
+
+def test_identical_uploads_share_storage(client, auth_headers, report_id):
+    """Test duplicate content is stored once and kept until its last reference goes"""
+    import io
+    content = b'the same viral clip'
+    
+    uploaded = []
+    for _ in range(2):
+        response = client.post(f'/api/reports/{report_id}/media',
+            headers=auth_headers,
+            data={'file': (io.BytesIO(content), 'clip.mp4'), 'media_type': 'video'},
+            content_type='multipart/form-data'
+        )
+        uploaded.append(response.json['media'])
+    
+    first, second = uploaded
+    assert first['file_path'] == second['file_path']
+    assert hashlib.sha256(content).hexdigest() in first['file_path']
+    
+    response = client.delete(f'/api/reports/{report_id}/media/{first["id"]}', headers=auth_headers)
+    assert response.status_code == 200
+    assert os.path.exists(second['file_path'])
+    
+    client.delete(f'/api/reports/{report_id}/media/{second["id"]}', headers=auth_headers)
+    assert not os.path.exists(second['file_path'])
+
+
+def test_direct_upload_requires_object_storage(client, auth_headers, report_id):
+    """Test presigned uploads are refused by the local storage backend"""
+    response = client.post(f'/api/reports/{report_id}/media/uploads',
+        headers=auth_headers,
+        json={'filename': 'clip.mp4', 'media_type': 'video', 'total_size': 10, 'direct': True}
+    )
+    assert response.status_code == 400
+    assert 'direct' in response.json['messages']
+    
+    response = client.post(f'/api/reports/{report_id}/media/uploads',
+        headers=auth_headers,
+        json={'filename': 'clip.mp4', 'media_type': 'video', 'total_size': 10, 'direct': True, 'checksum': '0' * 64}
+    )
+    assert response.status_code == 400
+    assert 'direct' in response.json['messages']
+
+
+def test_direct_upload_to_object_storage(client, auth_headers, report_id):
+    """Test presigned uploads against an S3-compatible store, e.g. a local MinIO at S3_TEST_ENDPOINT_URL"""
+    import urllib.request
+    boto3 = pytest.importorskip('boto3')
+    endpoint = os.getenv('S3_TEST_ENDPOINT_URL')
+    if not endpoint:
+        pytest.skip('S3_TEST_ENDPOINT_URL is not set')
+    from app import storage
+    from app.utils.storage import S3StorageBackend
+    
+    s3 = boto3.client('s3',
+        endpoint_url=endpoint,
+        region_name='us-east-1',
+        aws_access_key_id=os.getenv('S3_TEST_ACCESS_KEY_ID', 'minioadmin'),
+        aws_secret_access_key=os.getenv('S3_TEST_SECRET_ACCESS_KEY', 'minioadmin')
+    )
+    try:
+        s3.create_bucket(Bucket='ajali-test')
+    except s3.exceptions.BucketAlreadyOwnedByYou:
+        pass
+    
+    content = os.urandom(1024)
+    checksum = hashlib.sha256(content).hexdigest()
+    
+    local_backend = storage.backend
+    storage.backend = S3StorageBackend(s3, 'ajali-test')
+    try:
+        response = client.post(f'/api/reports/{report_id}/media/uploads',
+            headers=auth_headers,
+            json={'filename': 'clip.mp4', 'media_type': 'video', 'total_size': len(content),
+                  'checksum': checksum, 'direct': True}
+        )
+        assert response.status_code == 201
+        direct = response.json['direct_upload']
+        url = f"/api/reports/{report_id}/media/uploads/{response.json['upload']['id']}"
+        
+        assert client.post(f'{url}/complete', headers=auth_headers, json={}).status_code == 409
+        
+        put = urllib.request.Request(direct['url'], data=content, method=direct['method'], headers=direct['headers'])
+        urllib.request.urlopen(put).close()
+        
+        response = client.post(f'{url}/complete', headers=auth_headers, json={})
+        assert response.status_code == 201
+        media = response.json['media']
+        assert media['file_path'] == f'objects/{checksum[:2]}/{checksum[2:4]}/{checksum}.mp4'
+        assert client.get(media['url']).status_code == 302
+    finally:
+        storage.backend = local_backend
+
+
+class StubS3Client:
+    """Just enough of boto3's S3 client API to exercise S3StorageBackend without a store"""
+    
+    class exceptions:
+        class ClientError(Exception):
+            def __init__(self, code):
+                super().__init__(code)
+                self.response = {'Error': {'Code': code}}
+    
+    def __init__(self, objects=None):
+        self.objects = dict(objects or {})
+        self.calls = []
+    
+    def head_object(self, Bucket, Key):
+        if Key == 'forbidden':
+            raise self.exceptions.ClientError('403')
+        if Key not in self.objects:
+            raise self.exceptions.ClientError('404')
+        return {'ContentLength': len(self.objects[Key])}
+    
+    def copy(self, source, bucket, key, Config=None):
+        self.calls.append(('copy', source['Key'], key))
+        self.objects[key] = self.objects[source['Key']]
+    
+    def delete_object(self, Bucket, Key):
+        self.calls.append(('delete', Key))
+        self.objects.pop(Key, None)
+    
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        self.calls.append(('presign', operation, Params, ExpiresIn))
+        return f"https://{Params['Bucket']}.example.com/{Params['Key']}?signed"
+    
+    def get_paginator(self, operation):
+        objects = self.objects
+        
+        class Paginator:
+            def paginate(self, Bucket, Prefix):
+                from datetime import datetime, timezone
+                modified = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+                keys = sorted(key for key in objects if key.startswith(Prefix))
+                yield {'Contents': [{'Key': key, 'LastModified': modified} for key in keys[:1]]}
+                yield {'Contents': [{'Key': key, 'LastModified': modified} for key in keys[1:]]}
+                yield {}
+        
+        return Paginator()
+
+
+def test_s3_backend_presigns_direct_uploads():
+    """Test presigned uploads sign the declared length, type and checksum"""
+    import base64
+    from app.utils.storage import S3StorageBackend
+    
+    client = StubS3Client()
+    backend = S3StorageBackend(client, 'ajali', presign_expires=60)
+    checksum = hashlib.sha256(b'clip').hexdigest()
+    
+    direct = backend.presigned_upload('tmp/upload.mp4', 4, 'video/mp4', checksum)
+    
+    encoded = base64.b64encode(bytes.fromhex(checksum)).decode('ascii')
+    assert direct['method'] == 'PUT'
+    assert direct['url'] == 'https://ajali.example.com/tmp/upload.mp4?signed'
+    assert direct['headers'] == {'Content-Length': '4', 'Content-Type': 'video/mp4', 'x-amz-checksum-sha256': encoded}
+    _, operation, params, expires = client.calls[0]
+    assert operation == 'put_object'
+    assert params == {'Bucket': 'ajali', 'Key': 'tmp/upload.mp4', 'ContentLength': 4,
+                      'ContentType': 'video/mp4', 'ChecksumSHA256': encoded}
+    assert expires == 60
+
+
+def test_s3_backend_head_and_list():
+    """Test missing objects read as absent, other errors surface, and listing follows pages"""
+    from app.utils.storage import S3StorageBackend
+    
+    client = StubS3Client({'tmp/a.mp4': b'abc', 'tmp/b.mp4': b'', 'objects/ab/cd/x.jpg': b'x'})
+    backend = S3StorageBackend(client, 'ajali')
+    
+    assert backend.exists('tmp/a.mp4')
+    assert backend.size('tmp/a.mp4') == 3
+    assert backend.size('tmp/b.mp4') == 0
+    assert not backend.exists('tmp/missing.mp4')
+    assert backend.size('tmp/missing.mp4') is None
+    with pytest.raises(StubS3Client.exceptions.ClientError):
+        backend.exists('forbidden')
+    
+    listed = list(backend.list('tmp'))
+    assert [key for key, _ in listed] == ['tmp/a.mp4', 'tmp/b.mp4']
+    assert all(modified.tzinfo is None and modified.hour == 12 for _, modified in listed)
+
+
+def test_s3_backend_promotes_staged_objects():
+    """Test promotion copies new content and only drops the staged copy of existing content"""
+    pytest.importorskip('boto3')
+    from app.utils.storage import S3StorageBackend
+    
+    client = StubS3Client({'tmp/new.jpg': b'new', 'tmp/dup.jpg': b'dup', 'objects/dup.jpg': b'dup'})
+    backend = S3StorageBackend(client, 'ajali')
+    
+    assert backend.promote('tmp/new.jpg', 'objects/new.jpg') == 'objects/new.jpg'
+    assert backend.promote('tmp/dup.jpg', 'objects/dup.jpg') == 'objects/dup.jpg'
+    
+    assert client.calls == [
+        ('copy', 'tmp/new.jpg', 'objects/new.jpg'),
+        ('delete', 'tmp/new.jpg'),
+        ('delete', 'tmp/dup.jpg')
+    ]
+    assert set(client.objects) == {'objects/new.jpg', 'objects/dup.jpg'}
+
+
+def test_report_deletion_reaps_media_after_commit(app, client, auth_headers, report_id):
+    """Test deleted media goes through the outbox and orphans are found by the scan"""
+    import io
+    import time
+    from datetime import timedelta
+    from app import storage
+    from app.models import FileDeletion
+    from app.services.media_storage import MediaStorage
+    
+    response = client.post(f'/api/reports/{report_id}/media',
+        headers=auth_headers,
+        data={'file': (io.BytesIO(b'footage of the scene'), 'scene.mp4'), 'media_type': 'video'},
+        content_type='multipart/form-data'
+    )
+    file_path = response.json['media']['file_path']
+    
+    assert client.delete(f'/api/reports/{report_id}', headers=auth_headers).status_code == 200
+    assert not os.path.exists(file_path)
+    assert FileDeletion.query.count() == 0
+    
+    stray = storage.location(storage.object_key('f' * 64, 'jpg'))
+    os.makedirs(os.path.dirname(stray), exist_ok=True)
+    open(stray, 'wb').close()
+    an_hour_ago = time.time() - 3600
+    os.utime(stray, (an_hour_ago, an_hour_ago))
+    
+    abandoned = os.path.join(storage.temp_folder, 'abandoned-upload.part')
+    open(abandoned, 'wb').close()
+    os.utime(abandoned, (an_hour_ago, an_hour_ago))
+    
+    orphans = MediaStorage.scan_orphans(timedelta(minutes=30), delete=True)
+    assert storage.key(stray) in orphans
+    assert not os.path.exists(stray)
+    assert 'tmp/abandoned-upload.part' in orphans
+    assert not os.path.exists(abandoned)
+
+
+def test_reaper_keeps_files_an_upload_may_share(app, client, auth_headers, test_user, report_id):
+    """Test deleted files wait out the grace period and stay while an open upload claims them"""
+    import io
+    from datetime import datetime, timedelta
+    from app import db
+    from app.models import FileDeletion, UploadSession
+    from app.services.media_storage import MediaStorage
+    
+    content = b'clip filmed by two witnesses'
+    response = client.post(f'/api/reports/{report_id}/media',
+        headers=auth_headers,
+        data={'file': (io.BytesIO(content), 'clip.mp4'), 'media_type': 'video'},
+        content_type='multipart/form-data'
+    )
+    media = response.json['media']
+    
+    app.config['MEDIA_REAPER_GRACE'] = 900
+    try:
+        client.delete(f"/api/reports/{report_id}/media/{media['id']}", headers=auth_headers)
+    finally:
+        app.config['MEDIA_REAPER_GRACE'] = 0
+    assert os.path.exists(media['file_path'])
+    assert MediaStorage.reap() == 0
+    
+    # Past the grace period, but another upload of the same file is being completed
+    db.session.add(UploadSession(
+        filename='clip.mp4', media_type='video', mime_type='video/mp4', total_size=len(content),
+        checksum=media['checksum'], report_id=report_id, user_id=test_user.id
+    ))
+    FileDeletion.query.update({'available_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+    
+    assert MediaStorage.reap() == 0
+    assert os.path.exists(media['file_path'])
+    assert FileDeletion.query.count() == 0
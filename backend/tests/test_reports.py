@@ -1,3 +1,5 @@
+import itertools
+import json
 import pytest
 
 
@@ -133,4 +135,472 @@ def test_delete_own_report(client, auth_headers, db_session):
     
     # Verify deletion
     get_response = client.get(f'/api/reports/{report_id}')
-    assert get_response.status_code == 404
\ No newline at end of file
+    assert get_response.status_code == 404
+
+def test_list_reports_constant_queries(client, test_user, db_session, query_counter):
+    """Test listing reports does not issue per-report queries"""
+    from app import cache
+    from app.models import Report, Media
+    
+    def add_reports(count):
+        for i in range(count):
+            report = Report(
+                title=f'Batch Report {i}',
+                description='A report used to check the number of list queries.',
+                incident_type='accident',
+                latitude=-1.3031,
+                longitude=36.8254,
+                user_id=test_user.id
+            )
+            db_session.add(report)
+            db_session.flush()
+            for media_type in ('image', 'video'):
+                db_session.add(Media(
+                    filename=f'{media_type}.bin',
+                    file_path=f'uploads/{media_type}s/{report.id}.bin',
+                    media_type=media_type,
+                    file_size=10,
+                    mime_type='application/octet-stream',
+                    report_id=report.id
+                ))
+        db_session.commit()
+        cache.invalidate_report()
+    
+    add_reports(2)
+    with query_counter:
+        response = client.get('/api/reports?per_page=100')
+    small_page_queries = query_counter.count
+    
+    add_reports(20)
+    with query_counter:
+        response = client.get('/api/reports?per_page=100')
+    
+    assert response.status_code == 200
+    assert len(response.json['reports']) == 22
+    assert len(response.json['reports'][0]['media']['images']) == 1
+    assert len(response.json['reports'][0]['media']['videos']) == 1
+    assert response.json['reports'][0]['user']['id'] == test_user.id
+    assert query_counter.count == small_page_queries
+
+
+def test_get_reports_cursor_pagination(client, test_user, db_session):
+    """Test walking the report list with keyset cursors"""
+    from app.models import Report
+    
+    for i in range(5):
+        db_session.add(Report(
+            title=f'Cursor Report {i}',
+            description='A report used to check cursor based pagination.',
+            incident_type='fire',
+            latitude=-1.2921,
+            longitude=36.8219,
+            user_id=test_user.id
+        ))
+    db_session.commit()
+    
+    seen = []
+    cursor = ''
+    while True:
+        response = client.get(f'/api/reports?per_page=2&include_total=false&cursor={cursor}')
+        assert response.status_code == 200
+        assert 'total' not in response.json['pagination']
+        seen.extend(r['id'] for r in response.json['reports'])
+        if not response.json['pagination']['has_next']:
+            break
+        cursor = response.json['pagination']['next_cursor']
+    
+    assert len(seen) == 5
+    assert len(set(seen)) == 5
+
+
+def test_get_reports_invalid_cursor(client):
+    """Test an invalid cursor is rejected"""
+    response = client.get('/api/reports?cursor=not-a-cursor')
+    
+    assert response.status_code == 400
+
+
+def test_get_reports_location_filters(client, test_user, db_session):
+    """Test radius and bounding box filters"""
+    from app.models import Report
+    
+    locations = {
+        'CBD': (-1.2864, 36.8172),
+        'Westlands': (-1.2676, 36.8108),
+        'Mombasa': (-4.0435, 39.6682)
+    }
+    for name, (latitude, longitude) in locations.items():
+        db_session.add(Report(
+            title=f'Incident in {name}',
+            description='A report used to check the location filters.',
+            incident_type='accident',
+            latitude=latitude,
+            longitude=longitude,
+            user_id=test_user.id
+        ))
+    db_session.commit()
+    
+    response = client.get('/api/reports?near=-1.2864,36.8172&radius_km=1')
+    assert response.status_code == 200
+    assert [r['title'] for r in response.json['reports']] == ['Incident in CBD']
+    
+    response = client.get('/api/reports?near=-1.2864,36.8172&radius_km=5')
+    assert {r['title'] for r in response.json['reports']} == {'Incident in CBD', 'Incident in Westlands'}
+    
+    response = client.get('/api/reports?bbox=-5,38,-3,40')
+    assert [r['title'] for r in response.json['reports']] == ['Incident in Mombasa']
+    
+    response = client.get('/api/reports?near=-1.2864,36.8172')
+    assert response.status_code == 400
+
+
+def test_get_report_clusters(client, test_user, db_session):
+    """Test reports are aggregated into map clusters"""
+    from app.models import Report
+    
+    points = [
+        ('accident', -1.2864, 36.8172),
+        ('fire', -1.2676, 36.8108),
+        ('accident', -4.0435, 39.6682)
+    ]
+    for incident_type, latitude, longitude in points:
+        db_session.add(Report(
+            title=f'Clustered {incident_type}',
+            description='A report used to check the map cluster aggregation.',
+            incident_type=incident_type,
+            latitude=latitude,
+            longitude=longitude,
+            user_id=test_user.id
+        ))
+    db_session.commit()
+    
+    response = client.get('/api/reports/clusters?zoom=3&bbox=-5,35,0,40')
+    
+    assert response.status_code == 200
+    clusters = response.json['clusters']
+    assert sum(c['count'] for c in clusters) == 3
+    nairobi = next(c for c in clusters if c['count'] == 2)
+    assert nairobi['by_type'] == {'accident': 1, 'fire': 1}
+    assert nairobi['by_status'] == {'pending': 2}
+    
+    response = client.get('/api/reports/clusters?zoom=3')
+    assert response.status_code == 400
+
+
+def test_get_user_stats(client, auth_headers, test_user, db_session, query_counter):
+    """Test user statistics cover every status in one aggregate query"""
+    from app.models import Report
+    
+    for incident_type, status in [('fire', 'pending'), ('fire', 'resolved'), ('crime', 'under_investigation')]:
+        db_session.add(Report(
+            title=f'Stats {incident_type} report',
+            description='A report used to check the user statistics endpoint.',
+            incident_type=incident_type,
+            latitude=-1.2921,
+            longitude=36.8219,
+            status=status,
+            user_id=test_user.id
+        ))
+    db_session.commit()
+    
+    with query_counter:
+        response = client.get(f'/api/reports/stats/{test_user.id}?by_type=true', headers=auth_headers)
+    
+    assert response.status_code == 200
+    assert response.json['total'] == 3
+    assert response.json['pending'] == 1
+    assert response.json['under_investigation'] == 1
+    assert response.json['resolved'] == 1
+    assert response.json['rejected'] == 0
+    assert response.json['by_type']['fire']['total'] == 2
+    assert response.json['by_type']['crime']['under_investigation'] == 1
+    # One query for the current user, one for the aggregate
+    assert query_counter.count == 2
+
+
+def test_report_cache_invalidated_on_update(client, auth_headers):
+    """Test cached list and detail responses are refreshed after an update"""
+    create_response = client.post('/api/reports',
+        headers=auth_headers,
+        json={
+            'title': 'Cached Report',
+            'description': 'This report is used to check response cache invalidation.',
+            'incident_type': 'fire',
+            'latitude': -1.3031,
+            'longitude': 36.8254
+        }
+    )
+    report_id = create_response.json['report']['id']
+    
+    assert client.get('/api/reports').json['reports'][0]['title'] == 'Cached Report'
+    assert client.get(f'/api/reports/{report_id}').json['report']['title'] == 'Cached Report'
+    
+    client.put(f'/api/reports/{report_id}', headers=auth_headers, json={'title': 'Renamed Report'})
+    
+    assert client.get('/api/reports').json['reports'][0]['title'] == 'Renamed Report'
+    assert client.get(f'/api/reports/{report_id}').json['report']['title'] == 'Renamed Report'
+
+
+def test_report_detail_built_before_invalidation_not_served(app):
+    """Test a detail payload built from data older than an invalidation is not served"""
+    from app import cache
+    
+    def build_then_write():
+        payload = {'report': {'title': 'Before the update'}}
+        cache.invalidate_report('racing-report')  # a write commits while building
+        return payload
+    
+    cache.report_detail('racing-report', build_then_write, 'v1')
+    payload = cache.report_detail('racing-report', lambda: {'report': {'title': 'After the update'}}, 'v1')
+    assert payload['report']['title'] == 'After the update'
+
+
+def test_cached_payload_rebuilt_for_new_version(app):
+    """Test a cached payload is never served under a validator it was not built for"""
+    from app import cache
+    
+    cache.report_detail('versioned-report', lambda: {'report': {'title': 'Old'}}, 'v1')
+    payload = cache.report_detail('versioned-report', lambda: {'report': {'title': 'New'}}, 'v2')
+    assert payload['report']['title'] == 'New'
+
+
+def test_report_conditional_get(client, auth_headers):
+    """Test report detail and list honour If-None-Match"""
+    create_response = client.post('/api/reports',
+        headers=auth_headers,
+        json={
+            'title': 'Polled Report',
+            'description': 'This report is polled by a client using entity tags.',
+            'incident_type': 'medical',
+            'latitude': -1.3031,
+            'longitude': 36.8254
+        }
+    )
+    report_id = create_response.json['report']['id']
+    
+    response = client.get(f'/api/reports/{report_id}')
+    etag = response.headers['ETag']
+    list_etag = client.get('/api/reports').headers['ETag']
+    
+    response = client.get(f'/api/reports/{report_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert client.get('/api/reports', headers={'If-None-Match': list_etag}).status_code == 304
+    
+    client.put(f'/api/reports/{report_id}', headers=auth_headers, json={'title': 'Polled Report v2'})
+    
+    response = client.get(f'/api/reports/{report_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json['report']['title'] == 'Polled Report v2'
+    assert client.get('/api/reports', headers={'If-None-Match': list_etag}).status_code == 200
+
+
+def test_conditional_reads_skip_build_after_cache_miss(client, auth_headers, query_counter):
+    """Test If-None-Match is answered from the cheap validator even when the cache is cold"""
+    from app import cache
+    
+    create_response = client.post('/api/reports',
+        headers=auth_headers,
+        json={
+            'title': 'Revalidated Report',
+            'description': 'This report is revalidated after the response cache moved on.',
+            'incident_type': 'fire',
+            'latitude': -1.3031,
+            'longitude': 36.8254
+        }
+    )
+    report_id = create_response.json['report']['id']
+    
+    etag = client.get(f'/api/reports/{report_id}').headers['ETag']
+    list_etag = client.get('/api/reports').headers['ETag']
+    cache.invalidate_report('unrelated-report')  # any write starts a new generation
+    
+    with query_counter:
+        assert client.get(f'/api/reports/{report_id}', headers={'If-None-Match': etag}).status_code == 304
+    # Only the updated_at lookup, the report is not loaded
+    assert query_counter.count == 1
+    
+    with query_counter:
+        assert client.get('/api/reports', headers={'If-None-Match': list_etag}).status_code == 304
+    # The page ids and update times, then the total
+    assert query_counter.count == 2
+
+
+def _read_event(chunks, max_chunks=5):
+    """Next event from a Server-Sent Events stream, skipping at most a few keep-alives"""
+    for chunk in itertools.islice(chunks, max_chunks):
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith('id:'):
+            fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+            fields['data'] = json.loads(fields['data'])
+            return fields
+    raise AssertionError('No event received from the stream')
+
+
+def test_report_stream_pushes_filtered_events(client, auth_headers):
+    """Test the event stream only pushes changes matching its filters"""
+    response = client.get('/api/reports/stream?incident_type=fire&bbox=-1.4,36.7,-1.2,36.9', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    
+    def create(title, incident_type, latitude):
+        return client.post('/api/reports', headers=auth_headers, json={
+            'title': title,
+            'description': 'This report is pushed to clients listening on the stream.',
+            'incident_type': incident_type,
+            'latitude': latitude,
+            'longitude': 36.8254
+        }).json['report']['id']
+    
+    create('Accident in view', 'accident', -1.3031)
+    create('Fire out of view', 'fire', 0.5)
+    report_id = create('Fire in view', 'fire', -1.3031)
+    client.put(f'/api/reports/{report_id}', headers=auth_headers, json={'title': 'Fire in view, spreading'})
+    
+    event = _read_event(chunks)
+    assert event['event'] == 'report.created'
+    assert event['data']['report']['id'] == report_id
+    last_event_id = event['id']
+    
+    event = _read_event(chunks)
+    assert event['event'] == 'report.updated'
+    assert event['data']['report']['title'] == 'Fire in view, spreading'
+    response.close()
+    
+    # A reconnecting client gets the events it missed
+    response = client.get('/api/reports/stream?incident_type=fire', buffered=False,
+                          headers={'Last-Event-ID': last_event_id})
+    event = _read_event(iter(response.response))
+    assert event['event'] == 'report.updated'
+    assert event['data']['report']['id'] == report_id
+    response.close()
+
+
+def test_status_change_event_hides_admin_details(client, auth_headers, admin_headers):
+    """Test the public stream carries status changes without the admin's comment or identity"""
+    stream = client.get('/api/reports/stream', buffered=False)
+    chunks = iter(stream.response)
+    
+    report_id = client.post('/api/reports', headers=auth_headers, json={
+        'title': 'Report under review',
+        'description': 'This report has its status changed by an admin.',
+        'incident_type': 'crime',
+        'latitude': -1.3031,
+        'longitude': 36.8254
+    }).json['report']['id']
+    response = client.patch(f'/api/admin/reports/{report_id}/status', headers=admin_headers,
+        json={'status': 'under_investigation', 'comment': 'Internal note for the team'}
+    )
+    assert response.status_code == 200
+    
+    assert _read_event(chunks)['event'] == 'report.created'
+    event = _read_event(chunks)
+    stream.close()
+    assert event['event'] == 'report.status_changed'
+    assert event['data']['old_status'] == 'pending'
+    assert set(event['data']) == {'report', 'old_status'}
+
+
+def test_report_stream_invalid_filter(client):
+    """Test the event stream validates its filters"""
+    response = client.get('/api/reports/stream?bbox=1,2,3')
+    assert response.status_code == 400
+
+
+def test_search_reports(client, auth_headers, test_user, db_session):
+    """Test full-text search ranks matches and highlights them"""
+    from app.models import Report
+    
+    reports = [
+        ('Collision on Uhuru Highway', 'Two matatus collided near the roundabout during rush hour.', 'Uhuru Highway, Nairobi'),
+        ('Fire in Gikomba market', 'Stalls caught fire and traders need help <b>now</b>, smoke is visible from Uhuru Highway.', 'Gikomba'),
+        ('Flooding in Kibera', 'Heavy rain flooded homes along the river.', 'Kibera')
+    ]
+    for title, description, address in reports:
+        db_session.add(Report(
+            title=title,
+            description=description,
+            incident_type='other',
+            latitude=-1.2864,
+            longitude=36.8172,
+            address=address,
+            user_id=test_user.id
+        ))
+    db_session.commit()
+    
+    response = client.get('/api/reports?q=uhuru highway')
+    assert response.status_code == 200
+    results = response.json['reports']
+    
+    # Title and address matches outrank a mention in the description
+    assert [r['title'] for r in results] == ['Collision on Uhuru Highway', 'Fire in Gikomba market']
+    assert results[0]['search']['rank'] > results[1]['search']['rank']
+    assert '<mark>Uhuru</mark>' in results[0]['search']['snippet']
+    assert '&lt;b&gt;' in results[1]['search']['snippet']
+    
+    # Stemming matches other forms of a word, and updates are indexed
+    assert [r['title'] for r in client.get('/api/reports?q=collisions').json['reports']] == ['Collision on Uhuru Highway']
+    
+    report_id = results[1]['id']
+    client.put(f'/api/reports/{report_id}', headers=auth_headers, json={'title': 'Fire in Toi market'})
+    assert [r['title'] for r in client.get('/api/reports?q=toi').json['reports']] == ['Fire in Toi market']
+    assert client.get('/api/reports?q=gikomba market').json['pagination']['total'] == 1
+    
+    # Search syntax typed by users is taken literally
+    assert client.get('/api/reports?q=kibera OR "flood*').status_code == 200
+    assert client.get('/api/reports?q=?!').status_code == 400
+
+
+def test_create_report_flags_duplicates(client, auth_headers):
+    """Test new reports are matched against recent similar reports nearby"""
+    def create(title, description, latitude=-1.3031, incident_type='accident'):
+        return client.post('/api/reports', headers=auth_headers, json={
+            'title': title,
+            'description': description,
+            'incident_type': incident_type,
+            'latitude': latitude,
+            'longitude': 36.8254
+        }).json
+    
+    first = create('Multi-vehicle collision on Uhuru Highway',
+                   'A major accident involving three vehicles near the Nyayo roundabout, people injured')
+    assert first['duplicate_candidates'] == []
+    assert first['report']['incident_group_id'] is None
+    first_id = first['report']['id']
+    
+    assert client.get(f'/api/reports/{first_id}').json['report']['incident_group_id'] is None
+    stream = client.get('/api/reports/stream', buffered=False)
+    chunks = iter(stream.response)
+    
+    # Nearly the same words, 100m away: grouped with the first report
+    copy = create('Multi vehicle collision Uhuru Highway',
+                  'Major accident involving 3 vehicles near Nyayo roundabout, people are injured', -1.3040)
+    assert [c['id'] for c in copy['duplicate_candidates']] == [first_id]
+    assert copy['report']['incident_group_id'] == first_id
+    
+    # The first report now heads the group, readers and listeners see it change
+    assert client.get(f'/api/reports/{first_id}').json['report']['incident_group_id'] == first_id
+    assert _read_event(chunks)['event'] == 'report.created'
+    event = _read_event(chunks)
+    stream.close()
+    assert event['event'] == 'report.updated'
+    assert event['data']['report']['id'] == first_id
+    assert event['data']['report']['incident_group_id'] == first_id
+    
+    # Reworded: suggested as a candidate, but left for an admin to link
+    reworded = create('Accident on Uhuru Highway',
+                      'Three vehicles collided near Nyayo roundabout, several people injured')
+    assert first_id in [c['id'] for c in reworded['duplicate_candidates']]
+    assert reworded['report']['incident_group_id'] is None
+    
+    # Same words far away, or a different incident at the same spot: no candidates
+    far = create('Multi-vehicle collision on Uhuru Highway',
+                 'A major accident involving three vehicles near the Nyayo roundabout, people injured', -1.35)
+    assert far['duplicate_candidates'] == []
+    fire = create('Fire in Gikomba market',
+                  'Stalls caught fire and traders need help, smoke visible from the road', incident_type='fire')
+    assert fire['duplicate_candidates'] == []
+    
+    response = client.get(f'/api/reports?incident_group_id={first_id}')
+    assert {r['id'] for r in response.json['reports']} == {first_id, copy['report']['id']}